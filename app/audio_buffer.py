@@ -0,0 +1,89 @@
+import asyncio
+import os
+from contextlib import contextmanager
+
+from app.audio_encoding import PCM_CHANNELS, PCM_SAMPLE_BYTES, PCM_SAMPLE_RATE
+
+# seconds of inbound audio held for STT; when the sender falls further behind
+# than this the oldest audio is dropped
+STT_BUFFER_SECONDS = float(os.getenv("STT_BUFFER_SECONDS", 10))
+BYTES_PER_SECOND = PCM_SAMPLE_RATE * PCM_SAMPLE_BYTES * PCM_CHANNELS
+
+
+# fixed-size ring of PCM between the websocket reader and the STT sender: writes
+# never block or allocate, and the reader sleeps on an event until there is
+# audio or the buffer is closed, so nothing polls
+class AudioRingBuffer:
+    def __init__(self, capacity: int = int(STT_BUFFER_SECONDS * BYTES_PER_SECOND)):
+        self.capacity = capacity
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._size = 0
+        self._closed = False
+        self._readable = asyncio.Event()
+        self._readers = 0
+        # audio overwritten while a reader was attached, i.e. STT fell behind;
+        # audio piling up between turns is expected and cleared before the next
+        self.dropped_bytes = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def write(self, data: bytes):
+        if self._closed:
+            return
+        if len(data) > self.capacity:
+            if self._readers:
+                self.dropped_bytes += len(data) - self.capacity
+            data = data[-self.capacity :]
+        # overwrite the oldest audio when full
+        overflow = self._size + len(data) - self.capacity
+        if overflow > 0:
+            self._start = (self._start + overflow) % self.capacity
+            self._size -= overflow
+            if self._readers:
+                self.dropped_bytes += overflow
+
+        end = (self._start + self._size) % self.capacity
+        first = min(len(data), self.capacity - end)
+        self._view[end : end + first] = data[:first]
+        self._view[: len(data) - first] = data[first:]
+        self._size += len(data)
+        self._readable.set()
+
+    # waits for audio and returns up to max_bytes of it, or None once closed and
+    # drained; the view points into the ring, so use it before the next await
+    async def read(self, max_bytes: int) -> memoryview | None:
+        while not self._size:
+            if self._closed:
+                return None
+            self._readable.clear()
+            await self._readable.wait()
+
+        # contiguous run only, wrapped audio comes with the next read
+        size = min(max_bytes, self._size, self.capacity - self._start)
+        view = self._view[self._start : self._start + size]
+        self._start = (self._start + size) % self.capacity
+        self._size -= size
+        return view
+
+    # marks a consumer as attached for the drop count
+    @contextmanager
+    def reading(self):
+        self._readers += 1
+        try:
+            yield self
+        finally:
+            self._readers -= 1
+
+    # drop buffered audio, returns how many bytes were discarded
+    def clear(self) -> int:
+        cleared = self._size
+        self._start = 0
+        self._size = 0
+        return cleared
+
+    def close(self):
+        self._closed = True
+        self._readable.set()
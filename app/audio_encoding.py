@@ -0,0 +1,191 @@
+import os
+import subprocess
+import tempfile
+import threading
+from typing import BinaryIO, Protocol
+
+import soundfile
+
+PCM_SAMPLE_RATE = 16000
+PCM_CHANNELS = 1
+PCM_SAMPLE_BYTES = 2
+# read size when copying encoded output to the destination
+ENCODER_READ_CHUNK_BYTES = 64 * 1024
+# which encoder compresses session audio, see ENCODERS
+AUDIO_ENCODER = os.getenv("AUDIO_ENCODER", "flac")
+
+
+# streaming encoder: LINEAR16 PCM in through feed(), compressed bytes written to
+# the output it was created with, finish() flushes the end of the stream
+class AudioEncoder(Protocol):
+    content_type: str
+    extension: str
+
+    def __init__(self, output: BinaryIO): ...
+
+    def feed(self, pcm: bytes): ...
+
+    def finish(self): ...
+
+
+# streams LINEAR16 PCM through a single ffmpeg process into a FLAC stream, so
+# the recording never has to be held in memory as a whole
+class FfmpegFlacEncoder:
+    content_type = "audio/flac"
+    extension = "flac"
+
+    def __init__(self, output: BinaryIO):
+        self.output = output
+        self.bytes_out = 0
+        self._stderr = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(
+            [
+                "ffmpeg",
+                "-hide_banner",
+                "-loglevel",
+                "error",
+                "-f",
+                "s16le",
+                "-ar",
+                str(PCM_SAMPLE_RATE),
+                "-ac",
+                str(PCM_CHANNELS),
+                "-i",
+                "pipe:0",
+                "-f",
+                "flac",
+                "pipe:1",
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=self._stderr,
+        )
+        self._output_error: Exception | None = None
+        self._finished = False
+        # drain stdout concurrently so ffmpeg never blocks on a full pipe
+        self._drain = threading.Thread(target=self._copy_output, daemon=True)
+        self._drain.start()
+
+    def _copy_output(self):
+        try:
+            while chunk := self._process.stdout.read1(ENCODER_READ_CHUNK_BYTES):
+                self.output.write(chunk)
+                self.bytes_out += len(chunk)
+        except Exception as e:
+            self._output_error = e
+            self._process.kill()
+
+    def feed(self, pcm: bytes):
+        try:
+            self._process.stdin.write(pcm)
+        except BrokenPipeError:
+            # ffmpeg exited early, surface its error output
+            self.finish()
+            raise
+
+    def finish(self):
+        if self._finished:
+            return
+        self._finished = True
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = self._process.wait()
+        self._drain.join()
+        self._stderr.seek(0)
+        error = self._stderr.read().decode("utf-8", errors="replace")
+        self._stderr.close()
+        if self._output_error is not None:
+            raise self._output_error
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg exited with {returncode}: {error.strip()}")
+
+
+# forward-only view of an output that cannot seek (e.g. a bucket upload):
+# libsndfile only seeks to rewrite headers at close, and skips that when the
+# position does not move, leaving the stream length unset in the header
+class _ForwardOnlyOutput:
+    def __init__(self, output: BinaryIO):
+        self.output = output
+        self.position = 0
+
+    def write(self, data: bytes) -> int:
+        self.output.write(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        return self.position
+
+
+# encodes in-process through libsndfile, no subprocess and no pipe copies
+class SoundfileEncoder:
+    content_type: str
+    extension: str
+    format: str
+    subtype: str
+
+    def __init__(self, output: BinaryIO):
+        self.output = output
+        seekable = getattr(output, "seekable", None)
+        # seekable outputs get a complete header written back at the end
+        sink = output if seekable and seekable() else _ForwardOnlyOutput(output)
+        self._file = soundfile.SoundFile(
+            sink,
+            "w",
+            samplerate=PCM_SAMPLE_RATE,
+            channels=PCM_CHANNELS,
+            format=self.format,
+            subtype=self.subtype,
+        )
+        # odd trailing byte of a frame, completed by the next feed
+        self._partial = b""
+        self._finished = False
+
+    def feed(self, pcm: bytes):
+        pcm = self._partial + pcm
+        usable = len(pcm) - len(pcm) % PCM_SAMPLE_BYTES
+        self._partial = pcm[usable:]
+        if usable:
+            self._file.buffer_write(pcm[:usable], dtype="int16")
+
+    def finish(self):
+        if self._finished:
+            return
+        self._finished = True
+        self._file.close()
+
+
+class SoundfileFlacEncoder(SoundfileEncoder):
+    content_type = "audio/flac"
+    extension = "flac"
+    format = "FLAC"
+    subtype = "PCM_16"
+
+
+# lossy, several times smaller than FLAC for speech
+class OpusEncoder(SoundfileEncoder):
+    content_type = "audio/ogg"
+    extension = "ogg"
+    format = "OGG"
+    subtype = "OPUS"
+
+
+ENCODERS: dict[str, type[AudioEncoder]] = {
+    "flac": SoundfileFlacEncoder,
+    "opus": OpusEncoder,
+    "ffmpeg-flac": FfmpegFlacEncoder,
+}
+
+
+def get_audio_encoder(name: str = AUDIO_ENCODER) -> type[AudioEncoder]:
+    try:
+        return ENCODERS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown audio encoder {name!r}, expected one of {sorted(ENCODERS)}"
+        )
@@ -0,0 +1,138 @@
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+from app.audio_encoding import AudioEncoder, get_audio_encoder
+
+logger = logging.getLogger(__name__)
+
+# size of each resumable upload request, must be a multiple of 256 KiB
+UPLOAD_CHUNK_BYTES = int(os.getenv("AUDIO_UPLOAD_CHUNK_BYTES", 256 * 1024))
+# PCM chunks buffered for the upload writer before the stream is given up on
+UPLOAD_QUEUE_CHUNKS = 512
+# threads shared by the writers of all live sessions
+AUDIO_UPLOAD_WORKERS = int(os.getenv("AUDIO_UPLOAD_WORKERS", 4))
+
+# threads are only started once audio arrives
+upload_writers = ThreadPoolExecutor(
+    max_workers=AUDIO_UPLOAD_WORKERS, thread_name_prefix="audio-upload"
+)
+
+
+# encodes and uploads session audio while the conversation is still going: the
+# bucket object is a resumable upload sent in UPLOAD_CHUNK_BYTES pieces, so the
+# end of the session only has to flush the tail and finalize it
+class StreamingAudioUpload:
+    def __init__(
+        self,
+        blob,
+        make_encoder: type[AudioEncoder] | None = None,
+        chunk_size: int = UPLOAD_CHUNK_BYTES,
+        executor: Executor = upload_writers,
+    ):
+        self.blob = blob
+        self._make_encoder = make_encoder or get_audio_encoder()
+        self._chunk_size = chunk_size
+        self._executor = executor
+        # unbounded so the end-of-stream marker can always be queued, feed()
+        # enforces UPLOAD_QUEUE_CHUNKS itself
+        self._pcm: queue.Queue = queue.Queue()
+        self._writer = None
+        self._encoder: AudioEncoder | None = None
+        # a drain job is queued or running; one at a time keeps the chunks in order
+        self._draining = False
+        self._lock = threading.Lock()
+        self._started = False
+        self._done = threading.Event()
+        self._aborted = False
+        self.error: Exception | None = None
+        self.bytes_in = 0
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None
+
+    # called from the event loop, never blocks
+    def feed(self, pcm: bytes):
+        if self.failed or self._aborted:
+            return
+        if self._pcm.qsize() >= UPLOAD_QUEUE_CHUNKS:
+            self.error = RuntimeError("Upload fell behind the incoming audio")
+            return
+        # started on the first audio so sessions without audio cost nothing
+        self._started = True
+        self._pcm.put_nowait(pcm)
+        self.bytes_in += len(pcm)
+        self._schedule()
+
+    def _schedule(self):
+        with self._lock:
+            if self._draining:
+                return
+            self._draining = True
+        self._executor.submit(self._drain)
+
+    # writes what is queued and gives the thread back, feed() schedules the next
+    def _drain(self):
+        while True:
+            with self._lock:
+                if self._pcm.empty():
+                    self._draining = False
+                    return
+            pcm = self._pcm.get_nowait()
+            if pcm is None:
+                self._finish()
+            elif not self.failed and not self._aborted:
+                try:
+                    if self._encoder is None:
+                        self._writer = self.blob.open(
+                            "wb",
+                            chunk_size=self._chunk_size,
+                            content_type=self._make_encoder.content_type,
+                            ignore_flush=True,
+                        )
+                        self._encoder = self._make_encoder(self._writer)
+                    self._encoder.feed(pcm)
+                except Exception as e:
+                    self.error = e
+
+    def _finish(self):
+        # abort() after finalize() queues a second end-of-stream marker
+        if not self._done.is_set():
+            self._close_writer()
+            self._done.set()
+
+    def _close_writer(self):
+        try:
+            if not self.failed and not self._aborted:
+                self._encoder.finish()
+                # uploads the buffered tail and finalizes the object
+                self._writer.close()
+                return
+        except Exception as e:
+            self.error = e
+        # close the writer without finalizing, the unfinished resumable session
+        # expires on its own and no partial object is ever written
+        if self._writer is not None:
+            try:
+                self._writer.terminate()
+            except Exception as e:
+                logger.warning("Failed to terminate audio upload: %s", e)
+
+    # blocks until the object is finalized, raises if the stream failed
+    def finalize(self):
+        if not self._started:
+            raise RuntimeError("No audio was streamed")
+        self._pcm.put(None)
+        self._schedule()
+        self._done.wait()
+        if self.error is not None:
+            raise self.error
+
+    def abort(self):
+        self._aborted = True
+        if self._started:
+            self._pcm.put(None)
+            self._schedule()
@@ -1,49 +1,155 @@
+import asyncio
+import logging
 import os
+import threading
+import time
+from collections.abc import Callable
 
-from elevenlabs import ElevenLabs
-from google import genai
+from elevenlabs import AsyncElevenLabs, ElevenLabs
 from google.auth import default
 from google.cloud import firestore, storage
-from openai import OpenAI
 
-# Clients startup and config
-credentials, project = default()
-gemini_client = genai.Client(
-    vertexai=True,  # vertex for ADC so there are no keys
-    project=project,
-    location="global",
-    credentials=credentials,
-)
+from app.llm_providers import LLM_BACKENDS, LLM_PROVIDERS
 
-firestore_client = firestore.Client()
+logger = logging.getLogger(__name__)
 
-storage_client = storage.Client()
+# open the connections of the per-turn clients at startup instead of in the
+# first session
+PREWARM_CLIENTS = os.getenv("PREWARM_CLIENTS", "false").lower() in ("1", "true")
+PREWARM_TIMEOUT_SECONDS = float(os.getenv("PREWARM_TIMEOUT_SECONDS", 10.0))
 
-elevenlabs_client = ElevenLabs(
-    api_key=os.getenv("ELEVENLABS_API_KEY"),  # TODO look for more secure way later
-)
 
-openai_client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),  # TODO look for more secure way later
-)
+# Clients startup and config
+# Each client is built on first use (or by prewarm_clients), so importing the
+# app needs no credentials and every client is created on the thread and
+# event loop that first needs it. The LLM SDKs are imported by their factory,
+# so a provider that is not enabled never loads its SDK.
+def _create_gemini_client():
+    from google import genai
+
+    credentials, project = default()
+    return genai.Client(
+        vertexai=True,  # vertex for ADC so there are no keys
+        project=project,
+        location="global",
+        credentials=credentials,
+    )
+
+
+def _create_openai_client():
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),  # TODO look for more secure way later
+    )
+
+
+_factories: dict[str, Callable[[], object]] = {
+    "gemini": _create_gemini_client,
+    "firestore": firestore.Client,
+    # async client for writes made from the websocket handlers
+    "firestore_async": firestore.AsyncClient,
+    "storage": storage.Client,
+    "elevenlabs": lambda: ElevenLabs(
+        api_key=os.getenv("ELEVENLABS_API_KEY"),  # TODO look for more secure way later
+    ),
+    "elevenlabs_async": lambda: AsyncElevenLabs(
+        api_key=os.getenv("ELEVENLABS_API_KEY"),
+    ),
+    # async clients so LLM calls never block the event loop
+    "openai": _create_openai_client,
+}
+
+_clients: dict[str, object] = {}
+# upload workers and the event loop may ask for the same client at once
+_lock = threading.Lock()
+
+
+def _get(name: str):
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = _factories[name]()
+    return client
+
+
+# replace a client, e.g. with a stand-in in tests and benchmarks
+def override_client(name: str, client: object):
+    if name not in _factories:
+        raise KeyError(f"Unknown client: {name}")
+    with _lock:
+        _clients[name] = client
+
+
+# drop built and overridden clients, the next use builds them again
+def reset_clients():
+    with _lock:
+        _clients.clear()
 
 
 # Export all clients
 def get_gemini_client():
-    return gemini_client
+    return _get("gemini").aio
 
 
 def get_firestore_client():
-    return firestore_client
+    return _get("firestore")
+
+
+def get_firestore_async_client():
+    return _get("firestore_async")
 
 
 def get_storage_client():
-    return storage_client
+    return _get("storage")
 
 
 def get_elevenlabs():
-    return elevenlabs_client
+    return _get("elevenlabs")
+
+
+def get_async_elevenlabs():
+    return _get("elevenlabs_async")
 
 
 def get_openai_client():
-    return openai_client
+    return _get("openai")
+
+
+# one cheap request per client a turn waits on, so its TLS connection is
+# pooled before the first session; the upload and STT clients are only built
+_warmers: dict[str, Callable[[], object]] = {
+    "gemini": lambda: get_gemini_client().models.list(config={"page_size": 1}),
+    "openai": lambda: get_openai_client().models.list(),
+    "elevenlabs_async": lambda: get_async_elevenlabs().models.list(),
+    "firestore_async": lambda: (
+        get_firestore_async_client().collection("sessions").document("prewarm").get()
+    ),
+}
+
+
+async def _warm(name: str, timeout: float):
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(_warmers[name](), timeout)
+    except Exception as e:
+        logger.warning("Prewarming %s failed: %r", name, e)
+    else:
+        logger.info("Prewarmed %s in %.3fs", name, time.perf_counter() - start)
+
+
+async def prewarm_clients(timeout: float = PREWARM_TIMEOUT_SECONDS):
+    # built on the event loop that will use them; nothing else runs on it yet
+    built = set()
+    # LLM clients are named after their provider
+    disabled = set(LLM_BACKENDS) - set(LLM_PROVIDERS)
+    for name in _factories.keys() - disabled:
+        try:
+            _get(name)
+            built.add(name)
+        except Exception as e:
+            # the session that needs it will report the error
+            logger.warning("Creating the %s client failed: %r", name, e)
+    await asyncio.gather(*(_warm(name, timeout) for name in _warmers if name in built))
@@ -0,0 +1,66 @@
+import os
+import time
+
+from app.audio_encoding import PCM_CHANNELS, PCM_SAMPLE_BYTES, PCM_SAMPLE_RATE
+
+# length of the packets inbound audio is grouped into before it is queued; the
+# browser sends one 128-sample frame (8ms) per message
+AUDIO_COALESCE_MS = int(os.getenv("AUDIO_COALESCE_MS", 80))
+
+# inbound frames versus packets passed on, over all sessions of this process
+frame_counts = {"frames_in": 0, "packets_out": 0}
+
+
+# groups tiny inbound PCM frames into packets of packet_ms, so the STT sender,
+# the recorder and the bucket upload handle ~10x fewer, larger messages
+class FrameCoalescer:
+    def __init__(self, packet_ms: int = AUDIO_COALESCE_MS):
+        self.packet_ms = packet_ms
+        frame_bytes = PCM_SAMPLE_BYTES * PCM_CHANNELS
+        self.packet_bytes = PCM_SAMPLE_RATE * packet_ms // 1000 * frame_bytes
+        self._buffer = bytearray()
+        # monotonic time the oldest buffered byte arrived
+        self._buffered_since = 0.0
+        self.frames_in = 0
+        self.packets_out = 0
+
+    # returns the packets completed by this frame, usually none or one; audio is
+    # also released when it has waited packet_ms, in case frames slow down
+    def push(self, frame: bytes) -> list[bytes]:
+        self.frames_in += 1
+        frame_counts["frames_in"] += 1
+        now = time.monotonic()
+        if not self._buffer:
+            self._buffered_since = now
+        self._buffer += frame
+
+        packets = []
+        while len(self._buffer) >= self.packet_bytes:
+            packets.append(bytes(self._buffer[: self.packet_bytes]))
+            del self._buffer[: self.packet_bytes]
+            self._buffered_since = now
+        if self._buffer and now - self._buffered_since >= self.packet_ms / 1000:
+            packets.append(self._take())
+        self._count(packets)
+        return packets
+
+    # whatever is buffered, e.g. when the connection closes
+    def flush(self) -> bytes | None:
+        if not self._buffer:
+            return None
+        packet = self._take()
+        self._count([packet])
+        return packet
+
+    def _take(self) -> bytes:
+        packet = bytes(self._buffer)
+        self._buffer.clear()
+        return packet
+
+    def _count(self, packets: list[bytes]):
+        self.packets_out += len(packets)
+        frame_counts["packets_out"] += len(packets)
+
+
+def get_frame_counts() -> dict[str, int]:
+    return dict(frame_counts)
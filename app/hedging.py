@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import os
+import statistics
+import threading
+import time
+from collections import defaultdict, deque
+
+from app import llm_providers
+from app.llm_providers import LLMProvider, get_llm_provider
+from app.metrics import record_hedge
+
+logger = logging.getLogger(__name__)
+
+# the other provider is asked once the primary is slower than this percentile
+# of its recent latencies for the same call
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", 95))
+# hedge delay until a call has LLM_HEDGE_MIN_SAMPLES latencies to go by
+LLM_HEDGE_DEFAULT_DELAY_SECONDS = float(
+    os.getenv("LLM_HEDGE_DEFAULT_DELAY_SECONDS", 3.0)
+)
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", 20))
+# recent latencies kept per provider and call
+LLM_HEDGE_WINDOW = int(os.getenv("LLM_HEDGE_WINDOW", 200))
+
+# the calls that are hedged; the question stream is spoken as it arrives, so it
+# stays with the primary
+HEDGED_CALLS = ("analyze_mood", "get_next_question", "analyze_mood_and_next_question")
+
+
+# recent latencies of successful calls, by (provider, call), across sessions
+class LatencyWindow:
+    def __init__(
+        self,
+        window: int = LLM_HEDGE_WINDOW,
+        percentile: float = LLM_HEDGE_PERCENTILE,
+        min_samples: int = LLM_HEDGE_MIN_SAMPLES,
+        default_delay: float = LLM_HEDGE_DEFAULT_DELAY_SECONDS,
+    ):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self._lock = threading.Lock()
+        self._samples: dict[tuple[str, str], deque[float]] = defaultdict(
+            lambda: deque(maxlen=window)
+        )
+
+    def record(self, provider: str, call: str, seconds: float):
+        with self._lock:
+            self._samples[(provider, call)].append(seconds)
+
+    def hedge_delay(self, provider: str, call: str) -> float:
+        with self._lock:
+            samples = sorted(self._samples[(provider, call)])
+        if len(samples) < self.min_samples:
+            return self.default_delay
+        index = int(self.percentile / 100 * len(samples))
+        return samples[min(len(samples) - 1, index)]
+
+    # typical latency of calls that took longer than elapsed; None without any
+    def expected_beyond(self, provider: str, call: str, elapsed: float):
+        with self._lock:
+            slower = [s for s in self._samples[(provider, call)] if s > elapsed]
+        return statistics.median(slower) if slower else None
+
+
+latency_window = LatencyWindow()
+
+
+def get_latency_window() -> LatencyWindow:
+    return latency_window
+
+
+# a result a session can use; empty moods or questions count as failures so
+# the other provider gets its chance
+def _check_result(call: str, result):
+    if call == "get_next_question":
+        valid = bool(result)
+    elif call == "analyze_mood":
+        valid = bool(result[0])
+    else:
+        valid = bool(result[0]) and bool(result[2])
+    if not valid:
+        raise ValueError(f"{call} returned an empty result: {result!r}")
+
+
+async def _timed_call(provider: LLMProvider, call: str, args):
+    window = get_latency_window()
+    started = time.perf_counter()
+    # only finished calls are recorded, a cancelled one's time is cut short
+    result = await getattr(provider, call)(*args)
+    _check_result(call, result)
+    window.record(provider.name, call, time.perf_counter() - started)
+    return result
+
+
+# ask the primary; if it has not answered within its hedge delay (or failed),
+# ask the secondary too and take the first valid result, cancelling the other
+async def hedged_call(call: str, primary: LLMProvider, secondary: LLMProvider, *args):
+    window = get_latency_window()
+    started = time.perf_counter()
+    delay = window.hedge_delay(primary.name, call)
+    pending = {asyncio.create_task(_timed_call(primary, call, args)): primary}
+    errors = []
+    hedged_at = None
+    try:
+        while pending:
+            timeout = None
+            if hedged_at is None:
+                timeout = max(0.0, started + delay - time.perf_counter())
+            done, _ = await asyncio.wait(
+                pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                provider = pending.pop(task)
+                if task.exception() is not None:
+                    logger.warning(
+                        "%s %s failed: %s", provider.name, call, task.exception()
+                    )
+                    errors.append(task.exception())
+                    continue
+                elapsed = time.perf_counter() - started
+                _record_winner(
+                    call,
+                    primary,
+                    provider,
+                    elapsed,
+                    hedged_at,
+                    primary in pending.values(),
+                )
+                return task.result()
+            if hedged_at is None:
+                hedged_at = time.perf_counter() - started
+                hedge = asyncio.create_task(_timed_call(secondary, call, args))
+                pending[hedge] = secondary
+        raise errors[0]
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+def _record_winner(
+    call: str,
+    primary: LLMProvider,
+    winner: LLMProvider,
+    elapsed: float,
+    hedged_at: float | None,
+    primary_pending: bool,
+):
+    saved = None
+    if primary_pending:
+        # the primary's own latency is never seen, estimate it from its
+        # recent calls that were at least this slow
+        expected = get_latency_window().expected_beyond(primary.name, call, elapsed)
+        saved = expected - elapsed if expected is not None else None
+    record_hedge(call, primary.name, winner.name, hedged_at is not None, saved)
+    if hedged_at is not None:
+        if winner is primary:
+            outcome = "nothing saved"
+        elif saved is None:
+            outcome = "saving unknown"
+        else:
+            outcome = f"~{saved:.3f}s saved"
+        logger.info(
+            "Hedged %s after %.3fs: %s answered in %.3fs (%s)",
+            call,
+            hedged_at,
+            winner.name,
+            elapsed,
+            outcome,
+        )
+
+
+# the primary's calls, hedged with the secondary
+def hedged_provider(primary: LLMProvider, secondary: LLMProvider) -> LLMProvider:
+    def hedged(call: str):
+        async def run(*args):
+            return await hedged_call(call, primary, secondary, *args)
+
+        return run
+
+    return primary._replace(**{call: hedged(call) for call in HEDGED_CALLS})
+
+
+# hedged with the next enabled provider; unchanged when it is the only one
+def with_hedge(primary: LLMProvider) -> LLMProvider:
+    others = [p for p in llm_providers.LLM_PROVIDERS if p != primary.name]
+    if not others:
+        logger.warning("No other LLM provider enabled, not hedging %s", primary.name)
+        return primary
+    return hedged_provider(primary, get_llm_provider(others[0]))
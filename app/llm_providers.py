@@ -0,0 +1,73 @@
+import importlib
+import os
+import threading
+from collections.abc import AsyncIterator, Awaitable, Callable
+from typing import NamedTuple
+
+# provider -> (backend module, SDK its client is built with); a backend and its
+# SDK are only imported once the provider is used, see get_llm_provider
+LLM_BACKENDS = {
+    "openai": ("app.openai_agent", "openai"),
+    "gemini": ("app.gemini_agent", "google.genai"),
+}
+# providers sessions may ask for, e.g. LLM_PROVIDERS=gemini on a deployment
+# that only talks to Vertex; the first one is the default
+LLM_PROVIDERS = tuple(
+    name.strip().lower()
+    for name in os.getenv("LLM_PROVIDERS", "openai,gemini").split(",")
+    if name.strip()
+)
+
+
+# the calls a session makes to its LLM; each backend module implements them as
+# <provider>_analyze_mood etc.
+class LLMProvider(NamedTuple):
+    name: str
+    analyze_mood: Callable[..., Awaitable[tuple[str, float]]]
+    get_next_question: Callable[..., Awaitable[str]]
+    stream_next_question: Callable[..., AsyncIterator[str]]
+    analyze_mood_and_next_question: Callable[..., Awaitable[tuple[str, float, str]]]
+
+
+_loaded: dict[str, LLMProvider] = {}
+_lock = threading.Lock()
+
+
+def _load(name: str) -> LLMProvider:
+    backend, sdk = LLM_BACKENDS[name]
+    importlib.import_module(sdk)
+    module = importlib.import_module(backend)
+    return LLMProvider(
+        name=name,
+        analyze_mood=getattr(module, f"{name}_analyze_mood"),
+        get_next_question=getattr(module, f"{name}_get_next_question"),
+        stream_next_question=getattr(module, f"{name}_stream_next_question"),
+        analyze_mood_and_next_question=getattr(
+            module, f"{name}_analyze_mood_and_next_question"
+        ),
+    )
+
+
+def get_llm_provider(name: str | None = None) -> LLMProvider:
+    name = (name or LLM_PROVIDERS[0]).lower()
+    if name not in LLM_BACKENDS:
+        raise ValueError(
+            f"Unknown LLM provider {name!r}, expected one of {sorted(LLM_BACKENDS)}"
+        )
+    if name not in LLM_PROVIDERS:
+        raise ValueError(
+            f"LLM provider {name!r} is not enabled, expected one of "
+            f"{list(LLM_PROVIDERS)}"
+        )
+    provider = _loaded.get(name)
+    if provider is None:
+        with _lock:
+            provider = _loaded.get(name)
+            if provider is None:
+                provider = _loaded[name] = _load(name)
+    return provider
+
+
+# import the enabled backends at startup instead of in the first session
+def load_llm_providers() -> list[LLMProvider]:
+    return [get_llm_provider(name) for name in LLM_PROVIDERS]
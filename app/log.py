@@ -0,0 +1,99 @@
+import json
+import logging
+import os
+import queue
+import sys
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+
+# DEBUG adds the per-message hot path (queue items, prompt usage, turn writes)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "text" for people, "json" for log collectors
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+# records waiting for the writer thread; when it falls behind new records are
+# dropped instead of blocking the event loop
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+
+# websocket session a log record belongs to; asyncio tasks inherit it from the
+# handler that created them
+session_id_var: ContextVar[str | None] = ContextVar("session_id", default=None)
+
+
+class SessionFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.session_id = session_id_var.get() or "-"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "session_id": record.session_id,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data)
+
+
+# hands records to the writer thread as they are: message formatting and the
+# stdout write both happen off the event loop
+class AsyncQueueHandler(QueueHandler):
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        # the session is read where the record is made, not in the writer
+        self.addFilter(SessionFilter())
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: QueueListener | None = None
+_handler: AsyncQueueHandler | None = None
+
+
+# route the app's loggers through the queue; safe to call more than once
+def setup_logging(level: str = LOG_LEVEL, log_format: str = LOG_FORMAT):
+    global _listener, _handler
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(sys.stdout)
+    if log_format == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(
+            logging.Formatter(
+                "%(asctime)s %(levelname)s %(name)s [%(session_id)s] %(message)s"
+            )
+        )
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _handler = AsyncQueueHandler(log_queue)
+    _listener = QueueListener(log_queue, output)
+
+    logger = logging.getLogger("app")
+    logger.setLevel(level)
+    logger.addHandler(_handler)
+    logger.propagate = False
+    _listener.start()
+
+
+# flush what is queued, e.g. on shutdown
+def shutdown_logging():
+    global _listener, _handler
+    if _listener is None:
+        return
+    _listener.stop()
+    logging.getLogger("app").removeHandler(_handler)
+    if _handler.dropped:
+        print(f"[LOG] Dropped {_handler.dropped} log records", file=sys.stderr)
+    _listener, _handler = None, None
@@ -2,15 +2,52 @@ from dotenv import load_dotenv
 
 load_dotenv(".env")
 
+import time
+
+# startup is reported from here, including the imports below
+started = time.perf_counter()
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 
+from app.deps import PREWARM_CLIENTS, prewarm_clients
+from app.llm_providers import load_llm_providers
+from app.log import setup_logging, shutdown_logging
 from app.routes import agent_router
+from app.upload_queue import get_upload_queue
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # upload workers pick up sessions spooled by a previous run
+    get_upload_queue().start()
+    # only the enabled LLM backends (and their SDKs) are ever imported
+    providers = load_llm_providers()
+    logger.info("LLM providers: %s", ", ".join(p.name for p in providers))
+    # clients are otherwise built by the first session that uses them
+    if PREWARM_CLIENTS:
+        await prewarm_clients()
+    logger.info(
+        "Started in %.3fs (%s clients)",
+        time.perf_counter() - started,
+        "prewarmed" if PREWARM_CLIENTS else "lazy",
+    )
+    yield
+    # drain queued uploads on shutdown (SIGTERM), the rest stay spooled
+    await asyncio.to_thread(get_upload_queue().shutdown)
+    shutdown_logging()
+
 
 # FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Include routers
 app.include_router(agent_router)
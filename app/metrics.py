@@ -0,0 +1,192 @@
+import bisect
+import threading
+from collections import defaultdict
+
+from app.models import TurnTimings
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# upper bounds in seconds, from a cached TTS chunk up to the playback timeout
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+# cumulative Prometheus histogram with one series per label set; observed from
+# the event loop and the upload worker threads
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        label_names: tuple[str, ...],
+        buckets: tuple[float, ...] = STAGE_BUCKETS,
+    ):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # label values -> [per-bucket counts (last is +Inf), sum]
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *label_values: str):
+        with self._lock:
+            series = self._series.setdefault(
+                label_values, [[0] * (len(self.buckets) + 1), 0.0]
+            )
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def snapshot(self) -> dict[tuple[str, ...], tuple[list[int], float]]:
+        with self._lock:
+            return {
+                k: (list(counts), total) for k, (counts, total) in self._series.items()
+            }
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for label_values, (counts, total) in sorted(self.snapshot().items()):
+            labels = _labels(zip(self.label_names, label_values))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = _labels([*zip(self.label_names, label_values), ("le", bound)])
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def _labels(pairs) -> str:
+    pairs = list(pairs)
+    if not pairs:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _metric(name: str, kind: str, description: str, samples: list[tuple[dict, float]]):
+    lines = [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+    lines += [f"{name}{_labels(labels.items())} {value}" for labels, value in samples]
+    return lines
+
+
+# seconds spent in each stage of a turn (plus the session upload), by LLM
+stage_seconds = Histogram(
+    "agent_stage_seconds",
+    "Time spent in each stage of an agent turn",
+    ("stage", "llm"),
+)
+
+
+# estimated latency saved by hedged LLM calls the secondary won, see app.hedging
+hedge_saved_seconds = Histogram(
+    "agent_llm_hedge_saved_seconds",
+    "Estimated latency saved when the hedge answered first",
+    ("call", "primary"),
+)
+# (call, primary, winner, hedged) -> LLM calls
+_hedge_counts: dict[tuple[str, str, str, str], int] = defaultdict(int)
+_hedge_lock = threading.Lock()
+
+
+def observe_stage(stage: str, llm: str, seconds: float | None):
+    if seconds is not None:
+        stage_seconds.observe(seconds, stage, llm)
+
+
+def record_turn_timings(llm: str, timings: TurnTimings):
+    for stage, seconds in timings.model_dump().items():
+        observe_stage(stage, llm, seconds)
+
+
+def record_hedge(
+    call: str, primary: str, winner: str, hedged: bool, saved: float | None
+):
+    with _hedge_lock:
+        _hedge_counts[(call, primary, winner, str(hedged).lower())] += 1
+    if saved is not None:
+        hedge_saved_seconds.observe(max(0.0, saved), call, primary)
+
+
+# the stage histogram plus the counters the app already keeps, in the
+# Prometheus text format
+def render_metrics(
+    frame_counts: dict[str, int],
+    prompt_usage: dict[tuple[str, str], dict[str, int]],
+    upload_stats: dict,
+    tts_cache_stats: dict,
+) -> str:
+    lines = stage_seconds.render()
+    lines += _metric(
+        "agent_audio_frames_total",
+        "counter",
+        "Inbound audio frames",
+        [({}, frame_counts["frames_in"])],
+    )
+    lines += _metric(
+        "agent_audio_packets_total",
+        "counter",
+        "Coalesced audio packets passed on",
+        [({}, frame_counts["packets_out"])],
+    )
+    prompt_totals = defaultdict(list)
+    for (provider, prompt), usage in sorted(prompt_usage.items()):
+        for key, value in usage.items():
+            prompt_totals[key].append(({"provider": provider, "prompt": prompt}, value))
+    for key in ("calls", "input_tokens", "cached_tokens"):
+        lines += _metric(
+            f"agent_prompt_{key}_total",
+            "counter",
+            f"LLM prompt {key.replace('_', ' ')}",
+            prompt_totals[key],
+        )
+    for key in ("queue_depth", "in_flight", "spooled"):
+        lines += _metric(
+            f"agent_upload_{key}",
+            "gauge",
+            f"Session uploads {key.replace('_', ' ')}",
+            [({}, upload_stats[key])],
+        )
+    for key in ("completed", "failed", "retries"):
+        lines += _metric(
+            f"agent_uploads_{key}_total",
+            "counter",
+            f"Session uploads {key}",
+            [({}, upload_stats[key])],
+        )
+    for key in ("hits", "misses", "bytes_saved"):
+        lines += _metric(
+            f"agent_tts_cache_{key}_total",
+            "counter",
+            f"Question audio cache {key.replace('_', ' ')}",
+            [({}, tts_cache_stats[key])],
+        )
+    for key in ("hit_rate", "memory_bytes", "disk_bytes"):
+        lines += _metric(
+            f"agent_tts_cache_{key}",
+            "gauge",
+            f"Question audio cache {key.replace('_', ' ')}",
+            [({}, tts_cache_stats[key])],
+        )
+    with _hedge_lock:
+        hedge_counts = sorted(_hedge_counts.items())
+    lines += _metric(
+        "agent_llm_hedge_total",
+        "counter",
+        "Hedged LLM calls by the provider that answered",
+        [
+            (
+                {"call": call, "primary": primary, "winner": winner, "hedged": hedged},
+                count,
+            )
+            for (call, primary, winner, hedged), count in hedge_counts
+        ],
+    )
+    lines += hedge_saved_seconds.render()
+    return "\n".join(lines) + "\n"
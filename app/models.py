@@ -3,12 +3,25 @@ from datetime import datetime
 from pydantic import BaseModel, ConfigDict, Field
 
 
+# seconds spent in each stage of a turn, None when the stage did not run
+# (e.g. no question generation when a combined call already produced it)
+class TurnTimings(BaseModel):
+    question_generation: float | None = None
+    tts_first_chunk: float | None = None
+    tts_total: float | None = None
+    playback_wait: float | None = None
+    stt_open: float | None = None
+    speech_to_commit: float | None = None
+    mood_analysis: float | None = None
+
+
 class QAMoodPair(BaseModel):
     question: str
     answer: str
     mood: str
     confidence: float = Field(ge=0.0, le=1.0, description="Confidence score 0-1")
     depth: int = Field(ge=1, le=3, description="Emotion depth level 1-3")
+    timings: TurnTimings | None = None
 
 
 class AgentSession(BaseModel):
@@ -21,7 +34,20 @@ class AgentSession(BaseModel):
     final_confidence: float = Field(ge=0.0, le=1.0)
     final_depth: int = Field(ge=1, le=3)
     question_count: int = Field(ge=1, le=5)
-    audio_url: str
+    # added once the session audio is in the bucket
+    audio_url: str | None = None
+
+
+# a finished session's audio waiting in the upload spool
+class SessionUploadJob(BaseModel):
+    job_id: str | None = None
+    session_id: str
+    session_timestamp: str
+    # LLM provider of the session, labels the upload metrics
+    llm: str | None = None
+    audio_url: str | None = None
+    attempts: int = 0
+    enqueued_at: float = 0.0
 
 
 class MoodAnalysisResult(BaseModel):
@@ -31,3 +57,21 @@ class MoodAnalysisResult(BaseModel):
 
 class NextQuestionResult(BaseModel):
     question: str = Field(min_length=1)
+
+
+class MoodAndQuestionResult(BaseModel):
+    mood: str
+    confidence: float = Field(ge=0.0, le=1.0)
+    question: str = Field(min_length=1)
+
+
+class TTSStats(BaseModel):
+    time_to_first_chunk: float | None = None
+    total_time: float = 0.0
+    chunk_count: int = 0
+    byte_count: int = 0
+    completed: bool = False
+    cached: bool = False
+    # streamed input only: the text spoken and when its source finished
+    text: str = ""
+    text_time: float | None = None
@@ -0,0 +1,57 @@
+import os
+import tempfile
+from collections.abc import Iterator
+
+from app.audio_upload import StreamingAudioUpload
+
+# session audio kept in memory up to this size, then spooled to a temp file
+SPOOL_MEMORY_BYTES = int(os.getenv("AUDIO_SPOOL_MEMORY_BYTES", 1024 * 1024))
+# read size when streaming the recording back out for encoding
+RECORDER_READ_CHUNK_BYTES = 64 * 1024
+
+
+# records the user's LINEAR16 audio for a session with bounded memory use,
+# optionally forwarding it to an upload that runs during the session
+class SessionRecorder:
+    def __init__(
+        self,
+        max_memory_bytes: int = SPOOL_MEMORY_BYTES,
+        upload: StreamingAudioUpload | None = None,
+    ):
+        self.max_memory_bytes = max_memory_bytes
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_memory_bytes)
+        self.byte_count = 0
+        self.upload = upload
+
+    def __len__(self) -> int:
+        return self.byte_count
+
+    # the file rolls over to disk once it grows past max_size, 0 never does;
+    # writes always go to the end, so its size is byte_count
+    @property
+    def spooled_to_disk(self) -> bool:
+        return 0 < self.max_memory_bytes < self.byte_count
+
+    def write(self, chunk: bytes):
+        self._file.write(chunk)
+        self.byte_count += len(chunk)
+        if self.upload is not None:
+            self.upload.feed(chunk)
+
+    # yields the recording from the start without loading it all into memory
+    def chunks(self, size: int = RECORDER_READ_CHUNK_BYTES) -> Iterator[bytes]:
+        self._file.seek(0)
+        while chunk := self._file.read(size):
+            yield chunk
+        self._file.seek(0, os.SEEK_END)
+
+    # hand the running upload over to whoever finalizes it
+    def detach_upload(self) -> StreamingAudioUpload | None:
+        upload, self.upload = self.upload, None
+        return upload
+
+    def close(self):
+        self._file.close()
+        if self.upload is not None:
+            # no-op once the upload has been finalized
+            self.upload.abort()
@@ -1,147 +1,61 @@
 import asyncio
-import base64
 import json
+import logging
 import os
-import threading
+import time
 import uuid
 from datetime import datetime
 
-from elevenlabs import RealtimeAudioOptions, RealtimeEvents, VoiceSettings
-from elevenlabs.realtime.scribe import AudioFormat, CommitStrategy
 from fastapi import (
     APIRouter,
     WebSocket,
     WebSocketDisconnect,
 )
-from fastapi.websockets import WebSocketState
-
-from app.deps import get_elevenlabs
-from app.gemini_agent import gemini_analyze_mood, gemini_get_next_question
-from app.models import AgentSession, QAMoodPair
-from app.openai_agent import openai_analyze_mood, openai_get_next_question
-from app.services import upload_agent_audio_to_bucket, upload_agent_session
-from app.wheel_of_emotions import get_emotion_depth, get_wheel_of_emotions
+from fastapi.responses import PlainTextResponse
+from pydantic import ValidationError
+
+from app.audio_buffer import AudioRingBuffer
+from app.audio_upload import StreamingAudioUpload
+from app.frame_coalescer import FrameCoalescer, get_frame_counts
+from app.hedging import with_hedge
+from app.llm_providers import LLMProvider, get_llm_provider
+from app.log import session_id_var
+from app.metrics import PROMETHEUS_CONTENT_TYPE, record_turn_timings, render_metrics
+from app.models import AgentSession, QAMoodPair, SessionUploadJob, TurnTimings
+from app.prompts import get_prompt_usage
+from app.recorder import SessionRecorder
+from app.services import (
+    finalize_agent_session,
+    save_agent_turn,
+    start_agent_audio_upload,
+)
+from app.stt import STTSessionManager
+from app.tts import (
+    AUDIO_FRAME_VERSION,
+    tts_elevenlabs_input_stream,
+    tts_elevenlabs_session,
+)
+from app.tts_cache import get_tts_cache
+from app.upload_queue import get_upload_queue
+from app.wheel_of_emotions import get_emotion_lineage
 
 router = APIRouter(tags=["agent"])
-
-
-async def stt_elevenlabs_session(
-    audio_queue, res_queue, answer_transcript_container, answer_ready, websocket
-):
-    print("[STT] Starting ElevenLabs STT session")
-    elevenlabs = get_elevenlabs()
-    stop = asyncio.Event()
-
-    connection = await elevenlabs.speech_to_text.realtime.connect(
-        RealtimeAudioOptions(
-            model_id="scribe_v2_realtime",
-            audio_format=AudioFormat.PCM_16000,
-            sample_rate=16000,
-            include_timestamps=True,
-            commit_strategy=CommitStrategy.VAD,
-            vad_silence_threshold_secs=1.5,
-            vad_threshold=0.4,
-            min_speech_duration_ms=100,
-            min_silence_duration_ms=100,
-        )
-    )
-
-    def on_session_started(data):
-        print(f"[STT] Session started: {data.get('session_id', 'unknown')}")
-
-    def on_partial_transcript(data):
-        transcript_data = {
-            "type": "transcript",
-            "transcript": data.get("text", ""),
-            "is_final": False,
-        }
-        res_queue.put_nowait(transcript_data)
-        # send to frontend
-        asyncio.create_task(websocket.send_json(transcript_data))
-
-    def on_committed_transcript(data):
-        text = data.get("text", "")
-        answer_transcript_container["current"] += text
-        transcript_data = {
-            "type": "transcript",
-            "transcript": text,
-            "is_final": True,
-        }
-        res_queue.put_nowait(transcript_data)
-        # send to frontend
-        asyncio.create_task(websocket.send_json(transcript_data))
-        # signal that answer is ready (VAD detected end of speech)
-        print(f"[STT] VAD detected silence, answer complete: {text}")
-        answer_ready.set()
-
-    def on_error(error):
-        print(f"[STT] Error: {error}")
-        stop.set()
-
-    def on_close():
-        print("[STT] Connection closed by server")
-        stop.set()
-
-    connection.on(RealtimeEvents.SESSION_STARTED, on_session_started)
-    connection.on(RealtimeEvents.PARTIAL_TRANSCRIPT, on_partial_transcript)
-    connection.on(RealtimeEvents.COMMITTED_TRANSCRIPT, on_committed_transcript)
-    connection.on(RealtimeEvents.ERROR, on_error)
-    connection.on(RealtimeEvents.CLOSE, on_close)
-
-    async def send_audio():
-        last_send_time = asyncio.get_event_loop().time()
-        min_interval = 0.005  # 5ms between chunks
-
-        while not stop.is_set() and not answer_ready.is_set():
-            try:
-                chunk = await asyncio.wait_for(audio_queue.get(), timeout=0.1)
-                if chunk is None:
-                    break
-
-                # rate limit to prevent queue overflow
-                current_time = asyncio.get_event_loop().time()
-                time_since_last = current_time - last_send_time
-                if time_since_last < min_interval:
-                    await asyncio.sleep(min_interval - time_since_last)
-
-                audio_base64 = base64.b64encode(chunk).decode("utf-8")
-                await connection.send({"audio_base_64": audio_base64})
-                last_send_time = asyncio.get_event_loop().time()
-            except asyncio.TimeoutError:
-                continue
-
-    sender = asyncio.create_task(send_audio())
-    try:
-        # wait for either answer_ready or stop event
-        await asyncio.wait(
-            [
-                asyncio.create_task(answer_ready.wait()),
-                asyncio.create_task(stop.wait()),
-            ],
-            return_when=asyncio.FIRST_COMPLETED,
-        )
-    finally:
-        print("[STT] Closing session")
-        await connection.close()
-        sender.cancel()
-        try:
-            await sender
-        except asyncio.CancelledError:
-            pass
+logger = logging.getLogger(__name__)
 
 
 async def receive_audio(
     websocket: WebSocket,
-    audio_queue: asyncio.Queue,
-    audioBytes: bytearray,
+    audio_buffer: AudioRingBuffer,
+    recorder: SessionRecorder,
     res_queue: asyncio.Queue,
 ):
+    coalescer = FrameCoalescer()
     try:
         while True:
             message = await websocket.receive()
 
             if message["type"] == "websocket.disconnect":
-                print("[AGENT] Client disconnected during audio reception")
+                logger.info("Client disconnected during audio reception")
                 break
 
             # handle JSON messages (like audio_playback_finished)
@@ -158,94 +72,192 @@ async def receive_audio(
 
                 # handle binary audio data
                 if "bytes" in message:
-                    audio_data = message["bytes"]
-                    audioBytes.extend(audio_data)
-                    await audio_queue.put(audio_data)
+                    for packet in coalescer.push(message["bytes"]):
+                        recorder.write(packet)
+                        audio_buffer.write(packet)
     except WebSocketDisconnect:
-        print("[AGENT] WebSocket disconnected in receive_audio")
+        logger.info("WebSocket disconnected in receive_audio")
     except Exception as e:
-        print(f"[AGENT] Error in receive_audio: {e}")
-
-
-def upload_session_in_background(
-    audio_bytes: bytearray,
-    session_id: str,
-    session_timestamp: str,
-    qa_pairs_with_moods: list[QAMoodPair],
-    final_mood: str,
-    final_confidence: float,
-    final_depth: int,
-    question_count: int,
-):
-    try:
-        # only upload if we have audio data
-        if not audio_bytes:
-            print(f"[AGENT] No audio data to upload for session: {session_id}")
-            return
-
-        # upload audio to bucket
-        audio_url = upload_agent_audio_to_bucket(
-            bytes(audio_bytes), session_id, session_timestamp
+        logger.error("Error in receive_audio: %s", e)
+    finally:
+        # no more audio for STT, the sender stops once it has sent the rest
+        audio_buffer.close()
+        # keep the tail of the recording, STT is done with it by now
+        if tail := coalescer.flush():
+            recorder.write(tail)
+        if audio_buffer.dropped_bytes:
+            logger.warning(
+                "STT fell behind, dropped %d bytes", audio_buffer.dropped_bytes
+            )
+        logger.info(
+            "Coalesced %d audio frames into %d packets",
+            coalescer.frames_in,
+            coalescer.packets_out,
         )
 
-        # create session object
-        session = AgentSession(
-            session_id=session_id,
-            created_at=datetime.fromisoformat(session_timestamp),
-            qa_pairs=qa_pairs_with_moods,
-            final_mood=final_mood,
-            final_confidence=final_confidence,
-            final_depth=final_depth,
-            question_count=question_count,
-            audio_url=audio_url,
-        )
 
-        # upload session to Firestore
-        upload_agent_session(session)
-        print(f"[AGENT] Background upload completed for session: {session_id}")
+# wait for the frontend to signal that the question finished playing, returns
+# the seconds waited
+async def wait_for_playback_finished(
+    res_queue: asyncio.Queue, timeout: float = 30.0
+) -> float:
+    logger.debug("Waiting for frontend audio playback to finish")
+    started = time.perf_counter()
+    try:
+        # keep reading from queue until we get the audio_playback_finished signal
+        while True:
+            response = await asyncio.wait_for(res_queue.get(), timeout=timeout)
+            logger.debug("Received response from res_queue: %s", response)
+            if response.get("type") == "audio_playback_finished":
+                logger.debug("Frontend audio playback finished")
+                break
+            else:
+                logger.debug(
+                    "Ignoring message type %s while waiting for playback",
+                    response.get("type"),
+                )
+    except asyncio.TimeoutError:
+        logger.warning("Timeout waiting for audio playback finished signal")
+    return time.perf_counter() - started
+
+
+# called as the first chunk of question audio goes out: older audio is not an
+# answer, and from here on the user may start answering over the question
+def start_barge_in(
+    audio_buffer: AudioRingBuffer, stt: STTSessionManager
+) -> asyncio.Task:
+    cleared = audio_buffer.clear()
+    if cleared > 0:
+        logger.debug("Cleared %d bytes of old audio from buffer", cleared)
+    return stt.listen_in_background()
+
+
+# wait out the question while listen_task hears the answer; if the user starts
+# answering the client is told to stop the audio. returns the answer transcript
+# and the playback wait
+async def listen_with_barge_in(
+    websocket: WebSocket,
+    stt: STTSessionManager,
+    res_queue: asyncio.Queue,
+    listen_task: asyncio.Task,
+) -> tuple[str, float]:
+    playback = asyncio.create_task(wait_for_playback_finished(res_queue))
+    speech = asyncio.create_task(stt.speech_started.wait())
+    try:
+        await asyncio.wait([playback, speech], return_when=asyncio.FIRST_COMPLETED)
+        if speech.done() and not playback.done():
+            logger.info("User started answering, stopping question audio")
+            await websocket.send_json({"type": "stop_audio"})
+        # the client still confirms playback, so the next turn is not confused
+        playback_wait = await playback
+        logger.debug("Now listening for user response")
+        await websocket.send_json({"type": "listening"})
+        return await listen_task, playback_wait
+    finally:
+        for task in (listen_task, playback, speech):
+            task.cancel()
+        await asyncio.gather(listen_task, playback, speech, return_exceptions=True)
+
+
+# an unknown or disabled llm in the query gets the default provider
+def session_llm_provider(llm: str | None) -> LLMProvider:
+    try:
+        return get_llm_provider(llm)
+    except ValueError as e:
+        logger.warning("%s, using the default provider", e)
+        return get_llm_provider()
+
+
+# the streaming upload builds the storage client, which may block on credentials;
+# without it the recording is uploaded from the spool once the session ends
+async def open_session_upload(
+    session_id: str, timestamp: str
+) -> StreamingAudioUpload | None:
+    try:
+        return await asyncio.to_thread(start_agent_audio_upload, session_id, timestamp)
     except Exception as e:
-        print(f"[AGENT] Background upload failed for session {session_id}: {e}")
-
-
-async def tts_elevenlabs_session(text: str, websocket: WebSocket):
-    response = get_elevenlabs().text_to_speech.stream(
-        voice_id="I3MrSgiotopLY33bjEX7",  # Yaron: I3MrSgiotopLY33bjEX7, Erik: VWoIQlDpnFjY9kfJ11dz, Adam: pNInz6obpgDQGcFmaJgB
-        output_format="mp3_22050_32",
-        text=text,
-        model_id="eleven_multilingual_v2",
-        voice_settings=VoiceSettings(
-            stability=0.0,
-            similarity_boost=1.0,
-            style=0.0,
-            use_speaker_boost=True,
-            speed=1.0,
+        logger.warning("Streaming audio upload unavailable: %s", e)
+        return None
+
+
+# inbound audio frames versus the coalesced packets sent on
+@router.get("/agent/audio")
+async def audio_stats():
+    return get_frame_counts()
+
+
+# queue depth and latency of the session upload workers
+@router.get("/agent/uploads")
+async def upload_stats():
+    return get_upload_queue().stats()
+
+
+# hit rate and bytes saved by the question audio cache
+@router.get("/agent/tts-cache")
+async def tts_cache_stats():
+    return get_tts_cache().stats()
+
+
+# per-stage turn latency histograms and the counters above, for Prometheus
+@router.get("/metrics")
+async def metrics():
+    return PlainTextResponse(
+        render_metrics(
+            get_frame_counts(),
+            get_prompt_usage(),
+            get_upload_queue().stats(),
+            get_tts_cache().stats(),
         ),
+        media_type=PROMETHEUS_CONTENT_TYPE,
     )
 
-    # send question audio to client
-    for chunk in response:
-        if chunk and websocket.application_state == WebSocketState.CONNECTED:
-            audio_base64 = base64.b64encode(chunk).decode("utf-8")
-            await websocket.send_json(
-                {"type": "question_audio_base_64", "chunk": audio_base64}
-            )
-    await asyncio.sleep(0.1)
-
 
 @router.websocket(os.getenv("AGENT_URL"))
 async def websocket_agent(websocket: WebSocket):
     await websocket.accept()
 
     session_id = str(uuid.uuid4())
-    session_timestamp = datetime.now().isoformat()
-    audio_queue = asyncio.Queue()
+    # tags every log record of this session, including its tasks
+    session_id_var.set(session_id)
+    session_created_at = datetime.now()
+    session_timestamp = session_created_at.isoformat()
+    audio_buffer = AudioRingBuffer()
     res_queue = asyncio.Queue()
-    audioBytes = bytearray()
-
-    llm = websocket.query_params.get("llm", "openai").lower()
-    print(f"[AGENT] Using LLM: {llm}")
+    recorder = SessionRecorder()
+
+    # defaults to the first enabled provider
+    llm = websocket.query_params.get("llm")
+    # "combined" analyzes the answer and generates the next question in one call
+    mode = websocket.query_params.get("mode", "separate").lower()
+    logger.info("Using mode: %s", mode)
+    # clients that negotiate binary framing get raw audio frames instead of base64 JSON
+    binary_audio = websocket.query_params.get("audio", "").lower() == "binary"
+    if binary_audio:
+        await websocket.send_json(
+            {
+                "type": "audio_format",
+                "framing": "binary",
+                "version": AUDIO_FRAME_VERSION,
+            }
+        )
+    # stream generated question text straight into TTS as the LLM writes it
+    stream_question = websocket.query_params.get("stream_question", "").lower() in (
+        "1",
+        "true",
+    )
+    # listen while the question plays and let the user interrupt it
+    barge_in = websocket.query_params.get("barge_in", "").lower() in ("1", "true")
+    logger.info("Barge-in: %s", barge_in)
+    # also ask the other LLM provider when the chosen one is unusually slow
+    hedge = websocket.query_params.get("hedge", "").lower() in ("1", "true")
 
     try:
+        recorder.upload = await open_session_upload(session_id, session_timestamp)
+        provider = session_llm_provider(llm)
+        llm = provider.name
+        logger.info("Using LLM: %s", llm)
+        if hedge:
+            provider = with_hedge(provider)
         mood_confidence = 0.0
         question_counter = 0
         current_depth = 0
@@ -257,163 +269,217 @@ async def websocket_agent(websocket: WebSocket):
         moods: list[tuple[str, float]] = []
         # QAPair objects for upload
         qa_pairs_with_moods: list[QAMoodPair] = []
-        wheel = get_wheel_of_emotions()
+        # per-turn Firestore writes, run alongside the conversation
+        turn_writes: list[asyncio.Task] = []
+        # question already generated by a combined call, if any
+        next_question = None
 
         receive_task = asyncio.create_task(
-            receive_audio(websocket, audio_queue, audioBytes, res_queue)
+            receive_audio(websocket, audio_buffer, recorder, res_queue)
         )
+        stt = STTSessionManager(websocket, audio_buffer, res_queue)
 
         while question_counter < max_questions:
             # check if should stop: high confidence and max depth reached
             if mood_confidence >= 0.9 and current_depth >= max_depth:
-                print(
-                    f"[AGENT] Stopping: High confidence ({mood_confidence}) at depth {current_depth}"
+                logger.info(
+                    "Stopping: high confidence (%s) at depth %d",
+                    mood_confidence,
+                    current_depth,
                 )
                 break
 
+            timings = TurnTimings()
+
             # get question from agent
             if question_counter == 0:
                 question = "Hello! How are you feeling today?"
+            elif next_question:
+                question = next_question
+                next_question = None
+            elif stream_question:
+                # generated while it is spoken below
+                question = None
             else:
+                started = time.perf_counter()
                 try:
-                    if llm == "openai":
-                        question = await openai_get_next_question(
-                            qa_pairs, moods, current_depth, max_depth
-                        )
-                    else:
-                        question = await gemini_get_next_question(
-                            qa_pairs, moods, current_depth, max_depth
-                        )
-                    print(f"[AGENT] Generated next question: {question}")
-                    print(f"[AGENT] Question type: {type(question)}")
+                    question = await provider.get_next_question(
+                        qa_pairs, moods, current_depth, max_depth
+                    )
+                    timings.question_generation = time.perf_counter() - started
+                    logger.debug("Generated next question: %s", question)
                 except Exception as e:
-                    print(f"[AGENT] Error generating next question: {e}")
+                    logger.error("Error generating next question: %s", e)
                     raise
 
+            # open STT while the question is spoken so listening starts instantly
+            stt.prewarm()
+
+            # with barge-in the answer is listened for from the first audio chunk
+            listen_task = None
+
+            def on_first_chunk():
+                nonlocal listen_task
+                listen_task = start_barge_in(audio_buffer, stt)
+
             # ask question
-            print(f"[AGENT] Question {question_counter + 1}: {question}")
-            await tts_elevenlabs_session(question, websocket)
-            print("[AGENT] Sent all audio chunks, now sending question text")
+            try:
+                if question is None:
+                    question_stream = provider.stream_next_question(
+                        qa_pairs, moods, current_depth, max_depth
+                    )
+                    tts_stats = await tts_elevenlabs_input_stream(
+                        question_stream,
+                        websocket,
+                        binary_audio,
+                        on_first_chunk if barge_in else None,
+                    )
+                    question = tts_stats.text
+                    # generation and speech overlap: the LLM gets its own time,
+                    # tts_total is only what speech took after the text was done
+                    timings.question_generation = tts_stats.text_time
+                    timings.tts_first_chunk = tts_stats.time_to_first_chunk
+                    if tts_stats.text_time is not None:
+                        timings.tts_total = tts_stats.total_time - tts_stats.text_time
+                    logger.info(
+                        "Question %d (streamed): %s", question_counter + 1, question
+                    )
+                else:
+                    logger.info("Question %d: %s", question_counter + 1, question)
+                    tts_stats = await tts_elevenlabs_session(
+                        question,
+                        websocket,
+                        binary_audio,
+                        on_first_chunk if barge_in else None,
+                    )
+                    timings.tts_first_chunk = tts_stats.time_to_first_chunk
+                    timings.tts_total = tts_stats.total_time
+            except BaseException:
+                if listen_task:
+                    listen_task.cancel()
+                raise
+            logger.debug("Sent all audio chunks, now sending question text")
+            if barge_in and listen_task is None:
+                # no audio went out, listen from now on
+                on_first_chunk()
             await websocket.send_json({"type": "question", "text": question})
 
-            # wait for frontend to signal audio playback finished via res_queue
-            print("[AGENT] Waiting for frontend audio playback to finish...")
-            try:
-                # keep reading from queue until we get the audio_playback_finished signal
-                while True:
-                    response = await asyncio.wait_for(res_queue.get(), timeout=30.0)
-                    print(f"[AGENT] Received response from res_queue: {response}")
-                    if response.get("type") == "audio_playback_finished":
-                        print(
-                            "[AGENT] ✓ Frontend audio playback finished, proceeding to listening"
-                        )
-                        break
-                    else:
-                        print(
-                            f"[AGENT] Ignoring message type: {response.get('type')} (waiting for audio_playback_finished)"
-                        )
-            except asyncio.TimeoutError:
-                print("[AGENT] Timeout waiting for audio playback finished signal")
-
-            # clear old audio from queue
-            cleared = 0
-            while not audio_queue.empty():
-                try:
-                    audio_queue.get_nowait()
-                    cleared += 1
-                except asyncio.QueueEmpty:
-                    break
-            if cleared > 0:
-                print(f"[AGENT] Cleared {cleared} old audio chunks from queue")
-
-            print("[AGENT] Now listening for user response...")
-            await websocket.send_json({"type": "listening"})
-
-            answer_transcript_container = {"current": ""}
-            answer_ready = asyncio.Event()
-
-            print(f"[AGENT] Starting STT session for question {question_counter + 1}")
-            stt_task = asyncio.create_task(
-                stt_elevenlabs_session(
-                    audio_queue,
-                    res_queue,
-                    answer_transcript_container,
-                    answer_ready,
-                    websocket,
+            if barge_in:
+                logger.debug(
+                    "Listening for the answer to question %d during playback",
+                    question_counter + 1,
                 )
-            )
+                (
+                    answer_transcript,
+                    timings.playback_wait,
+                ) = await listen_with_barge_in(websocket, stt, res_queue, listen_task)
+            else:
+                # wait for frontend to signal audio playback finished via res_queue
+                timings.playback_wait = await wait_for_playback_finished(res_queue)
 
-            print(
-                f"[AGENT] Waiting for user response to question {question_counter + 1}..."
-            )
-            await answer_ready.wait()
-            await stt_task
+                # clear audio recorded while the question was playing
+                cleared = audio_buffer.clear()
+                if cleared > 0:
+                    logger.debug("Cleared %d bytes of old audio from buffer", cleared)
 
-            answer_transcript = answer_transcript_container["current"]
-            print(f"[AGENT] Received answer: {answer_transcript}")
+                logger.debug("Now listening for user response")
+                await websocket.send_json({"type": "listening"})
+
+                logger.debug(
+                    "Waiting for the answer to question %d", question_counter + 1
+                )
+                answer_transcript = await stt.listen()
+            logger.info("Received answer: %s", answer_transcript)
+            timings.stt_open = stt.timings["stt_open"]
+            timings.speech_to_commit = stt.timings["speech_to_commit"]
 
             # analyze response
             await websocket.send_json({"type": "analyzing"})
-            if llm == "openai":
-                mood, mood_confidence = await openai_analyze_mood(
-                    qa_pairs, moods, question, answer_transcript
+            started = time.perf_counter()
+            # no next question is needed after the last answer
+            is_last_question = question_counter + 1 >= max_questions
+            if mode == "combined" and not is_last_question:
+                (
+                    mood,
+                    mood_confidence,
+                    next_question,
+                ) = await provider.analyze_mood_and_next_question(
+                    qa_pairs, moods, question, answer_transcript, max_depth
                 )
             else:
-                mood, mood_confidence = await gemini_analyze_mood(
+                mood, mood_confidence = await provider.analyze_mood(
                     qa_pairs, moods, question, answer_transcript
                 )
+            # includes the next question in combined mode
+            timings.mood_analysis = time.perf_counter() - started
 
             # determine depth of detected emotion
-            current_depth = get_emotion_depth(mood, wheel)
-            depth_name = (
-                ["unknown", "primary", "secondary", "tertiary"][current_depth]
-                if current_depth <= 3
-                else "unknown"
-            )
-
-            print(
-                f"[AGENT] Detected mood: {mood} ({depth_name} level), confidence: {mood_confidence}"
+            lineage = get_emotion_lineage(mood)
+            current_depth = lineage.depth if lineage else 0
+            depth_name = lineage.depth_name if lineage else "unknown"
+
+            logger.info(
+                "Detected mood: %s (%s level), confidence: %s",
+                mood,
+                depth_name,
+                mood_confidence,
             )
+            if lineage and lineage.ambiguous:
+                logger.info("Mood %s appears on several paths: %s", mood, lineage.paths)
 
             # go to next question
             qa_pairs.append((question, answer_transcript))
             moods.append((mood, mood_confidence))
-            qa_pairs_with_moods.append(
-                QAMoodPair(
-                    question=question,
-                    answer=answer_transcript,
-                    mood=mood,
-                    confidence=mood_confidence,
-                    depth=current_depth,
+            qa_pair = QAMoodPair(
+                question=question,
+                answer=answer_transcript,
+                mood=mood,
+                confidence=mood_confidence,
+                depth=current_depth,
+                timings=timings,
+            )
+            record_turn_timings(llm, timings)
+            qa_pairs_with_moods.append(qa_pair)
+            turn_writes.append(
+                asyncio.create_task(
+                    save_agent_turn(
+                        session_id, session_created_at, question_counter, qa_pair
+                    )
                 )
             )
             question_counter += 1
 
         # determine final depth
-        final_depth = get_emotion_depth(mood, wheel)
-        depth_name = (
-            ["unknown", "primary", "secondary", "tertiary"][final_depth]
-            if final_depth <= 3
-            else "unknown"
-        )
+        # the last turn already looked up the lineage of the final mood
+        final_depth = current_depth
 
         if mood_confidence >= 0.9 and final_depth >= max_depth:
-            print(
-                f"[AGENT] Mood detected with high confidence at maximum depth: {mood} ({depth_name})"
+            logger.info(
+                "Mood detected with high confidence at maximum depth: %s (%s)",
+                mood,
+                depth_name,
             )
             await websocket.send_json(
                 {"type": "result", "mood": mood, "confidence": mood_confidence}
             )
         elif mood_confidence >= 0.9:
-            print(
-                f"[AGENT] Mood detected with high confidence but not at max depth: {mood} ({depth_name}, depth {final_depth}/{max_depth})"
+            logger.info(
+                "Mood detected with high confidence but not at max depth: "
+                "%s (%s, depth %d/%d)",
+                mood,
+                depth_name,
+                final_depth,
+                max_depth,
             )
             await websocket.send_json(
                 {"type": "result", "mood": mood, "confidence": mood_confidence}
             )
         else:
-            print(
-                f"[AGENT] Max questions reached. Best mood: {mood} ({depth_name}), confidence: {mood_confidence}"
+            logger.info(
+                "Max questions reached. Best mood: %s (%s), confidence: %s",
+                mood,
+                depth_name,
+                mood_confidence,
             )
             # send the best mood, even if not 0.9 confidence
             await websocket.send_json(
@@ -424,16 +490,18 @@ async def websocket_agent(websocket: WebSocket):
         await asyncio.sleep(0.5)
 
     except WebSocketDisconnect as e:
-        print(f"[AGENT] Websocket disconnected: {e}")
+        logger.info("Websocket disconnected: %s", e)
     except Exception as e:
-        print(f"[AGENT] error during websocket communication: {e}")
+        logger.exception("Error during websocket communication: %s", e)
         try:
             await websocket.send_json({"type": "error", "message": str(e)})
         except Exception:
             pass
     finally:
         # cleanup
-        print("[AGENT] Cleaning up websocket session")
+        logger.debug("Cleaning up websocket session")
+        if "stt" in locals():
+            await stt.close()
         if "receive_task" in locals():
             receive_task.cancel()
             try:
@@ -441,23 +509,42 @@ async def websocket_agent(websocket: WebSocket):
             except (asyncio.CancelledError, WebSocketDisconnect):
                 pass
             except Exception as e:
-                print(f"[AGENT] Error during receive_task cleanup: {e}")
+                logger.error("Error during receive_task cleanup: %s", e)
+
+        if "turn_writes" in locals():
+            # failed turn writes are logged by save_agent_turn
+            await asyncio.gather(*turn_writes, return_exceptions=True)
 
-        # upload session data in background (works for complete and incomplete sessions)
+        # store the session summary (works for complete and incomplete sessions)
         if "qa_pairs_with_moods" in locals():
-            upload_thread = threading.Thread(
-                target=upload_session_in_background,
-                args=(
-                    audioBytes,
-                    session_id,
-                    session_timestamp,
-                    qa_pairs_with_moods,
-                    mood if "mood" in locals() else "unknown",
-                    mood_confidence if "mood_confidence" in locals() else 0.0,
-                    final_depth if "final_depth" in locals() else 0,
-                    question_counter if "question_counter" in locals() else 0,
-                ),
-                daemon=True,
+            try:
+                session = AgentSession(
+                    session_id=session_id,
+                    created_at=session_created_at,
+                    qa_pairs=qa_pairs_with_moods,
+                    final_mood=mood if "mood" in locals() else "unknown",
+                    final_confidence=(
+                        mood_confidence if "mood_confidence" in locals() else 0.0
+                    ),
+                    final_depth=final_depth if "final_depth" in locals() else 0,
+                    question_count=question_counter,
+                )
+                await finalize_agent_session(session)
+            except ValidationError as e:
+                # sessions that ended before a full turn keep only their turns
+                logger.info("Not finalizing incomplete session: %s", e)
+            except Exception as e:
+                logger.error("Failed to finalize session: %s", e)
+
+        # queue session audio for upload
+        if "qa_pairs_with_moods" in locals() and recorder:
+            job = SessionUploadJob(
+                session_id=session_id, session_timestamp=session_timestamp, llm=llm
             )
-            upload_thread.start()
-            print(f"[AGENT] Started background upload for session: {session_id}")
+            try:
+                await asyncio.to_thread(get_upload_queue().submit, job, recorder)
+            except Exception as e:
+                logger.error("Failed to queue upload: %s", e)
+        elif "qa_pairs_with_moods" in locals():
+            logger.info("No audio data to upload")
+        recorder.close()
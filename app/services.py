@@ -1,59 +1,192 @@
-import io
+import logging
 import os
+import tempfile
+from collections.abc import Iterable
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO
 
 from fastapi import HTTPException
-from pydub import AudioSegment
+from google.cloud import firestore
 
-from app.deps import get_firestore_client, get_storage_client
-from app.models import AgentSession
+from app.audio_encoding import AudioEncoder, get_audio_encoder
+from app.audio_upload import StreamingAudioUpload
+from app.deps import (
+    get_firestore_async_client,
+    get_firestore_client,
+    get_storage_client,
+)
+from app.models import AgentSession, QAMoodPair
 
+SESSIONS_COLLECTION = "sessions"
 
-# Upload agent session to Firestore
-def upload_agent_session(session: AgentSession):
+logger = logging.getLogger(__name__)
+
+
+# Persist one answered turn while the session is still running; the turn gets
+# its own document and the session document is merged in the same batch, so a
+# session that dies halfway still has everything answered so far
+async def save_agent_turn(
+    session_id: str, created_at: datetime, turn: int, qa_pair: QAMoodPair
+):
     try:
-        doc_ref = get_firestore_client().collection("sessions")
-        write_res = doc_ref.document(session.session_id).set(session.model_dump())
+        client = get_firestore_async_client()
+        session_ref = client.collection(SESSIONS_COLLECTION).document(session_id)
+        batch = client.batch()
+        batch.set(
+            session_ref.collection("turns").document(f"{turn:02d}"),
+            {**qa_pair.model_dump(), "turn": turn},
+        )
+        batch.set(
+            session_ref,
+            {
+                "session_id": session_id,
+                "created_at": created_at,
+                "status": "in_progress",
+                "question_count": turn + 1,
+                "updated_at": firestore.SERVER_TIMESTAMP,
+            },
+            merge=True,
+        )
+        await batch.commit()
+        logger.debug("Saved turn %d of session %s", turn, session_id)
+    except Exception as e:
+        logger.error("Error saving turn %d of session %s: %s", turn, session_id, e)
+        raise HTTPException(
+            status_code=400, detail=f"Failed to save turn to Firestore: {e}"
+        )
+
+
+# Merge the final summary into the session document, turns are left as written
+async def finalize_agent_session(session: AgentSession):
+    try:
+        session_ref = (
+            get_firestore_async_client()
+            .collection(SESSIONS_COLLECTION)
+            .document(session.session_id)
+        )
+        # audio_url is left out until the audio upload sets it
+        write_res = await session_ref.set(
+            {
+                **session.model_dump(exclude_none=True),
+                "status": "complete",
+                "updated_at": firestore.SERVER_TIMESTAMP,
+            },
+            merge=True,
+        )
 
         if not write_res.update_time:
             raise HTTPException(
-                status_code=400, detail="Failed to upload session to Firestore."
+                status_code=400, detail="Failed to finalize session in Firestore."
             )
 
-        print(f"[FIRESTORE] Uploaded session: {session.session_id}")
+        logger.info("Finalized session %s", session.session_id)
         return {"status": 200, "session_id": session.session_id}
     except Exception as e:
-        print(f"[FIRESTORE] Error uploading session: {e}")
+        logger.error("Error finalizing session: %s", e)
+        raise HTTPException(
+            status_code=400, detail=f"Failed to finalize in Firestore: {e}"
+        )
+
+
+# Point the session document at its uploaded audio, runs on the upload workers
+def attach_agent_session_audio(session_id: str, audio_url: str):
+    try:
+        doc_ref = get_firestore_client().collection(SESSIONS_COLLECTION)
+        write_res = doc_ref.document(session_id).set(
+            {"audio_url": audio_url}, merge=True
+        )
+
+        if not write_res.update_time:
+            raise HTTPException(
+                status_code=400, detail="Failed to attach audio in Firestore."
+            )
+
+        logger.info("Attached audio to session %s", session_id)
+        return {"status": 200, "session_id": session_id}
+    except Exception as e:
+        logger.error("Error attaching audio: %s", e)
         raise HTTPException(
-            status_code=400, detail=f"Failed to upload to Firestore: {e}"
+            status_code=400, detail=f"Failed to attach audio in Firestore: {e}"
         )
 
 
-# convert LINEAR16 audio to FLAC
-def linear_16_to_flac(audio_bytes: bytes) -> bytes:
-    audio = AudioSegment(data=audio_bytes, sample_width=2, frame_rate=16000, channels=1)
-    out_io = io.BytesIO()
-    audio.export(out_io, format="flac")
-    return out_io.getvalue()
+# read size when streaming a spooled recording into the encoder
+AUDIO_READ_CHUNK_BYTES = 64 * 1024
+
+
+# compress LINEAR16 audio, streamed chunk by chunk into output
+def encode_linear_16(
+    pcm_chunks: Iterable[bytes],
+    output: BinaryIO,
+    make_encoder: type[AudioEncoder] | None = None,
+):
+    encoder = (make_encoder or get_audio_encoder())(output)
+    for chunk in pcm_chunks:
+        encoder.feed(chunk)
+    encoder.finish()
+
+
+def agent_audio_filename(session_id: str, timestamp: str) -> str:
+    return f"{session_id}_{timestamp}.{get_audio_encoder().extension}"
+
+
+def agent_audio_blob(session_id: str, timestamp: str):
+    bucket = get_storage_client().bucket(os.getenv("BUCKET_NAME"))
+    return bucket.blob(f"audio/agent/{agent_audio_filename(session_id, timestamp)}")
+
+
+def agent_audio_url(session_id: str, timestamp: str) -> str:
+    return (
+        f"{os.getenv('BUCKET_URL')}agent/{agent_audio_filename(session_id, timestamp)}"
+    )
+
+
+# open a resumable upload that is fed while the session is running
+def start_agent_audio_upload(session_id: str, timestamp: str) -> StreamingAudioUpload:
+    return StreamingAudioUpload(agent_audio_blob(session_id, timestamp))
 
 
 # Upload audio file to bucket for agent session
 def upload_agent_audio_to_bucket(
-    audio_bytes: bytes, session_id: str, timestamp: str
+    audio_path: Path,
+    session_id: str,
+    timestamp: str,
+    upload: StreamingAudioUpload | None = None,
 ) -> str:
-    if not audio_bytes or not session_id:
+    if not audio_path.exists() or not audio_path.stat().st_size or not session_id:
         raise HTTPException(status_code=400, detail="No audio data provided.")
 
-    flac_bytes = linear_16_to_flac(audio_bytes)
-    bucket = get_storage_client().bucket(os.getenv("BUCKET_NAME"))
+    filename = agent_audio_filename(session_id, timestamp)
 
-    filename = f"{session_id}_{timestamp}"
-    blob_flac = bucket.blob(f"audio/agent/{filename}.flac")
+    # audio streamed during the session only needs its upload finalized
+    if upload is not None:
+        try:
+            upload.finalize()
+            logger.info("Finalized streamed audio: %s", filename)
+            return agent_audio_url(session_id, timestamp)
+        except Exception as e:
+            logger.warning("Streamed upload failed, uploading recording: %s", e)
 
-    try:
-        blob_flac.upload_from_string(flac_bytes, content_type="audio/flac")
-        print(f"[BUCKET] Uploaded audio: {filename}.flac")
-    except Exception as e:
-        print(f"[BUCKET] Error uploading audio: {e}")
-        raise HTTPException(status_code=400, detail=f"Failed to upload to Bucket: {e}")
+    encoder = get_audio_encoder()
+    blob = agent_audio_blob(session_id, timestamp)
+
+    with tempfile.TemporaryFile() as encoded_file, audio_path.open("rb") as pcm_file:
+        try:
+            pcm_chunks = iter(lambda: pcm_file.read(AUDIO_READ_CHUNK_BYTES), b"")
+            encode_linear_16(pcm_chunks, encoded_file, encoder)
+        except Exception as e:
+            logger.error("Error encoding audio: %s", e)
+            raise HTTPException(status_code=400, detail=f"Failed to encode audio: {e}")
+
+        try:
+            encoded_file.seek(0)
+            blob.upload_from_file(encoded_file, content_type=encoder.content_type)
+            logger.info("Uploaded audio: %s", filename)
+        except Exception as e:
+            logger.error("Error uploading audio: %s", e)
+            raise HTTPException(
+                status_code=400, detail=f"Failed to upload to Bucket: {e}"
+            )
 
-    return f"{os.getenv('BUCKET_URL')}agent/{filename}.flac"
+    return agent_audio_url(session_id, timestamp)
@@ -0,0 +1,296 @@
+import asyncio
+import base64
+import logging
+import os
+import time
+
+from elevenlabs import RealtimeAudioOptions, RealtimeEvents
+from elevenlabs.realtime.scribe import AudioFormat, CommitStrategy
+from fastapi import WebSocket
+
+from app.audio_buffer import BYTES_PER_SECOND, AudioRingBuffer
+from app.deps import get_elevenlabs
+from app.vad import VoiceActivityDetector
+
+logger = logging.getLogger(__name__)
+
+# largest audio message sent to STT, reached when catching up on a backlog
+STT_SEND_MAX_BYTES = BYTES_PER_SECOND // 2
+
+STT_OPTIONS = RealtimeAudioOptions(
+    model_id="scribe_v2_realtime",
+    audio_format=AudioFormat.PCM_16000,
+    sample_rate=16000,
+    include_timestamps=True,
+    commit_strategy=CommitStrategy.VAD,
+    vad_silence_threshold_secs=1.5,
+    vad_threshold=0.4,
+    min_speech_duration_ms=100,
+    min_silence_duration_ms=100,
+)
+
+# end-of-answer detection and silence skipping done locally, see app.vad; the
+# server then only commits when told to
+STT_LOCAL_VAD = os.getenv("STT_LOCAL_VAD", "true").lower() in ("1", "true")
+
+# errors after which the server ends the session; the SDK also reports
+# per-message ones (commit_throttled, insufficient_audio_activity, ...) as
+# errors, the connection stays usable after those
+STT_FATAL_ERRORS = {
+    RealtimeEvents.AUTH_ERROR,
+    RealtimeEvents.QUOTA_EXCEEDED,
+    RealtimeEvents.UNACCEPTED_TERMS,
+    RealtimeEvents.RESOURCE_EXHAUSTED,
+    RealtimeEvents.SESSION_TIME_LIMIT_EXCEEDED,
+    RealtimeEvents.TRANSCRIBER_ERROR,
+}
+
+# the server did not take the last manual commit, the local VAD commits again
+STT_REJECTED_COMMIT_ERRORS = {
+    RealtimeEvents.COMMIT_THROTTLED,
+    RealtimeEvents.INSUFFICIENT_AUDIO_ACTIVITY,
+}
+
+# a turn without a committed answer after this long gets a forced commit, and
+# after STT_COMMIT_GRACE_SECONDS more returns whatever was transcribed so far
+STT_TURN_TIMEOUT_SECONDS = float(os.getenv("STT_TURN_TIMEOUT_SECONDS", 90))
+STT_COMMIT_GRACE_SECONDS = 2.0
+
+STT_MANUAL_OPTIONS = RealtimeAudioOptions(
+    model_id="scribe_v2_realtime",
+    audio_format=AudioFormat.PCM_16000,
+    sample_rate=16000,
+    include_timestamps=True,
+    commit_strategy=CommitStrategy.MANUAL,
+)
+
+
+# keeps one realtime STT connection open across all turns of a websocket session
+class STTSessionManager:
+    def __init__(
+        self,
+        websocket: WebSocket,
+        audio_buffer: AudioRingBuffer,
+        res_queue: asyncio.Queue,
+        local_vad: bool = STT_LOCAL_VAD,
+    ):
+        self.websocket = websocket
+        self.audio_buffer = audio_buffer
+        self.res_queue = res_queue
+        self.vad = VoiceActivityDetector() if local_vad else None
+        self._connecting: asyncio.Task | None = None
+        self._connection_lost = asyncio.Event()
+        # replaced connections being closed in the background
+        self._closing: set[asyncio.Task] = set()
+        # transcript and end-of-answer event of the turn being listened to
+        self._answer: dict | None = None
+        self._answer_ready: asyncio.Event | None = None
+        # set once the user starts talking in the current turn, used for barge-in
+        self.speech_started = asyncio.Event()
+        # stt_open (seconds the connection used by the turn took to open, None
+        # when it was already open) and speech_to_commit of the last turn
+        self.timings: dict[str, float | None] = {}
+        self._connect_seconds: float | None = None
+        # estimated wall time the user stopped talking
+        self._speech_ended_at: float | None = None
+
+    # open the connection in the background, e.g. while the question is playing
+    def prewarm(self):
+        if self._needs_connection():
+            logger.info("Opening ElevenLabs STT connection")
+            if self._connecting is not None:
+                # a lost connection may still have its socket open
+                closing = asyncio.create_task(self._close_connection(self._connecting))
+                self._closing.add(closing)
+                closing.add_done_callback(self._closing.discard)
+            self._connection_lost = asyncio.Event()
+            self._connecting = asyncio.create_task(self._connect())
+
+    def _needs_connection(self) -> bool:
+        if self._connecting is None or self._connection_lost.is_set():
+            return True
+        # a failed attempt is retried on the next turn
+        return self._connecting.done() and (
+            self._connecting.cancelled() or self._connecting.exception() is not None
+        )
+
+    async def _connect(self):
+        options = STT_MANUAL_OPTIONS if self.vad else STT_OPTIONS
+        started = time.perf_counter()
+        connection = await get_elevenlabs().speech_to_text.realtime.connect(options)
+        self._connect_seconds = time.perf_counter() - started
+        connection_lost = self._connection_lost
+
+        def on_session_started(data):
+            logger.info("STT session started: %s", data.get("session_id", "unknown"))
+
+        def on_partial_transcript(data):
+            # audio is only sent while listening, ignore anything in between turns
+            if self._answer is None:
+                return
+            self._answer["partial"] = data.get("text", "")
+            if data.get("text"):
+                self.speech_started.set()
+                if self.vad is None:
+                    # the server's VAD decides, the last partial is as close
+                    # to the end of speech as we can tell
+                    self._speech_ended_at = time.perf_counter()
+            transcript_data = {
+                "type": "transcript",
+                "transcript": data.get("text", ""),
+                "is_final": False,
+            }
+            self.res_queue.put_nowait(transcript_data)
+            # send to frontend
+            asyncio.create_task(self.websocket.send_json(transcript_data))
+
+        def on_committed_transcript(data):
+            if self._answer is None:
+                return
+            text = data.get("text", "")
+            self._answer["current"] += text
+            self._answer["partial"] = ""
+            if self._speech_ended_at is not None:
+                self.timings["speech_to_commit"] = (
+                    time.perf_counter() - self._speech_ended_at
+                )
+            transcript_data = {
+                "type": "transcript",
+                "transcript": text,
+                "is_final": True,
+            }
+            self.res_queue.put_nowait(transcript_data)
+            # send to frontend
+            asyncio.create_task(self.websocket.send_json(transcript_data))
+            # signal that answer is ready (VAD detected end of speech)
+            logger.debug("Transcript committed, answer complete: %s", text)
+            self._answer_ready.set()
+
+        def on_error(error):
+            if error.get("message_type") in STT_FATAL_ERRORS:
+                logger.error("STT error: %s", error)
+                connection_lost.set()
+            else:
+                logger.warning("STT error: %s", error)
+                rejected = error.get("message_type") in STT_REJECTED_COMMIT_ERRORS
+                if rejected and self.vad is not None and self._answer is not None:
+                    self.vad.commit_failed()
+
+        def on_close():
+            logger.warning("STT connection closed by server")
+            connection_lost.set()
+
+        connection.on(RealtimeEvents.SESSION_STARTED, on_session_started)
+        connection.on(RealtimeEvents.PARTIAL_TRANSCRIPT, on_partial_transcript)
+        connection.on(RealtimeEvents.COMMITTED_TRANSCRIPT, on_committed_transcript)
+        connection.on(RealtimeEvents.ERROR, on_error)
+        connection.on(RealtimeEvents.CLOSE, on_close)
+        return connection
+
+    # sends buffered audio as it arrives, a backlog goes out in larger messages;
+    # listen() cancels this once the answer is in or the connection drops
+    async def _send_audio(self, connection):
+        with self.audio_buffer.reading():
+            while (
+                audio := await self.audio_buffer.read(STT_SEND_MAX_BYTES)
+            ) is not None:
+                end_of_turn = False
+                if self.vad is not None:
+                    # only speech and its edges are sent, long silences are skipped
+                    audio, end_of_turn, speech_started = self.vad.process(audio)
+                    if speech_started:
+                        self.speech_started.set()
+                if audio:
+                    # encoded before awaiting, the view is only valid until a write
+                    audio_base64 = base64.b64encode(audio).decode("utf-8")
+                    await connection.send({"audio_base_64": audio_base64})
+                if end_of_turn:
+                    logger.debug("Local VAD detected the end of the answer, committing")
+                    self._speech_ended_at = (
+                        time.perf_counter() - self.vad.commit_delays_ms[-1] / 1000
+                    )
+                    await connection.commit()
+
+    # start listening without waiting for the answer, e.g. while the question
+    # is still playing; speech_started is reset before this returns
+    def listen_in_background(self) -> asyncio.Task:
+        self.speech_started.clear()
+        return asyncio.create_task(self.listen())
+
+    # stream audio until the user's answer is committed, returns the transcript
+    async def listen(self) -> str:
+        self.speech_started.clear()
+        self.timings = {"stt_open": None, "speech_to_commit": None}
+        self._speech_ended_at = None
+        self.prewarm()
+        connection = await self._connecting
+        self.timings["stt_open"], self._connect_seconds = self._connect_seconds, None
+
+        answer = {"current": "", "partial": ""}
+        answer_ready = asyncio.Event()
+        if self.vad is not None:
+            self.vad.start_turn()
+        self._answer, self._answer_ready = answer, answer_ready
+
+        sender = asyncio.create_task(self._send_audio(connection))
+        waiters = [
+            asyncio.create_task(answer_ready.wait()),
+            asyncio.create_task(self._connection_lost.wait()),
+        ]
+        try:
+            # wait for either answer_ready or the connection dropping
+            done, _ = await asyncio.wait(
+                waiters,
+                timeout=STT_TURN_TIMEOUT_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                logger.warning(
+                    "No answer committed after %.0fs, forcing a commit",
+                    STT_TURN_TIMEOUT_SECONDS,
+                )
+                try:
+                    await connection.commit()
+                except Exception as e:
+                    logger.warning("Forced STT commit failed: %s", e)
+                await asyncio.wait(
+                    waiters,
+                    timeout=STT_COMMIT_GRACE_SECONDS,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+        finally:
+            self._answer, self._answer_ready = None, None
+            for task in [sender, *waiters]:
+                task.cancel()
+            await asyncio.gather(sender, *waiters, return_exceptions=True)
+
+        if not answer_ready.is_set():
+            logger.warning(
+                "STT connection lost or turn timed out before the answer was "
+                "committed, using the partial transcript"
+            )
+            return answer["current"] + answer["partial"]
+        return answer["current"]
+
+    async def close(self):
+        if self.vad is not None:
+            logger.info("Local VAD stats: %s", self.vad.stats())
+        await asyncio.gather(*self._closing, return_exceptions=True)
+        if self._connecting is None:
+            return
+        logger.debug("Closing STT session")
+        connecting, self._connecting = self._connecting, None
+        await self._close_connection(connecting)
+
+    async def _close_connection(self, connecting: asyncio.Task):
+        if not connecting.done():
+            connecting.cancel()
+        try:
+            connection = await connecting
+        except (asyncio.CancelledError, Exception) as e:
+            logger.debug("STT connection was not open: %r", e)
+            return
+        try:
+            await connection.close()
+        except Exception as e:
+            logger.debug("Closing STT connection failed: %r", e)
@@ -0,0 +1,284 @@
+import asyncio
+import base64
+import json
+import logging
+import os
+import struct
+import time
+from collections.abc import AsyncIterator, Callable
+
+from elevenlabs import VoiceSettings
+from fastapi import WebSocket
+from fastapi.websockets import WebSocketState
+from websockets.asyncio.client import connect as websocket_connect
+
+from app.deps import get_async_elevenlabs
+from app.models import TTSStats
+from app.tts_cache import get_tts_cache
+
+logger = logging.getLogger(__name__)
+
+# Yaron: I3MrSgiotopLY33bjEX7, Erik: VWoIQlDpnFjY9kfJ11dz, Adam: pNInz6obpgDQGcFmaJgB
+VOICE_ID = "I3MrSgiotopLY33bjEX7"
+MODEL_ID = "eleven_multilingual_v2"
+OUTPUT_FORMAT = "mp3_22050_32"
+VOICE_SETTINGS = VoiceSettings(
+    stability=0.0,
+    similarity_boost=1.0,
+    style=0.0,
+    use_speaker_boost=True,
+    speed=1.0,
+)
+
+ELEVENLABS_WS_URL = os.getenv("ELEVENLABS_WS_URL", "wss://api.elevenlabs.io")
+
+# characters that end a chunk we can hand to the TTS input stream
+TEXT_SPLITTERS = (".", ",", "?", "!", ";", ":", "—", "-", "(", ")", " ")
+
+
+# binary question audio frame: version, payload kind, sequence number, then raw bytes
+AUDIO_FRAME_HEADER = struct.Struct("!BBH")
+AUDIO_FRAME_VERSION = 1
+AUDIO_FRAME_MP3 = 1
+
+
+def encode_audio_frame(chunk: bytes, seq: int, kind: int = AUDIO_FRAME_MP3) -> bytes:
+    return AUDIO_FRAME_HEADER.pack(AUDIO_FRAME_VERSION, kind, seq & 0xFFFF) + chunk
+
+
+# binary frames for clients that negotiated them, base64 JSON for older clients
+async def send_question_audio(
+    websocket: WebSocket, chunk: bytes, seq: int, binary_audio: bool
+):
+    if binary_audio:
+        await websocket.send_bytes(encode_audio_frame(chunk, seq))
+    else:
+        audio_base64 = base64.b64encode(chunk).decode("utf-8")
+        await websocket.send_json(
+            {"type": "question_audio_base_64", "chunk": audio_base64}
+        )
+
+
+# chunks buffered between the ElevenLabs stream and a slow client
+TTS_BUFFER_CHUNKS = 8
+# chunk size used when replaying cached audio
+CACHE_REPLAY_CHUNK_BYTES = 4096
+
+
+async def replay_cached_audio(
+    audio: bytes,
+    websocket: WebSocket,
+    binary_audio: bool,
+    stats: TTSStats,
+    start: float,
+    on_first_chunk: Callable[[], None] | None = None,
+):
+    for offset in range(0, len(audio), CACHE_REPLAY_CHUNK_BYTES):
+        if websocket.application_state != WebSocketState.CONNECTED:
+            logger.info("Client disconnected, stopping cached replay")
+            return
+        chunk = audio[offset : offset + CACHE_REPLAY_CHUNK_BYTES]
+        if stats.time_to_first_chunk is None:
+            stats.time_to_first_chunk = time.perf_counter() - start
+            if on_first_chunk:
+                on_first_chunk()
+        await send_question_audio(websocket, chunk, stats.chunk_count, binary_audio)
+        stats.chunk_count += 1
+        stats.byte_count += len(chunk)
+    stats.completed = True
+
+
+# on_first_chunk is called just before the first audio chunk goes out
+async def tts_elevenlabs_session(
+    text: str,
+    websocket: WebSocket,
+    binary_audio: bool = False,
+    on_first_chunk: Callable[[], None] | None = None,
+) -> TTSStats:
+    start = time.perf_counter()
+    stats = TTSStats()
+
+    cache = get_tts_cache()
+    cache_key = cache.make_key(VOICE_ID, MODEL_ID, OUTPUT_FORMAT, VOICE_SETTINGS, text)
+    cached_audio = await cache.get(cache_key)
+    if cached_audio is not None:
+        stats.cached = True
+        await replay_cached_audio(
+            cached_audio, websocket, binary_audio, stats, start, on_first_chunk
+        )
+        stats.total_time = time.perf_counter() - start
+        logger.debug(
+            "TTS cache hit, replayed %d bytes in %.3fs (%s)",
+            stats.byte_count,
+            stats.total_time,
+            cache.stats(),
+        )
+        return stats
+
+    # keep the synthesized audio so a complete stream can be cached
+    chunks: list[bytes] = []
+    # bounded so a slow client pauses the read from ElevenLabs instead of piling up
+    buffer: asyncio.Queue = asyncio.Queue(maxsize=TTS_BUFFER_CHUNKS)
+
+    async def read_stream():
+        try:
+            async for chunk in get_async_elevenlabs().text_to_speech.stream(
+                voice_id=VOICE_ID,
+                output_format=OUTPUT_FORMAT,
+                text=text,
+                model_id=MODEL_ID,
+                voice_settings=VOICE_SETTINGS,
+            ):
+                if chunk:
+                    await buffer.put(chunk)
+        except Exception as e:
+            await buffer.put(e)
+            return
+        await buffer.put(None)
+
+    reader = asyncio.create_task(read_stream())
+    try:
+        # send question audio to client
+        while (chunk := await buffer.get()) is not None:
+            if isinstance(chunk, Exception):
+                raise chunk
+            if websocket.application_state != WebSocketState.CONNECTED:
+                logger.info("Client disconnected, stopping synthesis")
+                break
+            if stats.time_to_first_chunk is None:
+                stats.time_to_first_chunk = time.perf_counter() - start
+                if on_first_chunk:
+                    on_first_chunk()
+            await send_question_audio(websocket, chunk, stats.chunk_count, binary_audio)
+            chunks.append(chunk)
+            stats.chunk_count += 1
+            stats.byte_count += len(chunk)
+        else:
+            stats.completed = True
+            await cache.put(cache_key, b"".join(chunks))
+    finally:
+        reader.cancel()
+        try:
+            await reader
+        except asyncio.CancelledError:
+            pass
+
+    stats.total_time = time.perf_counter() - start
+    logger.debug(
+        "TTS first chunk after %.3fs, total %.3fs, %d chunks, %d bytes",
+        stats.time_to_first_chunk or 0.0,
+        stats.total_time,
+        stats.chunk_count,
+        stats.byte_count,
+    )
+    return stats
+
+
+# group LLM token deltas into word-aligned chunks for the TTS input stream
+async def text_chunker(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    buffer = ""
+    async for text in chunks:
+        buffer += text
+        split_at = max(buffer.rfind(splitter) for splitter in TEXT_SPLITTERS)
+        if split_at >= 0:
+            yield buffer[: split_at + 1]
+            buffer = buffer[split_at + 1 :]
+    if buffer:
+        yield buffer
+
+
+# speak text while it is still being generated; the stats carry the full text
+# and text_time, when the text source (the LLM) finished
+async def tts_elevenlabs_input_stream(
+    text_chunks: AsyncIterator[str],
+    websocket: WebSocket,
+    binary_audio: bool = False,
+    on_first_chunk: Callable[[], None] | None = None,
+) -> TTSStats:
+    url = (
+        f"{ELEVENLABS_WS_URL}/v1/text-to-speech/{VOICE_ID}/stream-input"
+        f"?model_id={MODEL_ID}&output_format={OUTPUT_FORMAT}"
+    )
+    start = time.perf_counter()
+    stats = TTSStats()
+    text_parts: list[str] = []
+
+    async with websocket_connect(
+        url, additional_headers={"xi-api-key": os.getenv("ELEVENLABS_API_KEY", "")}
+    ) as tts_ws:
+        # the first message opens the stream and carries the voice settings
+        await tts_ws.send(
+            json.dumps(
+                {
+                    "text": " ",
+                    "voice_settings": VOICE_SETTINGS.model_dump(exclude_none=True),
+                    "generation_config": {"chunk_length_schedule": [50, 90, 120]},
+                }
+            )
+        )
+
+        async def send_text():
+            async for text in text_chunker(text_chunks):
+                text_parts.append(text)
+                await tts_ws.send(json.dumps({"text": text}))
+            stats.text_time = time.perf_counter() - start
+            # empty text flushes the remaining audio and closes the stream
+            await tts_ws.send(json.dumps({"text": ""}))
+
+        async def receive_audio():
+            async for message in tts_ws:
+                if websocket.application_state != WebSocketState.CONNECTED:
+                    logger.info("Client disconnected, stopping input stream")
+                    return
+                data = json.loads(message)
+                audio = data.get("audio")
+                if audio and stats.time_to_first_chunk is None:
+                    stats.time_to_first_chunk = time.perf_counter() - start
+                    if on_first_chunk:
+                        on_first_chunk()
+                if audio and binary_audio:
+                    chunk = base64.b64decode(audio)
+                    await websocket.send_bytes(
+                        encode_audio_frame(chunk, stats.chunk_count)
+                    )
+                    stats.byte_count += len(chunk)
+                elif audio:
+                    # audio already arrives base64 encoded, forward it as is
+                    await websocket.send_json(
+                        {"type": "question_audio_base_64", "chunk": audio}
+                    )
+                    stats.byte_count += len(audio) * 3 // 4 - audio[-2:].count("=")
+                if audio:
+                    stats.chunk_count += 1
+                if data.get("isFinal"):
+                    stats.completed = True
+                    return
+
+        sender = asyncio.create_task(send_text())
+        receiver = asyncio.create_task(receive_audio())
+        try:
+            # an LLM error stops the text before the closing message, so the
+            # final audio would never come: it ends the stream right away
+            pending = {sender, receiver}
+            while receiver in pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    task.result()
+        finally:
+            sender.cancel()
+            receiver.cancel()
+            await asyncio.gather(sender, receiver, return_exceptions=True)
+
+    stats.text = "".join(text_parts).strip().strip('"')
+    stats.total_time = time.perf_counter() - start
+    logger.debug(
+        "TTS input stream first chunk after %.3fs, text done after %.3fs, "
+        "total %.3fs, %d chunks",
+        stats.time_to_first_chunk or 0.0,
+        stats.text_time or 0.0,
+        stats.total_time,
+        stats.chunk_count,
+    )
+    return stats
@@ -0,0 +1,197 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from elevenlabs import VoiceSettings
+
+logger = logging.getLogger(__name__)
+
+
+# content-addressed question audio: in-memory LRU plus an optional on-disk tier
+# evicted oldest-first once it grows past max_disk_bytes. The disk tier runs in
+# worker threads and is best effort, an OSError there is logged and the entry
+# stays in memory only.
+class TTSCache:
+    def __init__(
+        self,
+        max_memory_bytes: int,
+        disk_dir: str | None = None,
+        max_disk_bytes: int = 0,
+    ):
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_bytes = 0
+
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        # key -> size of the entries on disk, least recently used first, so
+        # eviction never has to scan the directory
+        self._disk_index: OrderedDict[str, int] = OrderedDict()
+        self._disk_bytes = 0
+        # disk reads and writes of different sessions run in parallel threads
+        self._disk_lock = threading.Lock()
+        if self.disk_dir:
+            try:
+                self.disk_dir.mkdir(parents=True, exist_ok=True)
+                for path, size, _ in sorted(
+                    self._disk_entries(), key=lambda entry: entry[2]
+                ):
+                    self._disk_index[path.stem] = size
+                    self._disk_bytes += size
+            except OSError as e:
+                logger.warning("TTS disk cache disabled, memory only: %s", e)
+                self.disk_dir = None
+
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    @staticmethod
+    def make_key(
+        voice_id: str,
+        model_id: str,
+        output_format: str,
+        voice_settings: VoiceSettings,
+        text: str,
+    ) -> str:
+        payload = json.dumps(
+            {
+                "voice_id": voice_id,
+                "model_id": model_id,
+                "output_format": output_format,
+                "voice_settings": voice_settings.model_dump(),
+                "text": text,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> bytes | None:
+        audio = self._memory.get(key)
+        if audio is not None:
+            self._memory.move_to_end(key)
+        elif self.disk_dir:
+            audio = await asyncio.to_thread(self._read_disk, key)
+            if audio is not None:
+                self._put_memory(key, audio)
+
+        if audio is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.bytes_saved += len(audio)
+        return audio
+
+    async def put(self, key: str, audio: bytes):
+        if not audio:
+            return
+        self._put_memory(key, audio)
+        if self.disk_dir:
+            await asyncio.to_thread(self._write_disk, key, audio)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_bytes": self._disk_bytes,
+        }
+
+    def _put_memory(self, key: str, audio: bytes):
+        if len(audio) > self.max_memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        self._memory[key] = audio
+        self._memory_bytes += len(audio)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    # (path, size, mtime) of the entries on disk, skipping ones removed meanwhile
+    def _disk_entries(self) -> list[tuple[Path, int, float]]:
+        entries = []
+        for path in self.disk_dir.glob("*.audio"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _forget_disk(self, key: str):
+        with self._disk_lock:
+            size = self._disk_index.pop(key, None)
+            if size is not None:
+                self._disk_bytes -= size
+
+    def _read_disk(self, key: str) -> bytes | None:
+        with self._disk_lock:
+            if key not in self._disk_index:
+                return None
+            self._disk_index.move_to_end(key)
+        path = self.disk_dir / f"{key}.audio"
+        try:
+            audio = path.read_bytes()
+            # bump mtime so the next start orders the entry as recently used
+            path.touch()
+        except FileNotFoundError:
+            self._forget_disk(key)
+            return None
+        except OSError as e:
+            logger.warning("Reading TTS disk cache failed: %s", e)
+            return None
+        return audio
+
+    def _write_disk(self, key: str, audio: bytes):
+        with self._disk_lock:
+            if key in self._disk_index:
+                return
+        path = self.disk_dir / f"{key}.audio"
+        # write then rename so a crash never leaves a truncated entry behind
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            # the directory may have been removed since startup
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_bytes(audio)
+            tmp_path.replace(path)
+        except OSError as e:
+            logger.warning("Writing TTS disk cache failed: %s", e)
+            tmp_path.unlink(missing_ok=True)
+            return
+
+        evicted = []
+        with self._disk_lock:
+            if key not in self._disk_index:
+                self._disk_index[key] = len(audio)
+                self._disk_bytes += len(audio)
+            # the entry just written is last and always kept
+            while self._disk_bytes > self.max_disk_bytes and len(self._disk_index) > 1:
+                old_key, size = self._disk_index.popitem(last=False)
+                self._disk_bytes -= size
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                (self.disk_dir / f"{old_key}.audio").unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning("Evicting from TTS disk cache failed: %s", e)
+
+
+tts_cache = TTSCache(
+    max_memory_bytes=int(os.getenv("TTS_CACHE_MEMORY_BYTES", 32 * 1024 * 1024)),
+    disk_dir=os.getenv("TTS_CACHE_DIR"),
+    max_disk_bytes=int(os.getenv("TTS_CACHE_DISK_BYTES", 512 * 1024 * 1024)),
+)
+
+
+def get_tts_cache() -> TTSCache:
+    return tts_cache
@@ -0,0 +1,269 @@
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from collections.abc import Callable
+from pathlib import Path
+
+from pydantic import ValidationError
+
+from app.audio_upload import StreamingAudioUpload
+from app.log import session_id_var
+from app.metrics import observe_stage
+from app.models import SessionUploadJob
+from app.recorder import SessionRecorder
+from app.services import attach_agent_session_audio, upload_agent_audio_to_bucket
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_SPOOL_DIR = os.getenv(
+    "UPLOAD_SPOOL_DIR", str(Path(tempfile.gettempdir()) / "agent-uploads")
+)
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", 2))
+UPLOAD_MAX_ATTEMPTS = int(os.getenv("UPLOAD_MAX_ATTEMPTS", 5))
+# backoff before retry n is UPLOAD_RETRY_BASE_SECONDS * 2 ** (n - 1)
+UPLOAD_RETRY_BASE_SECONDS = float(os.getenv("UPLOAD_RETRY_BASE_SECONDS", 1.0))
+# how long shutdown waits for queued uploads before leaving them on disk; below
+# Cloud Run's 10s SIGTERM grace period so the drain ends before the kill
+UPLOAD_DRAIN_TIMEOUT_SECONDS = float(os.getenv("UPLOAD_DRAIN_TIMEOUT_SECONDS", 8.0))
+
+# a handler uploads one job; gets the spooled PCM path and the session's
+# streaming upload when it is still alive in this process
+UploadHandler = Callable[[SessionUploadJob, Path, StreamingAudioUpload | None], None]
+
+
+# upload the audio of one finished session and link it from the session document
+def upload_session_job(
+    job: SessionUploadJob, audio_path: Path, live_upload: StreamingAudioUpload | None
+):
+    if job.audio_url is None:
+        job.audio_url = upload_agent_audio_to_bucket(
+            audio_path, job.session_id, job.session_timestamp, live_upload
+        )
+    attach_agent_session_audio(job.session_id, job.audio_url)
+
+
+# bounded pool of upload workers fed from a spool directory: every job is on
+# disk before it is queued, so jobs interrupted by a restart are picked up again
+class UploadQueue:
+    def __init__(
+        self,
+        spool_dir: str,
+        workers: int = UPLOAD_WORKERS,
+        handler: UploadHandler = upload_session_job,
+        max_attempts: int = UPLOAD_MAX_ATTEMPTS,
+        retry_base_seconds: float = UPLOAD_RETRY_BASE_SECONDS,
+    ):
+        self.spool_dir = Path(spool_dir)
+        self.failed_dir = self.spool_dir / "failed"
+        self.workers = workers
+        self.handler = handler
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+
+        self._queue: queue.Queue[str | None] = queue.Queue()
+        self._threads: list[threading.Thread] = []
+        self._stopping = threading.Event()
+        self._live_uploads: dict[str, StreamingAudioUpload] = {}
+        # ids queued and not yet done, so recovery never queues a job twice
+        self._pending: set[str] = set()
+        self._lock = threading.Lock()
+
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+        # enqueue-to-done seconds of recent uploads
+        self.latencies: deque[float] = deque(maxlen=1000)
+
+    # the spool directory is created here, so importing the module touches no disk
+    def start(self):
+        self.failed_dir.mkdir(parents=True, exist_ok=True)
+        self._remove_orphans()
+        # jobs left over from a previous run, oldest first
+        recovered = sorted(
+            self.spool_dir.glob("*.json"), key=lambda p: p.stat().st_mtime
+        )
+        for job_path in recovered:
+            self._enqueue(job_path.stem)
+        if recovered:
+            logger.info("Recovered %d spooled uploads", len(recovered))
+
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f"upload-worker-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    # spool the session to disk and queue it, the recorder can be closed after
+    def submit(self, job: SessionUploadJob, recorder: SessionRecorder) -> str:
+        job_id = job.job_id or str(uuid.uuid4())
+        job.job_id = job_id
+        job.enqueued_at = time.time()
+
+        audio_path = self._audio_path(job_id)
+        with audio_path.open("wb") as f:
+            for chunk in recorder.chunks():
+                f.write(chunk)
+        live_upload = recorder.detach_upload()
+        if live_upload is not None:
+            self._live_uploads[job_id] = live_upload
+        # the job file is written last, a job only exists once it is complete
+        self._write_job(job)
+        self._enqueue(job_id)
+        logger.info("Queued session %s (%s)", job.session_id, self.stats())
+        return job_id
+
+    # stop taking new work, let the workers drain the queue up to timeout;
+    # anything left stays spooled for the next start
+    def shutdown(self, timeout: float = UPLOAD_DRAIN_TIMEOUT_SECONDS):
+        logger.info("Draining %d queued uploads", self._queue.qsize())
+        for _ in self._threads:
+            self._queue.put(None)
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        # interrupt retry backoffs still running
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(1.0)
+        self._threads = []
+        for live_upload in self._live_uploads.values():
+            live_upload.abort()
+        self._live_uploads.clear()
+        logger.info("Upload shutdown complete (%s)", self.stats())
+
+    def stats(self) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            "queue_depth": self._queue.qsize(),
+            "in_flight": self.in_flight,
+            "spooled": len(list(self.spool_dir.glob("*.json"))),
+            "completed": self.completed,
+            "failed": self.failed,
+            "retries": self.retries,
+            "latency_avg": sum(latencies) / len(latencies) if latencies else 0.0,
+            "latency_max": latencies[-1] if latencies else 0.0,
+        }
+
+    # a crash mid-submit leaves a half-written job or audio without a job file,
+    # neither is ever picked up
+    def _remove_orphans(self):
+        orphans = list(self.spool_dir.glob("*.tmp"))
+        orphans += [
+            path
+            for path in self.spool_dir.glob("*.pcm")
+            if not self._job_path(path.stem).exists()
+        ]
+        for path in orphans:
+            path.unlink(missing_ok=True)
+        if orphans:
+            logger.info("Removed %d orphaned spool files", len(orphans))
+
+    def _job_path(self, job_id: str) -> Path:
+        return self.spool_dir / f"{job_id}.json"
+
+    def _audio_path(self, job_id: str) -> Path:
+        return self.spool_dir / f"{job_id}.pcm"
+
+    def _enqueue(self, job_id: str):
+        with self._lock:
+            if job_id in self._pending:
+                return
+            self._pending.add(job_id)
+        self._queue.put(job_id)
+
+    def _write_job(self, job: SessionUploadJob):
+        path = self._job_path(job.job_id)
+        # write then rename so a crash never leaves a truncated job behind
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(job.model_dump_json())
+        tmp_path.replace(path)
+
+    def _work(self):
+        while (job_id := self._queue.get()) is not None:
+            with self._lock:
+                self.in_flight += 1
+            try:
+                self._process(job_id)
+            except Exception as e:
+                logger.exception("Unexpected error processing %s: %s", job_id, e)
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+                    self._pending.discard(job_id)
+
+    def _process(self, job_id: str):
+        job_path = self._job_path(job_id)
+        try:
+            job = SessionUploadJob.model_validate_json(job_path.read_text())
+        except FileNotFoundError:
+            return
+        # worker threads tag their log records with the session they upload
+        session_id_var.set(job.session_id)
+
+        while not self._stopping.is_set():
+            live_upload = self._live_uploads.pop(job_id, None)
+            started = time.monotonic()
+            try:
+                self.handler(job, self._audio_path(job_id), live_upload)
+            except Exception as e:
+                job.attempts += 1
+                # a job that fails validation will never succeed
+                permanent = isinstance(e, ValidationError)
+                if permanent or job.attempts >= self.max_attempts:
+                    self._fail(job, e)
+                    return
+                self._write_job(job)
+                delay = self.retry_base_seconds * 2 ** (job.attempts - 1)
+                with self._lock:
+                    self.retries += 1
+                logger.warning(
+                    "Upload of session %s failed (attempt %d/%d), retrying in %.1fs: %s",
+                    job.session_id,
+                    job.attempts,
+                    self.max_attempts,
+                    delay,
+                    e,
+                )
+                self._stopping.wait(delay)
+                continue
+
+            observe_stage("upload", job.llm or "unknown", time.monotonic() - started)
+            latency = time.time() - job.enqueued_at
+            with self._lock:
+                self.completed += 1
+                self.latencies.append(latency)
+            job_path.unlink(missing_ok=True)
+            self._audio_path(job_id).unlink(missing_ok=True)
+            logger.info(
+                "Uploaded session %s in %.2fs (%d attempts)",
+                job.session_id,
+                latency,
+                job.attempts + 1,
+            )
+            return
+
+    def _fail(self, job: SessionUploadJob, error: Exception):
+        logger.error("Giving up on session %s: %s", job.session_id, error)
+        with self._lock:
+            self.failed += 1
+        # keep the files around for inspection or a manual replay
+        self._write_job(job)
+        for path in (self._job_path(job.job_id), self._audio_path(job.job_id)):
+            if path.exists():
+                shutil.move(path, self.failed_dir / path.name)
+
+
+upload_queue = UploadQueue(UPLOAD_SPOOL_DIR)
+
+
+def get_upload_queue() -> UploadQueue:
+    return upload_queue
@@ -0,0 +1,186 @@
+import os
+from collections import deque
+from typing import NamedTuple
+
+import numpy as np
+
+from app.audio_encoding import PCM_SAMPLE_BYTES, PCM_SAMPLE_RATE
+
+# analysis frame length
+VAD_FRAME_MS = 20
+# trailing silence after which the answer is committed; ElevenLabs' own VAD
+# waits vad_silence_threshold_secs (1.5s)
+VAD_END_SILENCE_MS = int(os.getenv("VAD_END_SILENCE_MS", 700))
+# speech needed before a turn can be committed, so a cough or click is not an answer
+VAD_MIN_SPEECH_MS = int(os.getenv("VAD_MIN_SPEECH_MS", 200))
+# consecutive speech frames that start speech
+VAD_ONSET_FRAMES = 3
+# silence still sent before speech starts and after it stops, so word edges
+# are not clipped
+VAD_PREROLL_MS = 200
+VAD_HANGOVER_MS = 300
+# answers are committed after this long even if the room never goes quiet or no
+# speech was heard, and again every as long until a transcript arrives
+VAD_MAX_TURN_SECONDS = float(os.getenv("VAD_MAX_TURN_SECONDS", 60))
+# frames must be this far above the noise floor, and never below the absolute
+# minimum, to count as speech
+VAD_SPEECH_MARGIN_DB = 12.0
+VAD_MIN_SPEECH_DB = -50.0
+# voiced speech crosses zero far less often than hiss; frames above this rate
+# also need to be clearly louder to count
+VAD_MAX_ZERO_CROSSING_RATE = 0.3
+VAD_ZCR_EXTRA_DB = 10.0
+# silence the server-side VAD waits for before committing (vad_silence_threshold_secs)
+SERVER_VAD_SILENCE_MS = 1500
+
+
+class VadResult(NamedTuple):
+    # audio to forward to STT, silence that is skipped is left out
+    audio: bytes
+    # speech ended, the answer can be committed
+    end_of_turn: bool
+    # first speech of the turn was detected in this audio
+    speech_started: bool = False
+
+
+# energy and zero-crossing voice activity detection over 16-bit PCM: decides
+# which audio is worth sending to STT and when an answer has ended
+class VoiceActivityDetector:
+    def __init__(
+        self,
+        end_silence_ms: int = VAD_END_SILENCE_MS,
+        min_speech_ms: int = VAD_MIN_SPEECH_MS,
+        max_turn_seconds: float = VAD_MAX_TURN_SECONDS,
+    ):
+        self.frame_samples = PCM_SAMPLE_RATE * VAD_FRAME_MS // 1000
+        self.frame_bytes = self.frame_samples * PCM_SAMPLE_BYTES
+        self.end_silence_frames = end_silence_ms // VAD_FRAME_MS
+        self.min_speech_frames = min_speech_ms // VAD_FRAME_MS
+        self.max_turn_frames = int(max_turn_seconds * 1000 / VAD_FRAME_MS)
+        self.hangover_frames = VAD_HANGOVER_MS // VAD_FRAME_MS
+        # the noise floor carries over between turns, the room does not change
+        self.noise_floor_db = -60.0
+        self._partial = b""
+
+        # session totals
+        self.bytes_in = 0
+        self.bytes_sent = 0
+        self.commits = 0
+        self.commit_delays_ms: list[int] = []
+        self.start_turn()
+
+    # reset everything that belongs to a single answer
+    def start_turn(self):
+        self._preroll: deque[bytes] = deque(maxlen=VAD_PREROLL_MS // VAD_FRAME_MS)
+        self._speaking = False
+        self._speech_seen = False
+        self._speech_run = 0
+        self._speech_frames = 0
+        self._silence_run = 0
+        self._turn_frames = 0
+        self._committed = False
+        self._commit_frame = 0
+
+    def _classify(self, samples: np.ndarray) -> np.ndarray:
+        frames = samples.reshape(-1, self.frame_samples).astype(np.float32)
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        energy_db = 20 * np.log10(rms / 32768 + 1e-10)
+        signs = np.signbit(frames)
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+        is_speech = np.empty(len(frames), dtype=bool)
+        for i, (db, rate) in enumerate(zip(energy_db, zcr)):
+            threshold = max(
+                VAD_MIN_SPEECH_DB, self.noise_floor_db + VAD_SPEECH_MARGIN_DB
+            )
+            if rate > VAD_MAX_ZERO_CROSSING_RATE:
+                threshold += VAD_ZCR_EXTRA_DB
+            is_speech[i] = db > threshold
+            if not is_speech[i]:
+                # follow a quieter room at once, a louder one slowly
+                weight = 0.5 if db < self.noise_floor_db else 0.05
+                self.noise_floor_db += weight * (db - self.noise_floor_db)
+        return is_speech
+
+    def process(self, pcm: bytes) -> VadResult:
+        self.bytes_in += len(pcm)
+        data = self._partial + bytes(pcm) if self._partial else pcm
+        usable = len(data) - len(data) % self.frame_bytes
+        self._partial = bytes(data[usable:])
+        if not usable:
+            return VadResult(b"", False)
+
+        samples = np.frombuffer(data, dtype="<i2", count=usable // PCM_SAMPLE_BYTES)
+        view = memoryview(data)
+        send: list[bytes] = []
+        end_of_turn = False
+        speech_started = False
+        for i, speech in enumerate(self._classify(samples)):
+            frame = view[i * self.frame_bytes : (i + 1) * self.frame_bytes]
+            self._turn_frames += 1
+            if speech:
+                self._speech_run += 1
+                self._silence_run = 0
+            else:
+                self._speech_run = 0
+                self._silence_run += 1
+
+            if not self._speaking and self._speech_run >= VAD_ONSET_FRAMES:
+                self._speaking = True
+                speech_started |= not self._speech_seen
+                self._speech_seen = True
+                # more of the answer after a commit gets a commit of its own
+                self._committed = False
+            if self._speaking:
+                self._speech_frames += speech
+                if self._silence_run > self.hangover_frames:
+                    self._speaking = False
+
+            if self._speaking or self._speech_run:
+                # speech onset: send the silence just before it too
+                send.extend(self._preroll)
+                self._preroll.clear()
+                send.append(frame)
+            else:
+                self._preroll.append(bytes(frame))
+
+            if self._turn_frames - self._commit_frame >= self.max_turn_frames:
+                end_of_turn = self._commit(0)
+            elif (
+                not self._committed
+                and self._speech_frames >= self.min_speech_frames
+                and self._silence_run >= self.end_silence_frames
+            ):
+                end_of_turn = self._commit(self._silence_run * VAD_FRAME_MS)
+
+        audio = b"".join(send)
+        self.bytes_sent += len(audio)
+        return VadResult(audio, end_of_turn, speech_started)
+
+    # the server rejected the last commit (throttled, too little audio): commit
+    # again once the answer has been followed by another end_silence_ms
+    def commit_failed(self):
+        self._committed = False
+        self._silence_run = 0
+
+    def _commit(self, delay_ms: int) -> bool:
+        self._committed = True
+        self._commit_frame = self._turn_frames
+        self.commits += 1
+        self.commit_delays_ms.append(delay_ms)
+        return True
+
+    def stats(self) -> dict:
+        skipped = self.bytes_in - self.bytes_sent
+        delays = self.commit_delays_ms
+        return {
+            "bytes_in": self.bytes_in,
+            "bytes_sent": self.bytes_sent,
+            "bandwidth_saved_pct": 100 * skipped / self.bytes_in
+            if self.bytes_in
+            else 0.0,
+            "commits": self.commits,
+            "commit_delay_ms_avg": sum(delays) / len(delays) if delays else 0.0,
+            # compared to waiting for the server-side VAD on every answer
+            "latency_saved_ms": sum(max(0, SERVER_VAD_SILENCE_MS - d) for d in delays),
+        }
@@ -1,3 +1,7 @@
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import NamedTuple
+
 WHEEL_OF_EMOTIONS: dict[str, dict[str, list[str]]] = {
     "happy": {
         "playful": ["aroused", "cheeky"],
@@ -61,26 +65,73 @@ def get_wheel_of_emotions():
     return WHEEL_OF_EMOTIONS
 
 
-def get_emotion_depth(mood: str, wheel: dict) -> int:
-    if not mood:
-        return 0
+DEPTH_NAMES = ("unknown", "primary", "secondary", "tertiary")
+
+
+def get_depth_name(depth: int) -> str:
+    return DEPTH_NAMES[depth] if 0 <= depth < len(DEPTH_NAMES) else "unknown"
+
+
+# where a label sits on the wheel; labels listed under several parents keep
+# every path, the deepest one (first in wheel order on ties) is canonical
+class EmotionLineage(NamedTuple):
+    label: str
+    depth: int
+    primary: str
+    secondary: str | None
+    paths: tuple[tuple[str, ...], ...]
+
+    @property
+    def depth_name(self) -> str:
+        return get_depth_name(self.depth)
+
+    @property
+    def ambiguous(self) -> bool:
+        return len(self.paths) > 1
+
 
-    mood_lower = mood.lower()
+def normalize_emotion(mood: str) -> str:
+    return mood.strip().lower()
 
-    # Check primary level (top-level keys)
-    if mood_lower in wheel:
-        return 1
 
-    # Check secondary level (second-level keys)
+def _build_emotion_index(
+    wheel: dict[str, dict[str, list[str]]],
+) -> Mapping[str, EmotionLineage]:
+    paths: dict[str, list[tuple[str, ...]]] = {}
     for primary_mood, secondary_moods in wheel.items():
-        if isinstance(secondary_moods, dict):
-            if mood_lower in secondary_moods:
-                return 2
-            # Check tertiary level (third-level values)
-            for secondary_mood, tertiary_moods in secondary_moods.items():
-                if isinstance(tertiary_moods, list) and mood_lower in [
-                    m.lower() for m in tertiary_moods
-                ]:
-                    return 3
-
-    return 0  # Not found or unknown
+        paths.setdefault(normalize_emotion(primary_mood), []).append((primary_mood,))
+        for secondary_mood, tertiary_moods in secondary_moods.items():
+            paths.setdefault(normalize_emotion(secondary_mood), []).append(
+                (primary_mood, secondary_mood)
+            )
+            for tertiary_mood in tertiary_moods:
+                paths.setdefault(normalize_emotion(tertiary_mood), []).append(
+                    (primary_mood, secondary_mood, tertiary_mood)
+                )
+
+    index = {}
+    for label, label_paths in paths.items():
+        canonical = max(label_paths, key=len)
+        index[label] = EmotionLineage(
+            label=label,
+            depth=len(canonical),
+            primary=canonical[0],
+            secondary=canonical[1] if len(canonical) > 1 else None,
+            paths=tuple(label_paths),
+        )
+    return MappingProxyType(index)
+
+
+# built once at import, read-only afterwards
+EMOTION_INDEX = _build_emotion_index(WHEEL_OF_EMOTIONS)
+
+
+def get_emotion_lineage(mood: str) -> EmotionLineage | None:
+    if not mood:
+        return None
+    return EMOTION_INDEX.get(normalize_emotion(mood))
+
+
+def get_emotion_depth(mood: str) -> int:
+    lineage = get_emotion_lineage(mood)
+    return lineage.depth if lineage else 0  # Not found or unknown
@@ -0,0 +1,139 @@
+# Compare the session audio encoders on synthetic speech-like audio:
+#
+#   python -m benchmarks.audio_encoders --seconds 300
+#
+# every encoder runs in a fresh subprocess so peak RSS is its own; CPU time
+# includes child processes (ffmpeg). "none" only reads the PCM and is the
+# baseline the other rows should be compared against.
+import argparse
+import json
+import resource
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from app.audio_encoding import ENCODERS, PCM_SAMPLE_RATE
+
+# websocket audio arrives in ~100ms frames
+FRAME_SAMPLES = PCM_SAMPLE_RATE // 10
+# distinct seconds of audio, cycled so generating them stays out of the timings
+PATTERN_SECONDS = 10
+
+
+class CountingOutput:
+    """Unseekable output that only counts bytes, like a bucket upload"""
+
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, data):
+        self.bytes += len(data)
+        return len(data)
+
+    def seekable(self):
+        return False
+
+
+# voiced "syllables" with a drifting pitch and a few harmonics, separated by
+# pauses, over a low noise floor
+def speech_like_pcm(seconds: int, seed: int = 0) -> bytes:
+    rng = np.random.default_rng(seed)
+    t = np.arange(seconds * PCM_SAMPLE_RATE) / PCM_SAMPLE_RATE
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.cumsum(np.pi * pitch / PCM_SAMPLE_RATE)
+    voice = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = np.clip(np.sin(2 * np.pi * 3 * t), 0, None) ** 2
+    envelope *= np.sin(2 * np.pi * 0.25 * t) > -0.3
+    signal = 6000 * voice * envelope + rng.normal(0, 60, t.size)
+    return np.clip(signal, -32768, 32767).astype("<i2").tobytes()
+
+
+def run_backend(name: str, seconds: int) -> dict:
+    pattern = speech_like_pcm(PATTERN_SECONDS)
+    frame_bytes = FRAME_SAMPLES * 2
+    frames = [pattern[i : i + frame_bytes] for i in range(0, len(pattern), frame_bytes)]
+    frame_count = seconds * 10
+
+    output = CountingOutput()
+    encoder = ENCODERS[name](output) if name != "none" else None
+    start_wall = time.perf_counter()
+    start_self = resource.getrusage(resource.RUSAGE_SELF)
+    pcm_bytes = 0
+    for i in range(frame_count):
+        frame = frames[i % len(frames)]
+        pcm_bytes += len(frame)
+        if encoder is not None:
+            encoder.feed(frame)
+    if encoder is not None:
+        encoder.finish()
+    wall = time.perf_counter() - start_wall
+    end_self = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    cpu = (
+        end_self.ru_utime
+        - start_self.ru_utime
+        + end_self.ru_stime
+        - start_self.ru_stime
+        + children.ru_utime
+        + children.ru_stime
+    )
+    return {
+        "encoder": name,
+        "cpu_s": cpu,
+        "wall_s": wall,
+        "realtime_x": seconds / wall,
+        # ru_maxrss is KiB on Linux
+        "peak_rss_mib": end_self.ru_maxrss / 1024,
+        "child_peak_rss_mib": children.ru_maxrss / 1024,
+        "ratio": pcm_bytes / output.bytes if output.bytes else 1.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=int, default=300)
+    parser.add_argument("--backend", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.backend:
+        print(json.dumps(run_backend(args.backend, args.seconds)))
+        return
+
+    backends = ["none", *ENCODERS]
+    if shutil.which("ffmpeg") is None:
+        print("[BENCH] ffmpeg not installed, skipping ffmpeg-flac")
+        backends.remove("ffmpeg-flac")
+
+    print(f"[BENCH] Encoding {args.seconds}s of 16kHz mono LINEAR16 per encoder")
+    header = f"{'encoder':<12}{'cpu s':>8}{'x rt':>9}{'rss MiB':>9}{'child MiB':>11}{'ratio':>8}"
+    print(header)
+    for name in backends:
+        result = json.loads(
+            subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.audio_encoders",
+                    "--backend",
+                    name,
+                    "--seconds",
+                    str(args.seconds),
+                ],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout.splitlines()[-1]
+        )
+        print(
+            f"{name:<12}{result['cpu_s']:>8.3f}{result['realtime_x']:>9.0f}"
+            f"{result['peak_rss_mib']:>9.1f}{result['child_peak_rss_mib']:>11.1f}"
+            f"{result['ratio']:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# Import cost of the app per set of enabled LLM providers (LLM_PROVIDERS):
+#
+#   python -m benchmarks.import_time
+#   python -m benchmarks.import_time --baseline benchmarks/import_time_baseline.json
+#   python -m benchmarks.import_time --baseline benchmarks/import_time_baseline.json \
+#       --update-baseline
+#
+# Every run is a fresh `python -X importtime` subprocess that imports app.main
+# and then loads the enabled providers the way the lifespan does at startup;
+# both are timed in the subprocess (median of --runs), interpreter startup is
+# left out. The package columns add up the importtime self times of each
+# package's modules, "-" when it was not imported at all.
+#
+# Exits non-zero when a disabled provider's SDK is imported, or when --baseline
+# is given and a startup (app + llm) takes more than --tolerance times the
+# recorded one; --update-baseline records the current startups instead. CI
+# checks against benchmarks/import_time_baseline.json; re-record it when a
+# dependency or a deliberate import change moves the startup time.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+from app.llm_providers import LLM_BACKENDS
+
+# heavy packages worth watching, besides the LLM SDKs
+TRACKED_PACKAGES = ("elevenlabs", "google.cloud.firestore_v1", "google.cloud.storage")
+STARTUP = """
+import json, resource, time
+start = time.perf_counter()
+import app.main
+from app.llm_providers import load_llm_providers
+imported = time.perf_counter()
+load_llm_providers()
+print(json.dumps({
+    "app_ms": (imported - start) * 1000,
+    "llm_ms": (time.perf_counter() - imported) * 1000,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+
+def packages_imported(importtime: str, packages: list[str]) -> dict[str, float]:
+    # "import time: self [us] | cumulative | imported package"; modules loaded
+    # through importlib only show up with their submodules, so sum self times
+    totals = {}
+    for line in importtime.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        own, _, name = line.removeprefix("import time:").split("|")
+        name = name.strip()
+        for package in packages:
+            if name == package or name.startswith(package + "."):
+                totals[package] = totals.get(package, 0.0) + int(own) / 1000
+    return totals
+
+
+def run_startup(providers: str, packages: list[str]) -> dict:
+    env = {
+        **os.environ,
+        "LLM_PROVIDERS": providers,
+        "AGENT_URL": os.getenv("AGENT_URL", "/ws/agent"),
+    }
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    run = json.loads(result.stdout.splitlines()[-1])
+    run["packages_ms"] = packages_imported(result.stderr, packages)
+    return run
+
+
+def measure(providers: str, runs: int, packages: list[str]) -> dict:
+    results = [run_startup(providers, packages) for _ in range(runs)]
+    loaded = {p for r in results for p in r["packages_ms"]}
+    return {
+        **{
+            key: statistics.median(r[key] for r in results)
+            for key in ("app_ms", "llm_ms", "rss_mb")
+        },
+        "packages_ms": {
+            p: statistics.median(r["packages_ms"].get(p, 0.0) for r in results)
+            for p in loaded
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--providers",
+        nargs="*",
+        default=[",".join(LLM_BACKENDS), *LLM_BACKENDS],
+        help="LLM_PROVIDERS values to compare",
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--baseline", help="JSON file of recorded totals")
+    parser.add_argument("--tolerance", type=float, default=1.25)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    packages = [sdk for _, sdk in LLM_BACKENDS.values()] + list(TRACKED_PACKAGES)
+    print(
+        f"{'providers':>16}{'app ms':>9}{'llm ms':>9}{'rss MB':>8}"
+        + "".join(f"{p.rsplit('.', 1)[-1]:>14}" for p in packages)
+    )
+    results = {}
+    failures = []
+    for providers in args.providers:
+        result = results[providers] = measure(providers, args.runs, packages)
+        result["total_ms"] = result["app_ms"] + result["llm_ms"]
+        loaded = result["packages_ms"]
+        print(
+            f"{providers:>16}{result['app_ms']:>9.1f}{result['llm_ms']:>9.1f}"
+            f"{result['rss_mb']:>8.1f}"
+            + "".join(
+                f"{loaded[p]:>14.1f}" if p in loaded else f"{'-':>14}" for p in packages
+            )
+        )
+        enabled = providers.split(",")
+        for name, (_, sdk) in LLM_BACKENDS.items():
+            if name not in enabled and sdk in loaded:
+                failures.append(f"{providers}: disabled provider {name} imported {sdk}")
+
+    if args.baseline and args.update_baseline:
+        totals = {p: round(r["total_ms"], 1) for p, r in results.items()}
+        Path(args.baseline).write_text(json.dumps(totals, indent=2) + "\n")
+        print(f"[BENCH] Recorded baseline in {args.baseline}")
+    elif args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        for providers, result in results.items():
+            if providers not in baseline:
+                continue
+            limit = baseline[providers] * args.tolerance
+            if result["total_ms"] > limit:
+                failures.append(
+                    f"{providers}: {result['total_ms']:.1f}ms over the "
+                    f"{limit:.1f}ms allowed ({baseline[providers]}ms baseline)"
+                )
+
+    for failure in failures:
+        print(f"[BENCH] Regression: {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
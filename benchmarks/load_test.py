@@ -0,0 +1,350 @@
+# End-to-end load test: N simulated browser clients against the agent websocket
+#
+#   python -m benchmarks.load_test --clients 1,5,10,25,50
+#   python -m benchmarks.load_test --clients 10 --pcm answer1.pcm answer2.pcm
+#
+# Unless --url points at a running server, the app is started in a subprocess
+# with every provider replaced by benchmarks.stub_providers (latency flags are
+# passed through). Each client streams microphone audio at real-time pace:
+# silence, then one answer (raw 16kHz mono LINEAR16, cycled) whenever the
+# agent is listening; question audio "plays" for as long as it would at 32
+# kbit/s before audio_playback_finished is sent.
+#
+# Turn latency is from the end of an answer to the first audio of the next
+# question (or the result). The knee is the highest concurrency whose p95 turn
+# latency stays within --knee-factor of the lowest level's, without failures.
+#
+# The started server logs at --log-level; the CPU time it used per level shows
+# what logging costs, e.g. run once with --log-level DEBUG and once with INFO.
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from websockets.asyncio.client import connect as websocket_connect
+
+from benchmarks.audio_encoders import speech_like_pcm
+from benchmarks.stub_providers import TTS_BYTES_PER_SECOND, add_latency_arguments
+
+PCM_BYTES_PER_SECOND = 16000 * 2
+# binary question audio frames start with a version/kind/sequence header
+AUDIO_FRAME_HEADER_BYTES = 4
+# the synthetic answer; speech_like_pcm pauses after ~2.2s, which would end it
+SYNTHETIC_ANSWER_SECONDS = 2
+
+
+@dataclass
+class SessionResult:
+    turn_latencies: list[float] = field(default_factory=list)
+    duration: float = 0.0
+    error: str | None = None
+    # worst delay of the microphone schedule, the driver is saturated if high
+    mic_lag: float = 0.0
+
+
+# one browser: microphone, question playback and the agent protocol
+class SimulatedClient:
+    def __init__(self, url: str, answers: list[bytes], frame_ms: int, barge_in_after):
+        self.url = url
+        self.answers = answers
+        self.frame_bytes = PCM_BYTES_PER_SECOND * frame_ms // 1000
+        self.frame_seconds = frame_ms / 1000
+        self.barge_in_after = barge_in_after
+
+    async def run(self, answer_offset: int) -> SessionResult:
+        result = SessionResult()
+        start = time.perf_counter()
+        self._answer_index = answer_offset
+        self._speaking = memoryview(b"")
+        self._answered = False
+        self._answer_end: float | None = None
+        self._question_bytes = 0
+        self._stop_playback = asyncio.Event()
+        try:
+            async with websocket_connect(self.url, max_size=None) as websocket:
+                microphone = asyncio.create_task(self._microphone(websocket, result))
+                try:
+                    await self._receive(websocket, result)
+                finally:
+                    microphone.cancel()
+                    await asyncio.gather(microphone, return_exceptions=True)
+        except Exception as e:
+            result.error = f"{type(e).__name__}: {e}"
+        result.duration = time.perf_counter() - start
+        return result
+
+    def _answer(self):
+        if self._answered:
+            return
+        self._answered = True
+        self._speaking = memoryview(
+            self.answers[self._answer_index % len(self.answers)]
+        )
+        self._answer_index += 1
+
+    async def _microphone(self, websocket, result: SessionResult):
+        silence = bytes(self.frame_bytes)
+        start = time.perf_counter()
+        frame = 0
+        while True:
+            if self._speaking:
+                chunk = self._speaking[: self.frame_bytes]
+                self._speaking = self._speaking[self.frame_bytes :]
+                if not self._speaking:
+                    self._answer_end = time.perf_counter()
+            else:
+                chunk = silence
+            await websocket.send(bytes(chunk))
+            frame += 1
+            # absolute schedule so sleep overshoot does not add up
+            delay = start + frame * self.frame_seconds - time.perf_counter()
+            result.mic_lag = max(result.mic_lag, -delay)
+            await asyncio.sleep(max(0.0, delay))
+
+    def _turn_done(self, result: SessionResult):
+        if self._answer_end is not None:
+            result.turn_latencies.append(time.perf_counter() - self._answer_end)
+            self._answer_end = None
+
+    async def _playback(self, websocket, seconds: float):
+        barge_in = None
+        if self.barge_in_after is not None:
+            loop = asyncio.get_running_loop()
+            barge_in = loop.call_later(self.barge_in_after, self._answer)
+        try:
+            await asyncio.wait_for(self._stop_playback.wait(), seconds)
+        except TimeoutError:
+            pass
+        if barge_in is not None and self.barge_in_after > seconds:
+            # a question shorter than that is answered once listening starts
+            barge_in.cancel()
+        await websocket.send(json.dumps({"type": "audio_playback_finished"}))
+
+    async def _receive(self, websocket, result: SessionResult):
+        playback = None
+        async for message in websocket:
+            if isinstance(message, bytes):
+                self._turn_done(result)
+                self._question_bytes += len(message) - AUDIO_FRAME_HEADER_BYTES
+                continue
+            data = json.loads(message)
+            kind = data.get("type")
+            if kind == "question":
+                seconds = self._question_bytes / TTS_BYTES_PER_SECOND
+                self._question_bytes = 0
+                self._answered = False
+                self._stop_playback.clear()
+                playback = asyncio.create_task(self._playback(websocket, seconds))
+            elif kind == "stop_audio":
+                self._stop_playback.set()
+            elif kind == "listening":
+                self._answer()
+            elif kind == "result":
+                self._turn_done(result)
+                break
+            elif kind == "error":
+                result.error = data.get("message", "error")
+                break
+        else:
+            result.error = result.error or "Connection closed before the result"
+        if playback is not None:
+            playback.cancel()
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+@dataclass
+class LevelResult:
+    clients: int
+    sessions: int
+    failures: int
+    elapsed: float
+    latencies: list[float]
+    mic_lag: float
+    errors: list[str]
+    # user + system CPU seconds of the started server, None for --url
+    server_cpu: float | None = None
+
+    @property
+    def sessions_per_second(self) -> float:
+        return self.sessions / self.elapsed
+
+    @property
+    def p95(self) -> float:
+        return percentile(self.latencies, 95)
+
+
+async def run_level(args, url: str, answers: list[bytes], clients: int) -> LevelResult:
+    async def client_loop(index: int) -> list[SessionResult]:
+        # spread the connections so the level does not start as one burst
+        await asyncio.sleep(args.ramp_seconds * index / clients)
+        client = SimulatedClient(url, answers, args.frame_ms, args.barge_in_after)
+        return [await client.run(index) for _ in range(args.sessions)]
+
+    start = time.perf_counter()
+    per_client = await asyncio.gather(*(client_loop(i) for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    results = [r for sessions in per_client for r in sessions]
+    failed = [r for r in results if r.error]
+    return LevelResult(
+        clients=clients,
+        sessions=len(results) - len(failed),
+        failures=len(failed),
+        elapsed=elapsed,
+        latencies=[t for r in results if not r.error for t in r.turn_latencies],
+        mic_lag=max(r.mic_lag for r in results),
+        errors=sorted({r.error for r in failed}),
+    )
+
+
+def find_knee(levels: list[LevelResult], factor: float) -> LevelResult | None:
+    baseline = levels[0].p95
+    knee = None
+    for level in levels:
+        if level.failures or level.p95 > factor * baseline:
+            break
+        knee = level
+    return knee
+
+
+def load_answers(paths: list[str]) -> list[bytes]:
+    if paths:
+        return [Path(p).read_bytes() for p in paths]
+    return [speech_like_pcm(SYNTHETIC_ANSWER_SECONDS, seed) for seed in range(4)]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# user + system CPU seconds a process has used so far (Linux)
+def process_cpu_seconds(pid: int) -> float:
+    fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def start_server(args, port: int) -> subprocess.Popen:
+    command = [sys.executable, "-m", "benchmarks.stub_providers", "--port", str(port)]
+    for name in ("stt", "tts", "llm", "storage"):
+        command += [f"--{name}-latency", repr(getattr(args, f"{name}_latency"))]
+    log = Path(args.server_log).open("w") if args.server_log else subprocess.DEVNULL
+    env = {**os.environ, "LOG_LEVEL": args.log_level}
+    server = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, env=env)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Stub server exited with {server.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("Stub server did not start")
+
+
+def agent_url(args, base: str) -> str:
+    params = f"llm={args.llm}&mode={args.mode}&audio=binary"
+    if args.stream_question:
+        params += "&stream_question=1"
+    if args.barge_in_after is not None:
+        params += "&barge_in=1"
+    if args.hedge:
+        params += "&hedge=1"
+    return f"{base}{os.getenv('AGENT_URL', '/ws/agent')}?{params}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", default="1,5,10,25,50")
+    parser.add_argument("--sessions", type=int, default=1, help="per client")
+    parser.add_argument("--ramp-seconds", type=float, default=2.0)
+    parser.add_argument("--pcm", nargs="*", default=[])
+    parser.add_argument("--frame-ms", type=int, default=8)
+    parser.add_argument("--llm", default="openai")
+    parser.add_argument("--mode", default="separate")
+    parser.add_argument("--stream-question", action="store_true")
+    parser.add_argument(
+        "--barge-in-after",
+        type=float,
+        help="start answering this many seconds into each question",
+    )
+    parser.add_argument(
+        "--hedge", action="store_true", help="hedge LLM calls with the other provider"
+    )
+    parser.add_argument("--knee-factor", type=float, default=2.0)
+    parser.add_argument("--url", help="ws://host:port of a running server")
+    parser.add_argument("--server-log")
+    parser.add_argument("--log-level", default="INFO", help="of the started server")
+    add_latency_arguments(parser)
+    args = parser.parse_args()
+
+    answers = load_answers(args.pcm)
+    server = None
+    if args.url:
+        base = args.url
+    else:
+        port = free_port()
+        server = start_server(args, port)
+        base = f"ws://127.0.0.1:{port}"
+        print(
+            f"[BENCH] Stub providers: stt {args.stt_latency}, tts {args.tts_latency}, "
+            f"llm {args.llm_latency}, storage {args.storage_latency}"
+        )
+
+    url = agent_url(args, base)
+    print(f"[BENCH] {url}")
+    print(
+        f"{'clients':>8}{'ok':>6}{'failed':>8}{'sess/s':>9}"
+        f"{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}{'mic lag ms':>12}"
+        + (f"{'server cpu s':>14}" if server else "")
+    )
+    levels = []
+    try:
+        for clients in (int(c) for c in args.clients.split(",")):
+            cpu_before = process_cpu_seconds(server.pid) if server else None
+            level = asyncio.run(run_level(args, url, answers, clients))
+            if server:
+                level.server_cpu = process_cpu_seconds(server.pid) - cpu_before
+            levels.append(level)
+            print(
+                f"{clients:>8}{level.sessions:>6}{level.failures:>8}"
+                f"{level.sessions_per_second:>9.3f}"
+                f"{percentile(level.latencies, 50):>8.3f}{level.p95:>8.3f}"
+                f"{percentile(level.latencies, 99):>8.3f}{level.mic_lag * 1000:>12.1f}"
+                + (f"{level.server_cpu:>14.2f}" if server else "")
+            )
+            for error in level.errors:
+                print(f"[BENCH]   {error}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    knee = find_knee(levels, args.knee_factor)
+    if knee is None:
+        print("[BENCH] Knee: below the lowest concurrency tested")
+    elif knee is levels[-1]:
+        print(f"[BENCH] Knee: not reached up to {knee.clients} clients")
+    else:
+        print(
+            f"[BENCH] Knee: {knee.clients} clients "
+            f"({knee.sessions_per_second:.3f} sessions/s, p95 {knee.p95:.3f}s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# Event-loop cost of feeding audio to the STT connection, per second of audio:
+#
+#   python -m benchmarks.stt_sender --seconds 5
+#
+# "polling" is the previous sender (queue + wait_for with a 100ms timeout and
+# 5ms pacing), "ring" is STTSessionManager._send_audio on an AudioRingBuffer.
+# realtime runs feed frames at the speed a microphone would; backlog drains
+# audio that piled up while the question was playing.
+import argparse
+import asyncio
+import base64
+import time
+
+from app.audio_buffer import BYTES_PER_SECOND, AudioRingBuffer
+from app.stt import STTSessionManager
+
+
+class NullConnection:
+    """STT connection stand-in that only counts messages"""
+
+    def __init__(self):
+        self.messages = 0
+
+    async def send(self, data):
+        self.messages += 1
+
+
+async def polling_sender(queue: asyncio.Queue, connection, stop: asyncio.Event):
+    last_send_time = asyncio.get_event_loop().time()
+    min_interval = 0.005
+    while not stop.is_set():
+        try:
+            chunk = await asyncio.wait_for(queue.get(), timeout=0.1)
+            if chunk is None:
+                break
+            current_time = asyncio.get_event_loop().time()
+            time_since_last = current_time - last_send_time
+            if time_since_last < min_interval:
+                await asyncio.sleep(min_interval - time_since_last)
+            audio_base64 = base64.b64encode(chunk).decode("utf-8")
+            await connection.send({"audio_base_64": audio_base64})
+            last_send_time = asyncio.get_event_loop().time()
+        except TimeoutError:
+            continue
+
+
+async def feed(write, seconds: float, frame_ms: int, realtime: bool):
+    frame = b"\x00\x01" * (BYTES_PER_SECOND * frame_ms // 2000)
+    start = time.perf_counter()
+    for i in range(int(seconds * 1000 / frame_ms)):
+        write(frame)
+        if realtime:
+            # absolute schedule so sleep overshoot does not add up
+            await asyncio.sleep(
+                max(0.0, start + (i + 1) * frame_ms / 1000 - time.perf_counter())
+            )
+
+
+async def run_polling(seconds, frame_ms, realtime) -> int:
+    queue, connection, stop = asyncio.Queue(), NullConnection(), asyncio.Event()
+    if not realtime:
+        await feed(queue.put_nowait, seconds, frame_ms, realtime)
+    sender = asyncio.create_task(polling_sender(queue, connection, stop))
+    if realtime:
+        await feed(queue.put_nowait, seconds, frame_ms, realtime)
+    queue.put_nowait(None)
+    await sender
+    return connection.messages
+
+
+async def run_ring(seconds, frame_ms, realtime) -> int:
+    buffer, connection = AudioRingBuffer(), NullConnection()
+    manager = STTSessionManager(None, buffer, asyncio.Queue(), local_vad=False)
+    if not realtime:
+        await feed(buffer.write, seconds, frame_ms, realtime)
+    sender = asyncio.create_task(manager._send_audio(connection))
+    if realtime:
+        await feed(buffer.write, seconds, frame_ms, realtime)
+    buffer.close()
+    await sender
+    return connection.messages
+
+
+def measure(run, seconds: float, frame_ms: int, realtime: bool) -> tuple[float, int]:
+    start = time.process_time()
+    messages = asyncio.run(run(seconds, frame_ms, realtime))
+    return (time.process_time() - start) / seconds * 1000, messages
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--backlog-seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"{'scenario':<28}{'sender':<9}{'cpu ms/s audio':>16}{'messages':>10}")
+    scenarios = [
+        ("realtime 8ms frames", args.seconds, 8, True),
+        ("realtime 80ms packets", args.seconds, 80, True),
+        ("backlog 80ms packets", args.backlog_seconds, 80, False),
+    ]
+    for label, seconds, frame_ms, realtime in scenarios:
+        for name, run in (("polling", run_polling), ("ring", run_ring)):
+            cpu_ms, messages = measure(run, seconds, frame_ms, realtime)
+            print(f"{label:<28}{name:<9}{cpu_ms:>16.2f}{messages:>10}")
+
+
+if __name__ == "__main__":
+    main()
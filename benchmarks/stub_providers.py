@@ -0,0 +1,467 @@
+# Runs the agent app with local stand-ins for every provider, for load tests:
+#
+#   python -m benchmarks.stub_providers --port 8080 --llm-latency lognormal:0.8:0.4
+#
+# ElevenLabs STT/TTS, OpenAI, Gemini, Firestore and GCS are replaced behind
+# the app.deps getters, so the routes, STT session manager, recorder and
+# upload queue run unchanged. The TTS input stream (stream_question) talks to
+# a local websocket server standing in for ElevenLabs. Every stand-in waits for
+# a delay drawn from its latency distribution:
+#
+#   const:SECONDS  uniform:LOW:HIGH  normal:MEAN:SD  lognormal:MEDIAN:SIGMA
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+# placeholder config, the clients themselves are swapped out below
+os.environ.setdefault("AGENT_URL", "/ws/agent")
+os.environ.setdefault("BUCKET_NAME", "benchmark")
+os.environ.setdefault(
+    "UPLOAD_SPOOL_DIR", str(Path(tempfile.gettempdir()) / "agent-uploads-load-test")
+)
+import uvicorn
+from elevenlabs import RealtimeEvents
+from elevenlabs.realtime.scribe import CommitStrategy
+from websockets.asyncio.server import serve as websocket_serve
+
+from app import tts
+from app.deps import override_client
+from app.vad import SERVER_VAD_SILENCE_MS, VoiceActivityDetector
+from app.wheel_of_emotions import EMOTION_INDEX
+
+# mp3_22050_32 is 32 kbit/s
+TTS_BYTES_PER_SECOND = 32000 // 8
+# speaking rate of the synthesized questions
+TTS_SECONDS_PER_CHAR = 0.065
+# ElevenLabs synthesizes faster than the audio plays
+TTS_REALTIME_FACTOR = 4
+TTS_CHUNK_BYTES = 1024
+# a partial transcript for every this much speech received
+STT_PARTIAL_BYTES = 16000
+# LLM tokens stream at roughly this rate once the first one arrived
+LLM_SECONDS_PER_WORD = 0.02
+# mood confidence the stand-in reports; below 0.9 every session runs all turns
+STUB_CONFIDENCE = 0.6
+
+QUESTION_OPENINGS = [
+    "Can you tell me more about",
+    "What do you think is behind",
+    "How long have you noticed",
+    "When did you first feel",
+    "What would help with",
+]
+QUESTION_TOPICS = [
+    "the way your week has been going",
+    "the conversations you had with friends lately",
+    "how you have been sleeping",
+    "what has been on your mind at work",
+    "the moments that felt lighter today",
+]
+ANSWERS = [
+    "I have been feeling a bit tired but mostly okay",
+    "Work has been stressful and I am not sleeping well",
+    "Honestly it was a good week and I feel calm",
+    "I am worried about a few things at home",
+]
+MOODS = list(EMOTION_INDEX)
+
+
+class Latency:
+    """Delay distribution parsed from a kind:param[:param] spec"""
+
+    def __init__(self, spec: str, seed: int | None = None):
+        kind, *params = spec.split(":")
+        values = [float(p) for p in params]
+        self.spec = spec
+        self._random = random.Random(seed)
+        samplers = {
+            "const": (1, lambda v: v[0]),
+            "uniform": (2, lambda v: self._random.uniform(v[0], v[1])),
+            "normal": (2, lambda v: self._random.gauss(v[0], v[1])),
+            "lognormal": (
+                2,
+                lambda v: v[0] * self._random.lognormvariate(0, v[1]),
+            ),
+        }
+        if kind not in samplers or len(values) != samplers[kind][0]:
+            raise argparse.ArgumentTypeError(f"Invalid latency spec: {spec}")
+        self._sample = samplers[kind][1]
+        self._values = values
+
+    def __repr__(self) -> str:
+        return self.spec
+
+    def sample(self) -> float:
+        return max(0.0, self._sample(self._values))
+
+
+def stub_question() -> str:
+    return f"{random.choice(QUESTION_OPENINGS)} {random.choice(QUESTION_TOPICS)}?"
+
+
+# realtime STT connection: transcripts come back a latency sample after the
+# audio or the commit; with the VAD commit strategy the server's end-of-speech
+# detection is played by app.vad with the server's silence threshold
+class StubSTTConnection:
+    def __init__(self, options: dict, latency: Latency):
+        self.latency = latency
+        self.handlers = {}
+        self.closed = False
+        self.vad = (
+            VoiceActivityDetector(end_silence_ms=SERVER_VAD_SILENCE_MS)
+            if options.get("commit_strategy") == CommitStrategy.VAD
+            else None
+        )
+        self._speech_bytes = 0
+
+    def on(self, event, callback):
+        self.handlers[event] = callback
+
+    def _emit(self, event, data: dict):
+        if not self.closed and event in self.handlers:
+            self.handlers[event](data)
+
+    def _emit_later(self, event, data: dict):
+        asyncio.get_running_loop().call_later(
+            self.latency.sample(), self._emit, event, data
+        )
+
+    async def send(self, data: dict):
+        pcm = base64.b64decode(data["audio_base_64"])
+        if self.vad is not None:
+            result = self.vad.process(pcm)
+            if result.end_of_turn:
+                self._commit()
+                self.vad.start_turn()
+            pcm = result.audio
+        before = self._speech_bytes // STT_PARTIAL_BYTES
+        self._speech_bytes += len(pcm)
+        if self._speech_bytes // STT_PARTIAL_BYTES > before:
+            words = random.choice(ANSWERS).split()
+            self._emit_later(
+                RealtimeEvents.PARTIAL_TRANSCRIPT,
+                {
+                    "text": " ".join(
+                        words[: 1 + self._speech_bytes // STT_PARTIAL_BYTES]
+                    )
+                },
+            )
+
+    async def commit(self):
+        self._commit()
+
+    def _commit(self):
+        self._speech_bytes = 0
+        self._emit_later(
+            RealtimeEvents.COMMITTED_TRANSCRIPT, {"text": random.choice(ANSWERS)}
+        )
+
+    async def close(self):
+        self.closed = True
+
+
+class StubRealtimeSTT:
+    def __init__(self, latency: Latency):
+        self.latency = latency
+
+    async def connect(self, options: dict) -> StubSTTConnection:
+        await asyncio.sleep(self.latency.sample())
+        connection = StubSTTConnection(options, self.latency)
+        asyncio.get_running_loop().call_soon(
+            connection._emit,
+            RealtimeEvents.SESSION_STARTED,
+            {"session_id": str(uuid.uuid4())},
+        )
+        return connection
+
+
+def tts_audio_bytes(text: str) -> int:
+    return int(len(text) * TTS_SECONDS_PER_CHAR * TTS_BYTES_PER_SECOND)
+
+
+# text_to_speech.stream: first chunk after a latency sample, then placeholder
+# MP3 bytes of the length the text would take to speak
+class StubTextToSpeech:
+    def __init__(self, latency: Latency):
+        self.latency = latency
+
+    async def stream(self, text: str, **kwargs):
+        await asyncio.sleep(self.latency.sample())
+        remaining = tts_audio_bytes(text)
+        while remaining > 0:
+            chunk = min(TTS_CHUNK_BYTES, remaining)
+            remaining -= chunk
+            yield b"\xff" * chunk
+            await asyncio.sleep(chunk / TTS_BYTES_PER_SECOND / TTS_REALTIME_FACTOR)
+
+
+# ElevenLabs stream-input websocket: audio for each text chunk, isFinal after
+# the empty text that closes the stream
+async def stub_tts_input_stream(websocket, latency: Latency):
+    first = True
+    async for message in websocket:
+        text = json.loads(message).get("text", "")
+        if text == "":
+            await websocket.send(json.dumps({"isFinal": True}))
+            return
+        if not text.strip():
+            continue
+        if first:
+            await asyncio.sleep(latency.sample())
+            first = False
+        audio = base64.b64encode(b"\xff" * tts_audio_bytes(text)).decode()
+        await websocket.send(json.dumps({"audio": audio}))
+
+
+def stub_usage(prompt: str) -> SimpleNamespace:
+    tokens = len(str(prompt).split())
+    return SimpleNamespace(
+        input_tokens=tokens,
+        input_tokens_details=SimpleNamespace(cached_tokens=0),
+        prompt_token_count=tokens,
+        cached_content_token_count=0,
+    )
+
+
+def stub_result(fields: set[str]) -> str:
+    result = {
+        "mood": random.choice(MOODS),
+        "confidence": STUB_CONFIDENCE,
+        "question": stub_question(),
+    }
+    return json.dumps({k: v for k, v in result.items() if k in fields})
+
+
+async def stream_words(text: str):
+    for i, word in enumerate(text.split(" ")):
+        await asyncio.sleep(LLM_SECONDS_PER_WORD)
+        yield word if i == 0 else f" {word}"
+
+
+# Responses API: structured output picks the fields from the schema name
+class StubOpenAIResponses:
+    FIELDS = {
+        "MoodAnalysisResult": {"mood", "confidence"},
+        "NextQuestionResult": {"question"},
+        "MoodAndQuestionResult": {"mood", "confidence", "question"},
+    }
+
+    def __init__(self, latency: Latency):
+        self.latency = latency
+
+    async def create(
+        self, input: str, text: dict | None = None, stream=False, **kwargs
+    ):
+        await asyncio.sleep(self.latency.sample())
+        usage = stub_usage(input)
+        if stream:
+            return self._stream(usage)
+        content = SimpleNamespace(
+            type="output_text",
+            text=stub_result(self.FIELDS[text["format"]["name"]]),
+        )
+        return SimpleNamespace(output=[SimpleNamespace(content=[content])], usage=usage)
+
+    async def _stream(self, usage):
+        async for delta in stream_words(stub_question()):
+            yield SimpleNamespace(type="response.output_text.delta", delta=delta)
+        yield SimpleNamespace(
+            type="response.completed", response=SimpleNamespace(usage=usage)
+        )
+
+
+# generate_content: JSON requests get every field, plain text is a question
+class StubGeminiModels:
+    def __init__(self, latency: Latency):
+        self.latency = latency
+
+    async def generate_content(self, contents: list, config: dict, **kwargs):
+        await asyncio.sleep(self.latency.sample())
+        if config.get("response_mime_type") == "application/json":
+            text = stub_result({"mood", "confidence", "question"})
+        else:
+            text = stub_question()
+        return SimpleNamespace(text=text, usage_metadata=stub_usage(contents))
+
+    async def generate_content_stream(self, contents: list, **kwargs):
+        await asyncio.sleep(self.latency.sample())
+        return self._stream(stub_usage(contents))
+
+    async def _stream(self, usage):
+        async for delta in stream_words(stub_question()):
+            yield SimpleNamespace(text=delta, usage_metadata=None)
+        yield SimpleNamespace(text="", usage_metadata=usage)
+
+
+# Firestore clients: every path is the same stand-in, writes wait a latency
+# sample; the sync client is only used from the upload worker threads
+class StubFirestore:
+    def __init__(self, latency: Latency, is_async: bool):
+        self.latency = latency
+        self.is_async = is_async
+        self.writes = 0
+
+    def collection(self, name: str):
+        return self
+
+    def document(self, name: str):
+        return self
+
+    def batch(self):
+        return StubWriteBatch(self)
+
+    def set(self, data: dict, merge: bool = False):
+        if self.is_async:
+            return self.write()
+        self.writes += 1
+        time.sleep(self.latency.sample())
+        return SimpleNamespace(update_time=datetime.now(timezone.utc))
+
+    async def write(self):
+        self.writes += 1
+        await asyncio.sleep(self.latency.sample())
+        return SimpleNamespace(update_time=datetime.now(timezone.utc))
+
+
+class StubWriteBatch:
+    def __init__(self, client: StubFirestore):
+        self.client = client
+
+    def set(self, reference, data: dict, merge: bool = False):
+        pass
+
+    async def commit(self):
+        return [await self.client.write()]
+
+
+# GCS: resumable writers and one-shot uploads wait a latency sample per request
+class StubStorage:
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self.bytes_uploaded = 0
+
+    def bucket(self, name: str):
+        return self
+
+    def blob(self, name: str):
+        return StubBlob(self)
+
+
+class StubBlob:
+    def __init__(self, storage: StubStorage):
+        self.storage = storage
+
+    def open(self, mode: str, chunk_size: int, **kwargs):
+        return StubBlobWriter(self.storage, chunk_size)
+
+    def upload_from_file(self, file, **kwargs):
+        self.storage.bytes_uploaded += len(file.read())
+        time.sleep(self.storage.latency.sample())
+
+
+class StubBlobWriter:
+    def __init__(self, storage: StubStorage, chunk_size: int):
+        self.storage = storage
+        self.chunk_size = chunk_size
+        self._buffered = 0
+
+    def seekable(self) -> bool:
+        return False
+
+    def write(self, data: bytes) -> int:
+        self._buffered += len(data)
+        while self._buffered >= self.chunk_size:
+            self._request(self.chunk_size)
+        return len(data)
+
+    def _request(self, size: int):
+        self._buffered -= size
+        self.storage.bytes_uploaded += size
+        time.sleep(self.storage.latency.sample())
+
+    def close(self):
+        self._request(self._buffered)
+
+    def terminate(self):
+        pass
+
+
+def install_stubs(args: argparse.Namespace):
+    override_client(
+        "elevenlabs",
+        SimpleNamespace(
+            speech_to_text=SimpleNamespace(realtime=StubRealtimeSTT(args.stt_latency))
+        ),
+    )
+    override_client(
+        "elevenlabs_async",
+        SimpleNamespace(text_to_speech=StubTextToSpeech(args.tts_latency)),
+    )
+    override_client(
+        "openai", SimpleNamespace(responses=StubOpenAIResponses(args.llm_latency))
+    )
+    override_client(
+        "gemini",
+        SimpleNamespace(aio=SimpleNamespace(models=StubGeminiModels(args.llm_latency))),
+    )
+    override_client("firestore", StubFirestore(args.storage_latency, is_async=False))
+    override_client(
+        "firestore_async", StubFirestore(args.storage_latency, is_async=True)
+    )
+    override_client("storage", StubStorage(args.storage_latency))
+
+
+def add_latency_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--stt-latency", type=Latency, default=Latency("const:0.15"))
+    parser.add_argument(
+        "--tts-latency", type=Latency, default=Latency("lognormal:0.3:0.3")
+    )
+    parser.add_argument(
+        "--llm-latency", type=Latency, default=Latency("lognormal:0.8:0.4")
+    )
+    parser.add_argument(
+        "--storage-latency", type=Latency, default=Latency("lognormal:0.05:0.5")
+    )
+
+
+async def serve(args: argparse.Namespace):
+    install_stubs(args)
+    tts_server = await websocket_serve(
+        lambda websocket: stub_tts_input_stream(websocket, args.tts_latency),
+        "127.0.0.1",
+        0,
+    )
+    host, port = next(iter(tts_server.sockets)).getsockname()[:2]
+    tts.ELEVENLABS_WS_URL = f"ws://{host}:{port}"
+
+    from app.main import app
+
+    config = uvicorn.Config(app, host=args.host, port=args.port, log_level="warning")
+    async with tts_server:
+        await uvicorn.Server(config).serve()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    add_latency_arguments(parser)
+    args = parser.parse_args()
+    print(
+        f"[BENCH] Stub providers: stt {args.stt_latency}, tts {args.tts_latency}, "
+        f"llm {args.llm_latency}, storage {args.storage_latency}"
+    )
+    asyncio.run(serve(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+import os
+
+import google.auth
+from google.auth.credentials import AnonymousCredentials
+
+# app.deps builds its clients on first use; a test that reaches one gets
+# placeholder config instead of requiring real ADC and API keys
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ELEVENLABS_API_KEY", "test-key")
+os.environ.setdefault("AGENT_URL", "/ws/agent")
+google.auth.default = lambda *args, **kwargs: (AnonymousCredentials(), "test-project")
@@ -0,0 +1,158 @@
+import base64
+import hashlib
+import itertools
+import json
+import re
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import google_crc32c
+
+CONTENT_RANGE = re.compile(r"bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)")
+
+
+class GCSStub:
+    """Minimal in-memory stand-in for the GCS JSON API upload endpoints
+
+    Supports multipart uploads and resumable uploads, recording every
+    resumable chunk so tests can check when data reached the bucket.
+    """
+
+    def __init__(self):
+        self.objects: dict[tuple[str, str], bytes] = {}
+        self.content_types: dict[tuple[str, str], str] = {}
+        # upload id -> (bucket, name, content type, received bytes)
+        self.sessions: dict[str, dict] = {}
+        self.chunk_requests: list[tuple[str, int]] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _object_resource(self, bucket: str, name: str) -> dict:
+        data = self.objects[(bucket, name)]
+        crc = google_crc32c.Checksum(data).digest()
+        return {
+            "kind": "storage#object",
+            "bucket": bucket,
+            "name": name,
+            "size": str(len(data)),
+            "contentType": self.content_types.get((bucket, name), ""),
+            "generation": "1",
+            "md5Hash": base64.b64encode(hashlib.md5(data).digest()).decode(),
+            "crc32c": base64.b64encode(crc).decode(),
+        }
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, body: dict, headers=None):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _body(self) -> bytes:
+                return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                bucket = url.path.split("/b/")[1].split("/")[0]
+                body = self._body()
+                upload_type = query["uploadType"][0]
+
+                if upload_type == "resumable":
+                    metadata = json.loads(body or b"{}")
+                    name = metadata.get("name") or query["name"][0]
+                    upload_id = str(next(stub._ids))
+                    with stub._lock:
+                        stub.sessions[upload_id] = {
+                            "bucket": bucket,
+                            "name": name,
+                            "content_type": self.headers.get(
+                                "X-Upload-Content-Type", ""
+                            ),
+                            "data": bytearray(),
+                        }
+                    location = (
+                        f"{stub.url}/upload/storage/v1/b/{bucket}/o"
+                        f"?uploadType=resumable&upload_id={upload_id}"
+                    )
+                    self._send_json(200, {}, {"Location": location})
+                    return
+
+                # multipart: JSON metadata part followed by the media part
+                message = BytesParser(policy=HTTP).parsebytes(
+                    f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode()
+                    + body
+                )
+                metadata_part, media_part = list(message.iter_parts())
+                metadata = json.loads(metadata_part.get_payload(decode=True))
+                name = metadata["name"]
+                with stub._lock:
+                    stub.objects[(bucket, name)] = media_part.get_payload(decode=True)
+                    stub.content_types[(bucket, name)] = media_part.get_content_type()
+                self._send_json(200, stub._object_resource(bucket, name))
+
+            def do_PUT(self):
+                upload_id = parse_qs(urlparse(self.path).query)["upload_id"][0]
+                body = self._body()
+                start, end, total = CONTENT_RANGE.fullmatch(
+                    self.headers["Content-Range"]
+                ).groups()
+                with stub._lock:
+                    session = stub.sessions[upload_id]
+                    if start is not None:
+                        assert int(start) == len(session["data"])
+                        session["data"].extend(body)
+                        stub.chunk_requests.append((upload_id, len(body)))
+                    if total == "*":
+                        received = len(session["data"])
+                        self.send_response(308)
+                        self.send_header("Range", f"bytes=0-{received - 1}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    key = (session["bucket"], session["name"])
+                    stub.objects[key] = bytes(session["data"])
+                    stub.content_types[key] = session["content_type"]
+                    del stub.sessions[upload_id]
+                self._send_json(200, stub._object_resource(*key))
+
+            def do_DELETE(self):
+                query = parse_qs(urlparse(self.path).query)
+                status = 404
+                if "upload_id" in query:
+                    with stub._lock:
+                        if stub.sessions.pop(query["upload_id"][0], None):
+                            status = 499
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+        return Handler
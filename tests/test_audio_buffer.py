@@ -0,0 +1,91 @@
+import asyncio
+
+from app.audio_buffer import AudioRingBuffer
+
+
+async def read_all(buffer: AudioRingBuffer, max_bytes=1024) -> bytes:
+    data = b""
+    while len(buffer):
+        data += bytes(await buffer.read(max_bytes))
+    return data
+
+
+class TestAudioRingBuffer:
+    """Test the ring buffer between the websocket reader and the STT sender"""
+
+    def test_reads_in_write_order_across_the_wrap(self):
+        """Test audio written past the end of the ring reads back in order"""
+
+        async def run():
+            buffer = AudioRingBuffer(capacity=10)
+            buffer.write(b"abcdefgh")
+            first = bytes(await buffer.read(6))
+            buffer.write(b"ijklmn")
+            return first, await read_all(buffer)
+
+        assert asyncio.run(run()) == (b"abcdef", b"ghijklmn")
+
+    def test_overwrites_oldest_when_full(self):
+        """Test a full ring drops its oldest audio and counts it"""
+
+        async def run():
+            buffer = AudioRingBuffer(capacity=8)
+            with buffer.reading():
+                buffer.write(b"abcdef")
+                buffer.write(b"ghij")
+                buffer.write(b"0123456789")
+                return await read_all(buffer), buffer.dropped_bytes
+
+        assert asyncio.run(run()) == (b"23456789", 12)
+
+    def test_drops_between_turns_are_not_counted(self):
+        """Test audio overwritten with no reader attached is not a drop"""
+        buffer = AudioRingBuffer(capacity=8)
+        buffer.write(b"0123456789")
+        with buffer.reading():
+            buffer.write(b"ab")
+        buffer.write(b"cdef")
+        assert buffer.dropped_bytes == 2
+        assert buffer.clear() == 8
+
+    def test_read_waits_for_audio(self):
+        """Test a reader sleeps until audio is written"""
+
+        async def run():
+            buffer = AudioRingBuffer(capacity=16)
+            reader = asyncio.create_task(buffer.read(16))
+            await asyncio.sleep(0)
+            assert not reader.done()
+            buffer.write(b"audio")
+            return bytes(await reader)
+
+        assert asyncio.run(run()) == b"audio"
+
+    def test_close_wakes_reader_after_draining(self):
+        """Test buffered audio is still read after close, then None"""
+
+        async def run():
+            buffer = AudioRingBuffer(capacity=16)
+            waiting = asyncio.create_task(buffer.read(16))
+            await asyncio.sleep(0)
+            buffer.close()
+            closed_while_waiting = await waiting
+
+            buffer = AudioRingBuffer(capacity=16)
+            buffer.write(b"tail")
+            buffer.close()
+            buffer.write(b"late")
+            return (
+                closed_while_waiting,
+                bytes(await buffer.read(16)),
+                await buffer.read(16),
+            )
+
+        assert asyncio.run(run()) == (None, b"tail", None)
+
+    def test_clear_discards_buffered_audio(self):
+        """Test clearing returns the discarded size and empties the ring"""
+        buffer = AudioRingBuffer(capacity=16)
+        buffer.write(b"old audio")
+        assert buffer.clear() == 9
+        assert len(buffer) == 0
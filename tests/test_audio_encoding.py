@@ -0,0 +1,99 @@
+import io
+import math
+import shutil
+import struct
+
+import pytest
+import soundfile
+
+from app.audio_encoding import (
+    FfmpegFlacEncoder,
+    OpusEncoder,
+    SoundfileFlacEncoder,
+    get_audio_encoder,
+)
+from app.services import encode_linear_16
+
+# one second of a 440Hz tone as 16kHz LINEAR16
+TONE = b"".join(
+    struct.pack("<h", int(8000 * math.sin(2 * math.pi * 440 * i / 16000)))
+    for i in range(16000)
+)
+
+
+class StreamOnlyOutput:
+    """Output without seek support, like a bucket upload"""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, data):
+        self.data.extend(data)
+        return len(data)
+
+    def seekable(self):
+        return False
+
+
+class TestSoundfileEncoders:
+    """Test the in-process libsndfile encoders"""
+
+    def test_flac_round_trip_is_lossless(self):
+        """Test FLAC output decodes back to the original samples"""
+        output = io.BytesIO()
+        encode_linear_16(
+            [TONE[i : i + 3200] for i in range(0, len(TONE), 3200)],
+            output,
+            SoundfileFlacEncoder,
+        )
+
+        output.seek(0)
+        samples, sample_rate = soundfile.read(output, dtype="int16")
+        assert sample_rate == 16000
+        assert samples.tobytes() == TONE
+        assert len(output.getvalue()) < len(TONE)
+
+    def test_streams_to_unseekable_output(self):
+        """Test encoded bytes reach an unseekable output before the end"""
+        output = StreamOnlyOutput()
+        encoder = SoundfileFlacEncoder(output)
+        for _ in range(5):
+            encoder.feed(TONE)
+        assert bytes(output.data[:4]) == b"fLaC"
+        written = len(output.data)
+        encoder.finish()
+        assert len(output.data) > written
+
+    def test_odd_sized_chunks(self):
+        """Test chunks split inside a sample encode the same as whole ones"""
+        whole, split = io.BytesIO(), io.BytesIO()
+        encode_linear_16([TONE], whole, SoundfileFlacEncoder)
+        encode_linear_16(
+            [TONE[:1001], TONE[1001:2999], TONE[2999:]], split, SoundfileFlacEncoder
+        )
+        assert whole.getvalue() == split.getvalue()
+
+    def test_opus_is_smaller_than_flac(self):
+        """Test Opus produces an Ogg stream smaller than FLAC"""
+        flac, opus = io.BytesIO(), io.BytesIO()
+        encode_linear_16([TONE] * 3, flac, SoundfileFlacEncoder)
+        encode_linear_16([TONE] * 3, opus, OpusEncoder)
+        assert opus.getvalue()[:4] == b"OggS"
+        assert len(opus.getvalue()) < len(flac.getvalue())
+
+    def test_unknown_encoder_raises(self):
+        """Test selecting an encoder that does not exist fails clearly"""
+        assert get_audio_encoder("opus") is OpusEncoder
+        with pytest.raises(ValueError, match="Unknown audio encoder"):
+            get_audio_encoder("mp3")
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+class TestFfmpegEncoding:
+    """Test streaming FLAC encoding through ffmpeg"""
+
+    def test_encodes_chunks_to_flac(self):
+        """Test streamed chunks produce a FLAC stream"""
+        output = io.BytesIO()
+        encode_linear_16([TONE] * 2, output, FfmpegFlacEncoder)
+        assert output.getvalue()[:4] == b"fLaC"
@@ -0,0 +1,192 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from google.auth.credentials import AnonymousCredentials
+from google.auth.exceptions import DefaultCredentialsError
+from google.cloud import storage
+
+from app import services
+from app.audio_upload import StreamingAudioUpload
+from app.routes.routes_agent import open_session_upload
+from tests.gcs_stub import GCSStub
+
+CHUNK = 256 * 1024
+BUCKET = "test-bucket"
+
+
+class PassthroughEncoder:
+    """Encoder stand-in that writes PCM through unchanged"""
+
+    content_type = "audio/flac"
+    extension = "flac"
+
+    def __init__(self, output):
+        self.output = output
+
+    def feed(self, pcm):
+        self.output.write(pcm)
+
+    def finish(self):
+        pass
+
+
+class FailingEncoder(PassthroughEncoder):
+    def feed(self, pcm):
+        raise RuntimeError("encoder crashed")
+
+
+@pytest.fixture
+def gcs(monkeypatch):
+    stub = GCSStub().start()
+    monkeypatch.setenv("STORAGE_EMULATOR_HOST", stub.url)
+    # the client otherwise keeps fetching bucket metadata in a background thread
+    monkeypatch.setenv("DISABLE_GCS_PYTHON_CLIENT_OTEL_BUCKET_METADATA", "true")
+    monkeypatch.setenv("BUCKET_NAME", BUCKET)
+    monkeypatch.setenv("BUCKET_URL", "https://storage.test/")
+    client = storage.Client(project="test-project", credentials=AnonymousCredentials())
+    monkeypatch.setattr(services, "get_storage_client", lambda: client)
+    yield stub
+    stub.stop()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def audio_blob(session_id="session"):
+    return services.agent_audio_blob(session_id, "2026-01-01T00:00:00")
+
+
+class TestStreamingAudioUpload:
+    """Test the resumable upload that runs during the session"""
+
+    def test_chunks_are_uploaded_before_finalize(self, gcs):
+        """Test full chunks reach the bucket while audio is still arriving"""
+        upload = StreamingAudioUpload(audio_blob(), PassthroughEncoder, CHUNK)
+        audio = bytes(range(256)) * (CHUNK * 3 // 256) + b"tail"
+        for offset in range(0, len(audio), 4096):
+            upload.feed(audio[offset : offset + 4096])
+
+        wait_for(lambda: len(gcs.chunk_requests) == 3)
+        assert all(size == CHUNK for _, size in gcs.chunk_requests)
+        assert not gcs.objects
+
+        upload.finalize()
+        key = (BUCKET, audio_blob().name)
+        assert gcs.objects[key] == audio
+        assert gcs.content_types[key] == "audio/flac"
+        assert not gcs.sessions
+
+    def test_default_encoder_streams_flac(self, gcs):
+        """Test the in-process encoder streams a FLAC object to the bucket"""
+        upload = StreamingAudioUpload(audio_blob(), chunk_size=CHUNK)
+        for _ in range(50):
+            upload.feed(b"\x01\x02" * 1600)
+        upload.finalize()
+        key = (BUCKET, audio_blob().name)
+        assert gcs.objects[key][:4] == b"fLaC"
+        assert gcs.content_types[key] == "audio/flac"
+
+    def test_abort_leaves_no_object(self, gcs):
+        """Test an aborted upload is never finalized"""
+        upload = StreamingAudioUpload(audio_blob(), PassthroughEncoder, CHUNK)
+        upload.feed(b"\x00" * (CHUNK + 1024))
+        wait_for(lambda: len(gcs.chunk_requests) == 1)
+        upload.abort()
+        assert upload._done.wait(5)
+        assert not gcs.objects
+
+    def test_finalize_without_audio_raises(self, gcs):
+        """Test finalizing an upload that never received audio fails"""
+        upload = StreamingAudioUpload(audio_blob(), PassthroughEncoder, CHUNK)
+        with pytest.raises(RuntimeError):
+            upload.finalize()
+
+    def test_encoder_error_is_raised_on_finalize(self, gcs):
+        """Test encoder failures surface when finalizing"""
+        upload = StreamingAudioUpload(audio_blob(), FailingEncoder, CHUNK)
+        upload.feed(b"\x00" * 1024)
+        with pytest.raises(RuntimeError, match="encoder crashed"):
+            upload.finalize()
+        assert not gcs.objects
+
+    def test_sessions_share_the_writer_threads(self, gcs):
+        """Test concurrent uploads interleave on one writer thread, in order"""
+        executor = ThreadPoolExecutor(max_workers=1)
+        uploads = [
+            StreamingAudioUpload(
+                audio_blob(f"session-{i}"), PassthroughEncoder, CHUNK, executor
+            )
+            for i in range(3)
+        ]
+        before = threading.active_count()
+        for n in range(200):
+            for i, upload in enumerate(uploads):
+                upload.feed(bytes([i, n % 256]) * 1024)
+        assert threading.active_count() <= before + 1
+        for upload in uploads:
+            upload.finalize()
+        executor.shutdown()
+
+        for i in range(3):
+            expected = b"".join(bytes([i, n % 256]) * 1024 for n in range(200))
+            assert gcs.objects[(BUCKET, audio_blob(f"session-{i}").name)] == expected
+
+
+class TestUploadAgentAudio:
+    """Test finishing the session audio upload"""
+
+    def test_streamed_upload_is_finalized(self, gcs, tmp_path):
+        """Test a streamed session only finalizes the resumable upload"""
+        upload = StreamingAudioUpload(audio_blob(), PassthroughEncoder, CHUNK)
+        upload.feed(b"\x01" * 5000)
+        audio_path = tmp_path / "session.pcm"
+        audio_path.write_bytes(b"\x01" * 5000)
+
+        url = services.upload_agent_audio_to_bucket(
+            audio_path, "session", "2026-01-01T00:00:00", upload
+        )
+
+        assert url == "https://storage.test/agent/session_2026-01-01T00:00:00.flac"
+        assert gcs.objects[(BUCKET, audio_blob().name)] == b"\x01" * 5000
+
+    def test_falls_back_to_recording(self, gcs, tmp_path, monkeypatch):
+        """Test a failed stream is replaced by an upload of the recording"""
+        monkeypatch.setattr(services, "get_audio_encoder", lambda: PassthroughEncoder)
+        upload = StreamingAudioUpload(audio_blob(), FailingEncoder, CHUNK)
+        upload.feed(b"\x02" * 5000)
+        audio_path = tmp_path / "session.pcm"
+        audio_path.write_bytes(b"\x02" * 5000)
+
+        services.upload_agent_audio_to_bucket(
+            audio_path, "session", "2026-01-01T00:00:00", upload
+        )
+
+        key = (BUCKET, audio_blob().name)
+        assert gcs.objects[key] == b"\x02" * 5000
+        assert gcs.content_types[key] == "audio/flac"
+
+
+class TestOpenSessionUpload:
+    """Test starting the streaming upload of a session"""
+
+    def test_storage_failure_falls_back_to_the_spool(self, monkeypatch):
+        """Test missing credentials leave the session without a live upload"""
+
+        def no_credentials():
+            raise DefaultCredentialsError("no credentials")
+
+        monkeypatch.setattr(services, "get_storage_client", no_credentials)
+        upload = asyncio.run(open_session_upload("session", "2026-01-01T00:00:00"))
+        assert upload is None
+
+    def test_upload_is_opened(self, gcs):
+        """Test a working bucket gives the session its streaming upload"""
+        upload = asyncio.run(open_session_upload("session", "2026-01-01T00:00:00"))
+        assert upload.blob.name == audio_blob().name
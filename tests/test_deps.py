@@ -0,0 +1,116 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from app import deps
+from app.deps import (
+    get_openai_client,
+    override_client,
+    prewarm_clients,
+    reset_clients,
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients():
+    reset_clients()
+    yield
+    reset_clients()
+
+
+def counting_factory(monkeypatch, name: str) -> list:
+    built = []
+
+    def factory():
+        built.append(object())
+        return SimpleNamespace(index=len(built))
+
+    monkeypatch.setitem(deps._factories, name, factory)
+    return built
+
+
+class TestClientProviders:
+    """Test the lazily built clients"""
+
+    def test_built_on_first_use_only(self, monkeypatch):
+        """Test a client is built when first asked for and then reused"""
+        built = counting_factory(monkeypatch, "openai")
+        assert built == []
+        assert get_openai_client() is get_openai_client()
+        assert len(built) == 1
+
+    def test_built_once_across_threads(self, monkeypatch):
+        """Test concurrent first uses from worker threads share one client"""
+        built = counting_factory(monkeypatch, "storage")
+        barrier = threading.Barrier(8)
+        clients = []
+
+        def use():
+            barrier.wait()
+            clients.append(deps.get_storage_client())
+
+        threads = [threading.Thread(target=use) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(built) == 1
+        assert all(client is clients[0] for client in clients)
+
+    def test_override_and_reset(self, monkeypatch):
+        """Test an override replaces the client until the clients are reset"""
+        built = counting_factory(monkeypatch, "openai")
+        stand_in = SimpleNamespace()
+        override_client("openai", stand_in)
+        assert get_openai_client() is stand_in
+        reset_clients()
+        assert get_openai_client() is not stand_in
+        assert len(built) == 1
+
+    def test_override_unknown_client(self):
+        """Test overriding a client the app does not use is an error"""
+        with pytest.raises(KeyError):
+            override_client("anthropic", SimpleNamespace())
+
+
+class TestPrewarm:
+    """Test opening client connections at startup"""
+
+    def test_failures_do_not_stop_startup(self, monkeypatch):
+        """Test every client is built and warmed, skipping ones that fail"""
+        for name in deps._factories:
+            counting_factory(monkeypatch, name)
+
+        def no_credentials():
+            raise RuntimeError("no credentials")
+
+        monkeypatch.setitem(deps._factories, "gemini", no_credentials)
+        warmed = []
+
+        async def warm(name: str):
+            warmed.append(name)
+            if name == "openai":
+                raise ConnectionError("unreachable")
+
+        for name in deps._warmers:
+            monkeypatch.setitem(deps._warmers, name, lambda name=name: warm(name))
+
+        asyncio.run(prewarm_clients(timeout=1.0))
+        assert sorted(warmed) == ["elevenlabs_async", "firestore_async", "openai"]
+        assert set(deps._clients) == set(deps._factories) - {"gemini"}
+
+    def test_slow_warmup_times_out(self, monkeypatch):
+        """Test a warmer that hangs is given up on after the timeout"""
+        for name in deps._factories:
+            counting_factory(monkeypatch, name)
+        for name in deps._warmers:
+            monkeypatch.setitem(deps._warmers, name, lambda: asyncio.sleep(60))
+
+        async def main():
+            start = asyncio.get_running_loop().time()
+            await prewarm_clients(timeout=0.05)
+            return asyncio.get_running_loop().time() - start
+
+        assert asyncio.run(main()) < 1.0
@@ -0,0 +1,111 @@
+import asyncio
+import os
+import uuid
+from datetime import datetime
+
+import pytest
+from google.cloud import firestore
+
+from app import services
+from app.models import AgentSession, QAMoodPair
+
+# run with the emulator, e.g. `gcloud emulators firestore start --host-port=localhost:8080`
+# and FIRESTORE_EMULATOR_HOST=localhost:8080
+pytestmark = pytest.mark.skipif(
+    not os.getenv("FIRESTORE_EMULATOR_HOST"), reason="Firestore emulator not running"
+)
+
+CREATED_AT = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def make_pair(i: int) -> QAMoodPair:
+    return QAMoodPair(
+        question=f"question {i}",
+        answer=f"answer {i}",
+        mood="content",
+        confidence=0.5,
+        depth=2,
+    )
+
+
+def make_session(session_id: str, turns: int) -> AgentSession:
+    return AgentSession(
+        session_id=session_id,
+        created_at=CREATED_AT,
+        qa_pairs=[make_pair(i) for i in range(turns)],
+        final_mood="content",
+        final_confidence=0.95,
+        final_depth=2,
+        question_count=turns,
+    )
+
+
+@pytest.fixture
+def session_id(monkeypatch):
+    monkeypatch.setattr(
+        services,
+        "get_firestore_async_client",
+        lambda: firestore.AsyncClient(project="test-project"),
+    )
+    monkeypatch.setattr(
+        services,
+        "get_firestore_client",
+        lambda: firestore.Client(project="test-project"),
+    )
+    return str(uuid.uuid4())
+
+
+def read_session(session_id: str) -> tuple[dict, list[dict]]:
+    doc_ref = (
+        firestore.Client(project="test-project")
+        .collection("sessions")
+        .document(session_id)
+    )
+    turns = [
+        turn.to_dict() for turn in doc_ref.collection("turns").order_by("turn").stream()
+    ]
+    return doc_ref.get().to_dict(), turns
+
+
+class TestSessionPersistence:
+    """Test incremental session writes against the Firestore emulator"""
+
+    def test_turns_are_stored_as_they_happen(self, session_id):
+        """Test each turn is written before the session ends"""
+
+        async def run():
+            for i in range(2):
+                await services.save_agent_turn(session_id, CREATED_AT, i, make_pair(i))
+
+        asyncio.run(run())
+
+        session, turns = read_session(session_id)
+        assert session["status"] == "in_progress"
+        assert session["question_count"] == 2
+        assert [turn["answer"] for turn in turns] == ["answer 0", "answer 1"]
+
+    def test_finalize_merges_summary(self, session_id):
+        """Test the final summary is merged into the in-progress session"""
+
+        async def run():
+            for i in range(3):
+                await services.save_agent_turn(session_id, CREATED_AT, i, make_pair(i))
+            await services.finalize_agent_session(make_session(session_id, 3))
+
+        asyncio.run(run())
+
+        session, turns = read_session(session_id)
+        assert session["status"] == "complete"
+        assert session["final_mood"] == "content"
+        assert len(session["qa_pairs"]) == 3
+        assert "audio_url" not in session
+        assert len(turns) == 3
+
+    def test_audio_url_survives_finalize(self, session_id):
+        """Test attaching the audio and finalizing can happen in either order"""
+        services.attach_agent_session_audio(session_id, "https://storage.test/a.flac")
+        asyncio.run(services.finalize_agent_session(make_session(session_id, 1)))
+
+        session, _ = read_session(session_id)
+        assert session["audio_url"] == "https://storage.test/a.flac"
+        assert session["status"] == "complete"
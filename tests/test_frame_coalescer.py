@@ -0,0 +1,54 @@
+import time
+
+from app import frame_coalescer
+from app.frame_coalescer import FrameCoalescer
+
+# one 128-sample render quantum of 16-bit audio, as posted by the browser
+FRAME = b"\x01\x02" * 128
+
+
+class TestFrameCoalescer:
+    """Test grouping inbound audio frames into larger packets"""
+
+    def test_groups_frames_into_packets(self):
+        """Test 80ms packets are cut from 8ms frames without losing bytes"""
+        coalescer = FrameCoalescer(packet_ms=80)
+        packets = []
+        for _ in range(125):
+            packets.extend(coalescer.push(FRAME))
+        tail = coalescer.flush()
+
+        assert all(len(p) == 2560 for p in packets)
+        assert len(packets) == 12
+        assert b"".join(packets) + tail == FRAME * 125
+        assert coalescer.frames_in == 125
+        assert coalescer.packets_out == 13
+
+    def test_flush_without_audio(self):
+        """Test flushing an empty coalescer returns nothing"""
+        coalescer = FrameCoalescer()
+        assert coalescer.flush() is None
+        assert coalescer.packets_out == 0
+
+    def test_releases_audio_that_waited_too_long(self, monkeypatch):
+        """Test buffered audio is sent once it is older than the packet length"""
+        now = [100.0]
+        monkeypatch.setattr(time, "monotonic", lambda: now[0])
+        coalescer = FrameCoalescer(packet_ms=80)
+        assert coalescer.push(FRAME) == []
+        now[0] += 0.1
+        assert coalescer.push(FRAME) == [FRAME * 2]
+
+    def test_counts_all_sessions(self, monkeypatch):
+        """Test process-wide counters add up frames and packets"""
+        monkeypatch.setattr(
+            frame_coalescer, "frame_counts", {"frames_in": 0, "packets_out": 0}
+        )
+        for _ in range(2):
+            coalescer = FrameCoalescer(packet_ms=80)
+            for _ in range(100):
+                coalescer.push(FRAME)
+        assert frame_coalescer.get_frame_counts() == {
+            "frames_in": 200,
+            "packets_out": 20,
+        }
@@ -0,0 +1,150 @@
+import asyncio
+from collections import defaultdict
+
+import pytest
+
+from app import hedging, llm_providers, metrics
+from app.hedging import LatencyWindow, hedged_provider, with_hedge
+from app.llm_providers import LLMProvider, get_llm_provider
+from app.metrics import Histogram
+
+
+class FakeLLM:
+    """LLM backend stand-in answering analyze_mood after a fixed delay"""
+
+    def __init__(self, name: str, delay: float, mood: str = "content", error=None):
+        self.name = name
+        self.delay = delay
+        self.mood = mood
+        self.error = error
+        self.calls = 0
+        self.cancelled = False
+
+    async def analyze_mood(self, *args):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        return self.mood, 0.8
+
+    def provider(self) -> LLMProvider:
+        return LLMProvider(
+            name=self.name,
+            analyze_mood=self.analyze_mood,
+            get_next_question=None,
+            stream_next_question=None,
+            analyze_mood_and_next_question=None,
+        )
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    window = LatencyWindow(window=50, percentile=95, min_samples=5, default_delay=0.05)
+    monkeypatch.setattr(hedging, "latency_window", window)
+    monkeypatch.setattr(metrics, "_hedge_counts", defaultdict(int))
+    monkeypatch.setattr(
+        metrics,
+        "hedge_saved_seconds",
+        Histogram("agent_llm_hedge_saved_seconds", "Saved", ("call", "primary")),
+    )
+    return window
+
+
+def analyze(primary: FakeLLM, secondary: FakeLLM):
+    provider = hedged_provider(primary.provider(), secondary.provider())
+    return asyncio.run(provider.analyze_mood([], [], "question", "answer"))
+
+
+class TestHedgedCall:
+    """Test hedging LLM calls across providers"""
+
+    def test_fast_primary_is_not_hedged(self):
+        """Test the secondary is never asked when the primary answers in time"""
+        primary, secondary = FakeLLM("openai", 0.0, "joyful"), FakeLLM("gemini", 0.0)
+        assert analyze(primary, secondary) == ("joyful", 0.8)
+        assert secondary.calls == 0
+        assert metrics._hedge_counts == {
+            ("analyze_mood", "openai", "openai", "false"): 1
+        }
+
+    def test_slow_primary_loses_to_the_hedge(self, fresh_state):
+        """Test the secondary answers first and the primary is cancelled"""
+        # too few samples for a percentile, the 50ms default delay applies
+        for _ in range(3):
+            fresh_state.record("openai", "analyze_mood", 1.0)
+        primary = FakeLLM("openai", 1.0, "joyful")
+        secondary = FakeLLM("gemini", 0.01, "content")
+        assert analyze(primary, secondary) == ("content", 0.8)
+        assert primary.cancelled
+        assert metrics._hedge_counts == {
+            ("analyze_mood", "openai", "gemini", "true"): 1
+        }
+        # saved is estimated from the primary's earlier 1s calls
+        ((_, (_, saved)),) = metrics.hedge_saved_seconds.snapshot().items()
+        assert 0.5 < saved < 1.0
+
+    def test_cancelled_calls_are_not_recorded(self, fresh_state):
+        """Test the loser's cut-short latency stays out of its window"""
+        primary = FakeLLM("openai", 0.1, "joyful")
+        secondary = FakeLLM("gemini", 1.0, "content")
+        assert analyze(primary, secondary) == ("joyful", 0.8)
+        assert secondary.calls == 1 and secondary.cancelled
+        assert fresh_state.hedge_delay("gemini", "analyze_mood") == 0.05
+        assert len(fresh_state._samples[("openai", "analyze_mood")]) == 1
+        assert len(fresh_state._samples[("gemini", "analyze_mood")]) == 0
+
+    def test_delay_follows_the_primary_percentile(self, fresh_state):
+        """Test the hedge fires after the primary's recent p95 latency"""
+        for seconds in (0.01, 0.01, 0.01, 0.01, 0.3):
+            fresh_state.record("openai", "analyze_mood", seconds)
+        assert fresh_state.hedge_delay("openai", "analyze_mood") == 0.3
+        assert fresh_state.hedge_delay("gemini", "analyze_mood") == 0.05
+
+        primary = FakeLLM("openai", 0.1, "joyful")
+        secondary = FakeLLM("gemini", 0.0, "content")
+        assert analyze(primary, secondary) == ("joyful", 0.8)
+        assert secondary.calls == 0
+
+    def test_primary_error_hedges_at_once(self):
+        """Test a failing primary is replaced without waiting for the delay"""
+        primary = FakeLLM("openai", 0.0, error=RuntimeError("overloaded"))
+        secondary = FakeLLM("gemini", 0.0, "content")
+        assert analyze(primary, secondary) == ("content", 0.8)
+        assert metrics._hedge_counts == {
+            ("analyze_mood", "openai", "gemini", "true"): 1
+        }
+
+    def test_empty_result_is_not_valid(self):
+        """Test an empty mood from the primary is not taken"""
+        primary = FakeLLM("openai", 0.0, "")
+        secondary = FakeLLM("gemini", 0.0, "content")
+        assert analyze(primary, secondary) == ("content", 0.8)
+
+    def test_both_failing_raises_the_primary_error(self):
+        """Test the session sees the primary's error when nobody answers"""
+        primary = FakeLLM("openai", 0.0, error=RuntimeError("primary down"))
+        secondary = FakeLLM("gemini", 0.0, error=RuntimeError("secondary down"))
+        with pytest.raises(RuntimeError, match="primary down"):
+            analyze(primary, secondary)
+
+
+class TestWithHedge:
+    """Test choosing the provider to hedge with"""
+
+    def test_single_provider_is_not_hedged(self, monkeypatch):
+        """Test hedging needs a second enabled provider"""
+        monkeypatch.setattr(llm_providers, "LLM_PROVIDERS", ("openai",))
+        provider = get_llm_provider("openai")
+        assert with_hedge(provider) is provider
+
+    def test_question_stream_stays_with_the_primary(self):
+        """Test only the structured calls are hedged"""
+        provider = get_llm_provider("openai")
+        hedged = with_hedge(provider)
+        assert hedged.name == "openai"
+        assert hedged.stream_next_question is provider.stream_next_question
+        assert hedged.analyze_mood is not provider.analyze_mood
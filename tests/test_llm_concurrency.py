@@ -0,0 +1,91 @@
+import asyncio
+import gc
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app import gemini_agent, openai_agent
+
+STUB_LATENCY = 0.05
+SESSION_COUNTS = [1, 10, 50]
+
+
+class StubOpenAIResponses:
+    """Local stand-in for AsyncOpenAI.responses with a fixed network delay"""
+
+    async def create(self, model, input, text, prompt_cache_key=None):
+        await asyncio.sleep(STUB_LATENCY)
+        if text["format"]["name"] == "MoodAnalysisResult":
+            payload = {"mood": "content", "confidence": 0.8}
+        else:
+            payload = {"question": "What made today feel that way?"}
+        content = SimpleNamespace(type="output_text", text=json.dumps(payload))
+        return SimpleNamespace(output=[SimpleNamespace(content=[content])])
+
+
+class StubGeminiModels:
+    """Local stand-in for genai.Client.aio.models with a fixed network delay"""
+
+    async def generate_content(self, model, contents, config):
+        await asyncio.sleep(STUB_LATENCY)
+        if config["response_mime_type"] == "application/json":
+            return SimpleNamespace(
+                text=json.dumps({"mood": "content", "confidence": 0.8})
+            )
+        return SimpleNamespace(text='"What made today feel that way?"')
+
+
+async def run_session(analyze_mood, get_next_question) -> float:
+    start = time.perf_counter()
+    mood, confidence = await analyze_mood(
+        [], [], "Hello! How are you feeling today?", "Pretty good"
+    )
+    await get_next_question(
+        [("Hello! How are you feeling today?", "Pretty good")],
+        [(mood, confidence)],
+        2,
+        3,
+    )
+    return time.perf_counter() - start
+
+
+async def run_parallel_sessions(n, analyze_mood, get_next_question) -> list[float]:
+    return await asyncio.gather(
+        *(run_session(analyze_mood, get_next_question) for _ in range(n))
+    )
+
+
+@pytest.mark.parametrize(
+    "provider",
+    ["openai", "gemini"],
+)
+def test_session_latency_stays_flat_as_sessions_grow(provider, monkeypatch):
+    """Test per-session latency does not grow with the number of parallel sessions"""
+    if provider == "openai":
+        stub = SimpleNamespace(responses=StubOpenAIResponses())
+        monkeypatch.setattr(openai_agent, "get_openai_client", lambda: stub)
+        analyze, next_question = (
+            openai_agent.openai_analyze_mood,
+            openai_agent.openai_get_next_question,
+        )
+    else:
+        stub = SimpleNamespace(models=StubGeminiModels())
+        monkeypatch.setattr(gemini_agent, "get_gemini_client", lambda: stub)
+        analyze, next_question = (
+            gemini_agent.gemini_analyze_mood,
+            gemini_agent.gemini_get_next_question,
+        )
+
+    # a full collection of garbage left by earlier tests would land in the timings
+    gc.collect()
+    worst_latency = {
+        n: max(asyncio.run(run_parallel_sessions(n, analyze, next_question)))
+        for n in SESSION_COUNTS
+    }
+
+    # two serial stub calls per session; a blocking client would scale with N
+    baseline = 2 * STUB_LATENCY
+    for n, latency in worst_latency.items():
+        assert latency < baseline * 2, f"N={n} took {latency:.3f}s"
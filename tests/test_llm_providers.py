@@ -0,0 +1,78 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app import llm_providers, openai_agent
+from app.llm_providers import get_llm_provider
+from app.routes.routes_agent import session_llm_provider
+
+# what a cold start imports with only one provider enabled
+STARTUP = """
+import json, sys
+import app.main
+from app.llm_providers import load_llm_providers
+load_llm_providers()
+print(json.dumps({sdk: sdk in sys.modules for sdk in ("openai", "google.genai")}))
+"""
+
+
+def startup_imports(providers: str) -> dict[str, bool]:
+    result = subprocess.run(
+        [sys.executable, "-c", STARTUP],
+        env={**os.environ, "LLM_PROVIDERS": providers},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+class TestLLMProviders:
+    """Test the LLM provider registry"""
+
+    def test_provider_calls(self):
+        """Test a provider exposes its backend's functions"""
+        provider = get_llm_provider("OpenAI")
+        assert provider.name == "openai"
+        assert provider.analyze_mood is openai_agent.openai_analyze_mood
+        assert (
+            provider.analyze_mood_and_next_question
+            is openai_agent.openai_analyze_mood_and_next_question
+        )
+
+    def test_default_is_first_enabled(self, monkeypatch):
+        """Test sessions without an llm get the first enabled provider"""
+        monkeypatch.setattr(llm_providers, "LLM_PROVIDERS", ("gemini", "openai"))
+        assert get_llm_provider(None).name == "gemini"
+
+    def test_unknown_provider(self):
+        """Test asking for a provider that does not exist fails"""
+        with pytest.raises(ValueError, match="Unknown LLM provider"):
+            get_llm_provider("claude")
+
+    def test_disabled_provider(self, monkeypatch):
+        """Test providers left out of LLM_PROVIDERS cannot be used"""
+        monkeypatch.setattr(llm_providers, "LLM_PROVIDERS", ("openai",))
+        with pytest.raises(ValueError, match="not enabled"):
+            get_llm_provider("gemini")
+
+    def test_session_falls_back_to_the_default(self, monkeypatch):
+        """Test a session asking for an unusable provider gets the default one"""
+        monkeypatch.setattr(llm_providers, "LLM_PROVIDERS", ("openai",))
+        assert session_llm_provider("claude").name == "openai"
+        assert session_llm_provider("gemini").name == "openai"
+        assert session_llm_provider("OpenAI").name == "openai"
+
+    @pytest.mark.parametrize(
+        "providers, expected",
+        [
+            ("openai", {"openai": True, "google.genai": False}),
+            ("gemini", {"openai": False, "google.genai": True}),
+        ],
+    )
+    def test_startup_imports_only_enabled_sdks(self, providers, expected):
+        """Test a disabled provider's SDK is never imported"""
+        assert startup_imports(providers) == expected
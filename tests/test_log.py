@@ -0,0 +1,95 @@
+import asyncio
+import json
+import logging
+import queue
+
+from app.log import (
+    AsyncQueueHandler,
+    session_id_var,
+    setup_logging,
+    shutdown_logging,
+)
+
+
+def queue_logger(name: str, maxsize: int = 0):
+    log_queue = queue.Queue(maxsize=maxsize)
+    handler = AsyncQueueHandler(log_queue)
+    logger = logging.getLogger(f"app.test_log.{name}")
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger, handler, log_queue
+
+
+def drain(log_queue: queue.Queue) -> list[logging.LogRecord]:
+    records = []
+    while not log_queue.empty():
+        records.append(log_queue.get_nowait())
+    return records
+
+
+class TestAsyncQueueHandler:
+    """Test the queue-backed log handler"""
+
+    def test_records_are_tagged_with_the_session(self):
+        """Test tasks log with the session id of the handler that started them"""
+        logger, _, log_queue = queue_logger("session")
+
+        async def session(session_id: str):
+            session_id_var.set(session_id)
+            await asyncio.create_task(asyncio.to_thread(logger.info, "in a thread"))
+            logger.info("in the handler")
+
+        async def main():
+            await asyncio.gather(session("a"), session("b"))
+            logger.info("outside")
+
+        asyncio.run(main())
+        tags = sorted(r.session_id for r in drain(log_queue))
+        assert tags == ["-", "a", "a", "b", "b"]
+
+    def test_debug_is_dropped_by_level(self):
+        """Test hot-path debug records never reach the queue at INFO"""
+        logger, _, log_queue = queue_logger("level")
+        logger.debug("hot path %s", object())
+        logger.info("state change")
+        assert [r.getMessage() for r in drain(log_queue)] == ["state change"]
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        """Test records past the queue size are counted and dropped"""
+        logger, handler, log_queue = queue_logger("full", maxsize=2)
+        for i in range(5):
+            logger.info("record %d", i)
+        assert [r.getMessage() for r in drain(log_queue)] == ["record 0", "record 1"]
+        assert handler.dropped == 3
+
+    def test_messages_are_formatted_by_the_writer(self):
+        """Test the arguments travel with the record unformatted"""
+        logger, _, log_queue = queue_logger("prepare")
+        logger.info("turn %d", 3)
+        (record,) = drain(log_queue)
+        assert record.msg == "turn %d"
+        assert record.args == (3,)
+
+
+class TestSetupLogging:
+    """Test the app logging configuration"""
+
+    def test_json_output(self, capsys):
+        """Test JSON lines carry the level, logger and session id"""
+        shutdown_logging()
+        setup_logging("INFO", "json")
+        try:
+            session_id_var.set("session-1")
+            logging.getLogger("app.test_log").warning("upload %s failed", "x")
+            logging.getLogger("app.test_log").debug("not written")
+        finally:
+            shutdown_logging()
+            session_id_var.set(None)
+
+        (line,) = capsys.readouterr().out.splitlines()
+        data = json.loads(line)
+        assert data["level"] == "WARNING"
+        assert data["logger"] == "app.test_log"
+        assert data["session_id"] == "session-1"
+        assert data["message"] == "upload x failed"
@@ -0,0 +1,84 @@
+from app import metrics
+from app.metrics import Histogram, record_turn_timings, render_metrics
+from app.models import TurnTimings
+
+
+class TestHistogram:
+    """Test the Prometheus histogram"""
+
+    def test_buckets_are_cumulative(self):
+        """Test observations land in every bucket at or above them"""
+        histogram = Histogram("stage_seconds", "Stage time", ("llm",), (0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value, "openai")
+
+        lines = histogram.render()
+        assert 'stage_seconds_bucket{llm="openai",le="0.1"} 2' in lines
+        assert 'stage_seconds_bucket{llm="openai",le="1.0"} 3' in lines
+        assert 'stage_seconds_bucket{llm="openai",le="+Inf"} 4' in lines
+        assert 'stage_seconds_count{llm="openai"} 4' in lines
+        assert 'stage_seconds_sum{llm="openai"} 2.65' in lines
+
+    def test_label_values_are_escaped(self):
+        """Test quotes in label values do not break the exposition format"""
+        histogram = Histogram("stage_seconds", "Stage time", ("llm",), (1.0,))
+        histogram.observe(0.5, 'say "hi"')
+        assert 'stage_seconds_count{llm="say \\"hi\\""} 1' in histogram.render()
+
+
+class TestRenderMetrics:
+    """Test the /metrics exposition"""
+
+    def test_turn_timings_and_counters(self, monkeypatch):
+        """Test stages that ran are observed by llm and counters are included"""
+        monkeypatch.setattr(
+            metrics,
+            "stage_seconds",
+            Histogram("agent_stage_seconds", "Stage time", ("stage", "llm")),
+        )
+        record_turn_timings("gemini", TurnTimings(tts_total=1.5, mood_analysis=0.8))
+        upload_stats = {
+            "queue_depth": 1,
+            "in_flight": 0,
+            "spooled": 1,
+            "completed": 3,
+            "failed": 0,
+            "retries": 2,
+        }
+        text = render_metrics(
+            {"frames_in": 100, "packets_out": 10},
+            {
+                ("openai", "mood_analysis"): {
+                    "calls": 2,
+                    "input_tokens": 900,
+                    "cached_tokens": 512,
+                }
+            },
+            upload_stats,
+            {
+                "hits": 3,
+                "misses": 1,
+                "hit_rate": 0.75,
+                "bytes_saved": 4096,
+                "memory_entries": 2,
+                "memory_bytes": 2048,
+                "disk_bytes": 0,
+            },
+        )
+
+        lines = text.splitlines()
+        assert 'agent_stage_seconds_count{stage="tts_total",llm="gemini"} 1' in lines
+        assert (
+            'agent_stage_seconds_count{stage="mood_analysis",llm="gemini"} 1' in lines
+        )
+        assert not any('stage="playback_wait"' in line for line in lines)
+        assert "agent_audio_frames_total 100" in lines
+        assert (
+            'agent_prompt_cached_tokens_total{provider="openai",prompt="mood_analysis"} 512'
+            in lines
+        )
+        assert "agent_upload_queue_depth 1" in lines
+        assert "agent_uploads_retries_total 2" in lines
+        assert "agent_tts_cache_bytes_saved_total 4096" in lines
+        assert "agent_tts_cache_hit_rate 0.75" in lines
+        assert text.endswith("\n")
@@ -3,7 +3,7 @@ from datetime import datetime
 import pytest
 from pydantic import ValidationError
 
-from app.models import AgentSession, QAMoodPair
+from app.models import AgentSession, MoodAndQuestionResult, QAMoodPair
 
 
 class TestQAPair:
@@ -306,3 +306,24 @@ class TestAgentSession:
         """Test all fields are required"""
         with pytest.raises(ValidationError):
             AgentSession()
+
+
+class TestMoodAndQuestionResult:
+    """Test MoodAndQuestionResult pydantic model"""
+
+    def test_valid_result(self):
+        """Test valid combined result creation"""
+        result = MoodAndQuestionResult(
+            mood="content", confidence=0.7, question="What made it feel calm?"
+        )
+        assert result.mood == "content"
+        assert result.confidence == 0.7
+        assert result.question == "What made it feel calm?"
+
+    def test_invalid_fields(self):
+        """Test confidence bounds and non-empty question"""
+        with pytest.raises(ValidationError):
+            MoodAndQuestionResult(mood="content", confidence=1.5, question="Q?")
+
+        with pytest.raises(ValidationError):
+            MoodAndQuestionResult(mood="content", confidence=0.5, question="")
@@ -0,0 +1,90 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from app import openai_agent, prompts
+
+QA_PAIRS = [("How are you feeling today?", "Pretty good, a bit tired.")]
+MOODS = [("happy", 0.6)]
+
+
+class TestPromptTemplates:
+    """Test the shared prompt templates"""
+
+    def test_static_prefix_comes_first(self):
+        """Test every prompt starts with its static prefix"""
+        assert prompts.render_mood_prompt(QA_PAIRS, MOODS, "q", "a").startswith(
+            prompts.MOOD_ANALYSIS_PREFIX
+        )
+        assert prompts.render_next_question_prompt(QA_PAIRS, MOODS, 1, 3).startswith(
+            prompts.NEXT_QUESTION_JSON_PREFIX
+        )
+        assert prompts.render_next_question_prompt(
+            QA_PAIRS, MOODS, 1, 3, json_response=False
+        ).startswith(prompts.NEXT_QUESTION_TEXT_PREFIX)
+        assert prompts.render_mood_and_question_prompt(
+            QA_PAIRS, MOODS, "q", "a", 3
+        ).startswith(prompts.MOOD_AND_QUESTION_PREFIX)
+
+    def test_prefix_is_stable_across_sessions(self):
+        """Test different histories share the same prompt prefix"""
+        first = prompts.render_mood_prompt(QA_PAIRS, MOODS, "q1", "a1")
+        second = prompts.render_mood_prompt([], [], "q2", "a2")
+        prefix_length = len(prompts.MOOD_ANALYSIS_PREFIX)
+        assert first[:prefix_length] == second[:prefix_length]
+
+    def test_wheel_is_embedded_as_json(self):
+        """Test the wheel of emotions is rendered as JSON, not a dict repr"""
+        assert prompts.WHEEL_OF_EMOTIONS_JSON in prompts.MOOD_ANALYSIS_PREFIX
+        assert json.loads(prompts.WHEEL_OF_EMOTIONS_JSON)
+
+    def test_history_and_depth_are_rendered(self):
+        """Test the variable part carries history and depth guidance"""
+        prompt = prompts.render_next_question_prompt(QA_PAIRS, MOODS, 1, 3)
+        assert "CURRENT EMOTIONAL DEPTH: primary level (depth 1)" in prompt
+        assert "TARGET DEPTH: secondary level (depth 2)" in prompt
+        assert "A: Pretty good, a bit tired." in prompt
+        assert "Mood: happy, Confidence: 0.6" in prompt
+
+
+class TestPromptUsage:
+    """Test cached-token accounting from provider responses"""
+
+    def test_openai_cached_tokens_are_recorded(self, monkeypatch):
+        """Test cached tokens reported by OpenAI are added to the totals"""
+        monkeypatch.setattr(
+            prompts,
+            "prompt_usage",
+            prompts.defaultdict(
+                lambda: {"calls": 0, "input_tokens": 0, "cached_tokens": 0}
+            ),
+        )
+        captured = {}
+
+        class StubResponses:
+            async def create(self, **kwargs):
+                captured.update(kwargs)
+                content = SimpleNamespace(
+                    type="output_text",
+                    text=json.dumps({"mood": "content", "confidence": 0.8}),
+                )
+                return SimpleNamespace(
+                    output=[SimpleNamespace(content=[content])],
+                    usage=SimpleNamespace(
+                        input_tokens=1500,
+                        input_tokens_details=SimpleNamespace(cached_tokens=1280),
+                    ),
+                )
+
+        client = SimpleNamespace(responses=StubResponses())
+        monkeypatch.setattr(openai_agent, "get_openai_client", lambda: client)
+
+        for _ in range(2):
+            asyncio.run(openai_agent.openai_analyze_mood(QA_PAIRS, MOODS, "q", "a"))
+
+        assert captured["prompt_cache_key"] == "mood_analysis"
+        assert prompts.get_prompt_usage()[("openai", "mood_analysis")] == {
+            "calls": 2,
+            "input_tokens": 3000,
+            "cached_tokens": 2560,
+        }
@@ -0,0 +1,52 @@
+from app.recorder import SessionRecorder
+
+FRAME = b"\x01\x02" * 1600  # 100ms of 16kHz LINEAR16
+
+
+class TestSessionRecorder:
+    """Test the spooled session audio recorder"""
+
+    def test_small_recording_stays_in_memory(self):
+        """Test recordings under the threshold are not written to disk"""
+        recorder = SessionRecorder(max_memory_bytes=1024 * 1024)
+        recorder.write(FRAME)
+        assert len(recorder) == len(FRAME)
+        assert not recorder.spooled_to_disk
+        recorder.close()
+
+    def test_large_recording_spools_to_disk(self):
+        """Test recordings over the threshold roll over to a temp file"""
+        recorder = SessionRecorder(max_memory_bytes=len(FRAME) * 2)
+        for _ in range(10):
+            recorder.write(FRAME)
+        assert recorder.spooled_to_disk
+        assert len(recorder) == len(FRAME) * 10
+        recorder.close()
+
+    def test_spooled_matches_the_rollover(self):
+        """Test the rollover is reported once the recording passes the limit"""
+        recorder = SessionRecorder(max_memory_bytes=len(FRAME))
+        recorder.write(FRAME)
+        assert not recorder.spooled_to_disk
+        recorder.write(b"\x00")
+        assert recorder.spooled_to_disk
+        recorder.close()
+
+    def test_chunks_replay_the_recording(self):
+        """Test chunks yields the full recording in bounded reads"""
+        recorder = SessionRecorder(max_memory_bytes=len(FRAME))
+        for i in range(5):
+            recorder.write(bytes([i]) * len(FRAME))
+        chunks = list(recorder.chunks(size=1000))
+        assert max(len(c) for c in chunks) == 1000
+        assert b"".join(chunks) == b"".join(bytes([i]) * len(FRAME) for i in range(5))
+        # writes after replaying are appended, not overwritten
+        recorder.write(FRAME)
+        assert len(b"".join(recorder.chunks())) == len(FRAME) * 6
+        recorder.close()
+
+    def test_empty_recorder_is_falsy(self):
+        """Test an empty recording is treated as no audio"""
+        recorder = SessionRecorder()
+        assert not recorder
+        recorder.close()
@@ -0,0 +1,356 @@
+import asyncio
+import base64
+import struct
+from types import SimpleNamespace
+
+from elevenlabs import RealtimeEvents
+
+from app import stt
+from app.audio_buffer import AudioRingBuffer
+from app.routes.routes_agent import listen_with_barge_in
+
+CHUNK_BYTES = 2560
+
+
+class StubConnection:
+    """Realtime STT connection stand-in that commits after a few chunks of audio"""
+
+    def __init__(self, commit_after=3 * CHUNK_BYTES):
+        self.handlers = {}
+        self.commit_after = commit_after
+        self.received = 0
+        self.messages = 0
+        self.closed = False
+
+    def on(self, event, callback):
+        self.handlers[event] = callback
+
+    async def send(self, data):
+        self.messages += 1
+        self.received += len(base64.b64decode(data["audio_base_64"]))
+        if self.received % self.commit_after == 0:
+            self.handlers[RealtimeEvents.COMMITTED_TRANSCRIPT](
+                {"text": f"answer {self.received // self.commit_after}"}
+            )
+
+    async def commit(self):
+        self.handlers[RealtimeEvents.COMMITTED_TRANSCRIPT]({"text": "committed"})
+
+    async def close(self):
+        self.closed = True
+
+    def drop(self):
+        self.handlers[RealtimeEvents.CLOSE]()
+
+    def error(self, message_type):
+        self.handlers[RealtimeEvents.ERROR]({"message_type": message_type})
+
+
+class FlakyCommitConnection(StubConnection):
+    """Stand-in whose first commit is rejected, or lost without any reply"""
+
+    def __init__(self, reject: bool):
+        super().__init__(commit_after=10**9)
+        self.reject = reject
+        self.commits = 0
+
+    async def commit(self):
+        self.commits += 1
+        if self.commits > 1:
+            await super().commit()
+        elif self.reject:
+            self.error("commit_throttled")
+
+
+class StubRealtime:
+    def __init__(self):
+        self.connections = []
+
+    async def connect(self, options):
+        connection = StubConnection()
+        self.connections.append(connection)
+        return connection
+
+
+class FakeClientSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+
+def make_manager(monkeypatch, local_vad=False):
+    realtime = StubRealtime()
+    elevenlabs = SimpleNamespace(speech_to_text=SimpleNamespace(realtime=realtime))
+    monkeypatch.setattr(stt, "get_elevenlabs", lambda: elevenlabs)
+    audio_buffer = AudioRingBuffer()
+    manager = stt.STTSessionManager(
+        FakeClientSocket(), audio_buffer, asyncio.Queue(), local_vad=local_vad
+    )
+    return manager, audio_buffer, realtime
+
+
+async def speak(audio_buffer, chunks=3):
+    for _ in range(chunks):
+        audio_buffer.write(b"\x00" * CHUNK_BYTES)
+
+
+def control_messages(websocket):
+    return [m["type"] for m in websocket.sent if m["type"] != "transcript"]
+
+
+class TestSTTSessionManager:
+    """Test the per-websocket STT session manager"""
+
+    def test_one_connection_across_turns(self, monkeypatch):
+        """Test consecutive answers reuse the same realtime connection"""
+
+        async def run():
+            manager, audio_buffer, realtime = make_manager(monkeypatch)
+            answers = []
+            for _ in range(3):
+                manager.prewarm()
+                await speak(audio_buffer)
+                answers.append(await manager.listen())
+            await manager.close()
+            return answers, realtime
+
+        answers, realtime = asyncio.run(run())
+        assert answers == ["answer 1", "answer 2", "answer 3"]
+        assert len(realtime.connections) == 1
+        assert realtime.connections[0].closed
+
+    def test_prewarm_opens_connection_before_listening(self, monkeypatch):
+        """Test the connection is open before the turn starts"""
+
+        async def run():
+            manager, audio_buffer, realtime = make_manager(monkeypatch)
+            manager.prewarm()
+            await asyncio.sleep(0)
+            opened_before_listen = len(realtime.connections)
+            await speak(audio_buffer)
+            await manager.listen()
+            await manager.close()
+            return opened_before_listen
+
+        assert asyncio.run(run()) == 1
+
+    def test_reconnects_after_connection_drops(self, monkeypatch):
+        """Test a dropped connection is replaced on the next turn"""
+
+        async def run():
+            manager, audio_buffer, realtime = make_manager(monkeypatch)
+            await speak(audio_buffer)
+            await manager.listen()
+            realtime.connections[0].drop()
+            await speak(audio_buffer)
+            answer = await manager.listen()
+            await manager.close()
+            return answer, realtime
+
+        answer, realtime = asyncio.run(run())
+        assert answer == "answer 1"
+        assert len(realtime.connections) == 2
+        assert realtime.connections[0].closed
+        assert realtime.connections[1].closed
+
+    def test_non_fatal_error_keeps_connection(self, monkeypatch):
+        """Test per-message errors do not replace the connection"""
+
+        async def run():
+            manager, audio_buffer, realtime = make_manager(monkeypatch)
+            await speak(audio_buffer)
+            await manager.listen()
+            realtime.connections[0].error("commit_throttled")
+            realtime.connections[0].error("insufficient_audio_activity")
+            await speak(audio_buffer)
+            await manager.listen()
+            await manager.close()
+            return realtime
+
+        assert len(asyncio.run(run()).connections) == 1
+
+    def test_fatal_error_replaces_connection(self, monkeypatch):
+        """Test an error that ends the server session reconnects and closes"""
+
+        async def run():
+            manager, audio_buffer, realtime = make_manager(monkeypatch)
+            await speak(audio_buffer)
+            await manager.listen()
+            realtime.connections[0].error("session_time_limit_exceeded")
+            await speak(audio_buffer)
+            await manager.listen()
+            await manager.close()
+            return realtime
+
+        realtime = asyncio.run(run())
+        assert len(realtime.connections) == 2
+        assert realtime.connections[0].closed
+
+    def test_backlog_is_sent_in_larger_messages(self, monkeypatch):
+        """Test audio buffered before listening is merged into fewer sends"""
+
+        async def run():
+            manager, audio_buffer, realtime = make_manager(monkeypatch)
+            await speak(audio_buffer, chunks=30)
+            await manager.listen()
+            await manager.close()
+            return realtime.connections[0]
+
+        connection = asyncio.run(run())
+        assert connection.received == 30 * CHUNK_BYTES
+        assert connection.messages == 5
+
+    def test_local_vad_commits_and_skips_silence(self, monkeypatch):
+        """Test the local VAD commits the answer and leaves silence unsent"""
+        silence = b"\x00" * 32000
+        speech = b"".join(
+            struct.pack("<h", 6000 if i % 80 < 40 else -6000) for i in range(16000)
+        )
+
+        async def run():
+            manager, audio_buffer, realtime = make_manager(monkeypatch, local_vad=True)
+            realtime_connection = StubConnection(commit_after=10**9)
+            realtime.connect = lambda options: asyncio.sleep(0, realtime_connection)
+            for audio in (silence, speech, silence):
+                audio_buffer.write(audio)
+            answer = await manager.listen()
+            await manager.close()
+            return answer, realtime_connection, manager
+
+        answer, connection, manager = asyncio.run(run())
+        vad = manager.vad
+        assert answer == "committed"
+        # the audio was all buffered, so the answer "ended" 700ms before commit
+        assert manager.timings["stt_open"] is not None
+        assert 0.7 <= manager.timings["speech_to_commit"] < 1.0
+        # the speech plus 200ms of preroll and 300ms of hangover
+        assert connection.received == len(speech) + 16000
+        assert vad.stats()["commits"] == 1
+
+    def test_barge_in_stops_question_audio(self, monkeypatch):
+        """Test speech during playback stops the question and is kept in the answer"""
+        speech = b"".join(
+            struct.pack("<h", 6000 if i % 80 < 40 else -6000) for i in range(16000)
+        )
+
+        async def run():
+            manager, audio_buffer, realtime = make_manager(monkeypatch, local_vad=True)
+            connection = StubConnection(commit_after=10**9)
+            realtime.connect = lambda options: asyncio.sleep(0, connection)
+            answer = asyncio.create_task(
+                listen_with_barge_in(
+                    manager.websocket,
+                    manager,
+                    manager.res_queue,
+                    manager.listen_in_background(),
+                )
+            )
+            # the user answers while the question is still playing
+            audio_buffer.write(speech + b"\x00" * 32000)
+            await asyncio.wait_for(manager.speech_started.wait(), 1)
+            await asyncio.sleep(0.01)
+            sent_during_playback = control_messages(manager.websocket)
+            # the client confirms playback once it stopped the audio
+            manager.res_queue.put_nowait({"type": "audio_playback_finished"})
+            transcript, _ = await answer
+            await manager.close()
+            return transcript, connection, sent_during_playback, manager.websocket
+
+        transcript, connection, during, websocket = asyncio.run(run())
+        assert during == ["stop_audio"]
+        assert control_messages(websocket) == ["stop_audio", "listening"]
+        assert transcript == "committed"
+        # captured from its first syllable, plus the hangover
+        assert connection.received == len(speech) + 9600
+
+    def test_barge_in_without_interruption(self, monkeypatch):
+        """Test the question plays out when the user waits for it"""
+
+        async def run():
+            manager, audio_buffer, _ = make_manager(monkeypatch)
+            manager.res_queue.put_nowait({"type": "audio_playback_finished"})
+            answer = asyncio.create_task(
+                listen_with_barge_in(
+                    manager.websocket,
+                    manager,
+                    manager.res_queue,
+                    manager.listen_in_background(),
+                )
+            )
+            await asyncio.sleep(0.01)
+            await speak(audio_buffer)
+            transcript, playback_wait = await answer
+            await manager.close()
+            return transcript, playback_wait, manager
+
+        transcript, playback_wait, manager = asyncio.run(run())
+        assert transcript == "answer 1"
+        assert playback_wait < 0.5
+        assert control_messages(manager.websocket) == ["listening"]
+        assert not manager.speech_started.is_set()
+
+    def test_partial_transcript_marks_speech(self, monkeypatch):
+        """Test the server VAD path detects speech from partial transcripts"""
+
+        async def run():
+            manager, _, realtime = make_manager(monkeypatch)
+            listening = manager.listen_in_background()
+            await asyncio.sleep(0.01)
+            handlers = realtime.connections[0].handlers
+            handlers[RealtimeEvents.PARTIAL_TRANSCRIPT]({"text": ""})
+            empty = manager.speech_started.is_set()
+            handlers[RealtimeEvents.PARTIAL_TRANSCRIPT]({"text": "I feel"})
+            started = manager.speech_started.is_set()
+            handlers[RealtimeEvents.COMMITTED_TRANSCRIPT]({"text": "I feel fine"})
+            await listening
+            await manager.close()
+            return empty, started
+
+        assert asyncio.run(run()) == (False, True)
+
+
+class TestLostCommits:
+    """Test a local VAD turn still ends when its commit is not answered"""
+
+    @staticmethod
+    def answer_with(monkeypatch, connection, silence_seconds):
+        speech = b"".join(
+            struct.pack("<h", 6000 if i % 80 < 40 else -6000) for i in range(16000)
+        )
+
+        async def run():
+            manager, audio_buffer, realtime = make_manager(monkeypatch, local_vad=True)
+            realtime.connect = lambda options: asyncio.sleep(0, connection)
+            audio_buffer.write(speech + b"\x00" * int(32000 * silence_seconds))
+            answer = await asyncio.wait_for(manager.listen(), 5)
+            await manager.close()
+            return answer
+
+        return asyncio.run(run())
+
+    def test_rejected_commit_is_retried(self, monkeypatch):
+        """Test the VAD commits again after the server throttled its commit"""
+        connection = FlakyCommitConnection(reject=True)
+        assert self.answer_with(monkeypatch, connection, 2.0) == "committed"
+        assert connection.commits == 2
+
+    def test_lost_commit_is_forced_after_the_turn_timeout(self, monkeypatch):
+        """Test a commit that never gets a transcript is sent again on timeout"""
+        monkeypatch.setattr(stt, "STT_TURN_TIMEOUT_SECONDS", 0.2)
+        connection = FlakyCommitConnection(reject=False)
+        assert self.answer_with(monkeypatch, connection, 2.0) == "committed"
+        assert connection.commits == 2
+
+    def test_partial_transcript_is_returned_when_nothing_commits(self, monkeypatch):
+        """Test the turn ends with the partial transcript if commits stay lost"""
+        monkeypatch.setattr(stt, "STT_TURN_TIMEOUT_SECONDS", 0.1)
+        monkeypatch.setattr(stt, "STT_COMMIT_GRACE_SECONDS", 0.1)
+        connection = StubConnection(commit_after=10**9)
+
+        async def lost_commit():
+            connection.handlers[RealtimeEvents.PARTIAL_TRANSCRIPT]({"text": "I feel"})
+
+        connection.commit = lost_commit
+        assert self.answer_with(monkeypatch, connection, 2.0) == "I feel"
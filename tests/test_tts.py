@@ -0,0 +1,303 @@
+import asyncio
+import base64
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi.websockets import WebSocketState
+from websockets.asyncio.server import serve
+
+from app import tts
+from app.tts_cache import TTSCache
+
+
+@pytest.fixture(autouse=True)
+def empty_tts_cache(monkeypatch):
+    cache = TTSCache(max_memory_bytes=1024 * 1024)
+    monkeypatch.setattr(tts, "get_tts_cache", lambda: cache)
+    return cache
+
+
+async def collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+async def token_stream(tokens, events, delay=0.0):
+    for token in tokens:
+        await asyncio.sleep(delay)
+        yield token
+    events.append("llm_done")
+
+
+class FakeClientSocket:
+    """Browser websocket stand-in that records what the server sends"""
+
+    def __init__(self, events):
+        self.application_state = WebSocketState.CONNECTED
+        self.events = events
+        self.sent = []
+
+    async def send_json(self, data):
+        self.sent.append(data)
+        self.events.append("audio")
+
+    async def send_bytes(self, data):
+        self.sent.append(data)
+        self.events.append("audio")
+
+
+class TestTextChunker:
+    """Test grouping of LLM deltas for the TTS input stream"""
+
+    def test_chunks_end_on_word_boundaries(self):
+        """Test chunks are only emitted at splitter characters"""
+        events = []
+        tokens = ["What", " made", " to", "day", " feel", " that", " way", "?"]
+        chunks = asyncio.run(collect(tts.text_chunker(token_stream(tokens, events))))
+        assert "".join(chunks) == "What made today feel that way?"
+        assert all(chunk[-1] in tts.TEXT_SPLITTERS for chunk in chunks)
+
+    def test_trailing_text_is_flushed(self):
+        """Test text without a final splitter is still emitted"""
+        events = []
+        chunks = asyncio.run(
+            collect(tts.text_chunker(token_stream(["Hi", "!!", " you"], events)))
+        )
+        assert "".join(chunks) == "Hi!! you"
+
+
+async def echo_tts(connection):
+    """TTS input stream stand-in that speaks each text chunk as its bytes"""
+    async for message in connection:
+        text = json.loads(message)["text"]
+        if text == "":
+            await connection.send(json.dumps({"isFinal": True}))
+        elif text.strip():
+            audio = base64.b64encode(text.encode()).decode()
+            await connection.send(json.dumps({"audio": audio}))
+
+
+async def failing_token_stream(tokens, events):
+    async for token in token_stream(tokens, events, delay=0.01):
+        yield token
+    raise RuntimeError("LLM stream failed")
+
+
+class TestInputStream:
+    """Test streaming question text into the TTS input stream"""
+
+    def test_audio_is_forwarded_before_llm_finishes(self, monkeypatch):
+        """Test first audio reaches the client while the LLM is still writing"""
+
+        async def run():
+            async with serve(echo_tts, "127.0.0.1", 0) as server:
+                port = server.sockets[0].getsockname()[1]
+                monkeypatch.setattr(tts, "ELEVENLABS_WS_URL", f"ws://127.0.0.1:{port}")
+                events = []
+                client = FakeClientSocket(events)
+                tokens = ["How", " does", " that", " feel", " in", " your", " body?"]
+                stats = await tts.tts_elevenlabs_input_stream(
+                    token_stream(tokens, events, delay=0.02), client
+                )
+                return stats, client, events
+
+        stats, client, events = asyncio.run(run())
+        question = stats.text
+        assert question == "How does that feel in your body?"
+        assert stats.completed
+        assert stats.chunk_count == len(client.sent)
+        assert stats.byte_count == len(question)
+        # the first audio came before the LLM was done, and the LLM before the end
+        assert 0 < stats.time_to_first_chunk < stats.text_time < stats.total_time
+        assert events.index("audio") < events.index("llm_done")
+        spoken = b"".join(base64.b64decode(m["chunk"]) for m in client.sent)
+        assert spoken.decode() == question
+        assert all(m["type"] == "question_audio_base_64" for m in client.sent)
+
+    def test_llm_error_ends_the_stream(self, monkeypatch):
+        """Test an LLM stream failing partway is raised instead of hanging"""
+
+        async def run():
+            async with serve(echo_tts, "127.0.0.1", 0) as server:
+                port = server.sockets[0].getsockname()[1]
+                monkeypatch.setattr(tts, "ELEVENLABS_WS_URL", f"ws://127.0.0.1:{port}")
+                tokens = ["How", " does", " that", " feel?"]
+                await asyncio.wait_for(
+                    tts.tts_elevenlabs_input_stream(
+                        failing_token_stream(tokens, []), FakeClientSocket([])
+                    ),
+                    timeout=5,
+                )
+
+        with pytest.raises(RuntimeError, match="LLM stream failed"):
+            asyncio.run(run())
+
+
+class StubTextToSpeech:
+    """AsyncElevenLabs.text_to_speech stand-in that records chunks read"""
+
+    def __init__(self, chunk_count, delay=0.0):
+        self.chunk_count = chunk_count
+        self.delay = delay
+        self.read = 0
+
+    async def stream(self, **kwargs):
+        for i in range(self.chunk_count):
+            await asyncio.sleep(self.delay)
+            self.read += 1
+            yield bytes([i % 256]) * 100
+
+
+class SlowClientSocket(FakeClientSocket):
+    """Client that disconnects after a number of chunks"""
+
+    def __init__(self, disconnect_after):
+        super().__init__([])
+        self.disconnect_after = disconnect_after
+
+    async def send_json(self, data):
+        await asyncio.sleep(0.01)
+        await super().send_json(data)
+        if len(self.sent) >= self.disconnect_after:
+            self.application_state = WebSocketState.DISCONNECTED
+
+
+class TestTTSSession:
+    """Test the buffered async TTS streamer"""
+
+    def test_streams_all_chunks_and_reports_timings(self, monkeypatch):
+        """Test every chunk is forwarded and timings are reported"""
+        stub = StubTextToSpeech(chunk_count=20, delay=0.005)
+        monkeypatch.setattr(
+            tts, "get_async_elevenlabs", lambda: SimpleNamespace(text_to_speech=stub)
+        )
+        client = FakeClientSocket([])
+
+        stats = asyncio.run(tts.tts_elevenlabs_session("Hello", client))
+        assert stats.completed
+        assert stats.chunk_count == 20
+        assert stats.byte_count == 2000
+        assert 0 < stats.time_to_first_chunk <= stats.total_time
+        assert len(client.sent) == 20
+
+    def test_stops_early_when_client_disconnects(self, monkeypatch):
+        """Test reading stops once the client is gone, bounded by the buffer"""
+        stub = StubTextToSpeech(chunk_count=500)
+        monkeypatch.setattr(
+            tts, "get_async_elevenlabs", lambda: SimpleNamespace(text_to_speech=stub)
+        )
+        client = SlowClientSocket(disconnect_after=3)
+
+        stats = asyncio.run(tts.tts_elevenlabs_session("Hello", client))
+        assert not stats.completed
+        assert stats.chunk_count == 3
+        # the reader never runs further ahead than the bounded buffer allows
+        assert stub.read <= stats.chunk_count + tts.TTS_BUFFER_CHUNKS + 2
+
+
+class TestBinaryFrames:
+    """Test binary question audio framing"""
+
+    def test_frame_layout(self):
+        """Test header is version, kind, sequence followed by raw bytes"""
+        frame = tts.encode_audio_frame(b"\xff\xfbmp3", seq=70000)
+        version, kind, seq = tts.AUDIO_FRAME_HEADER.unpack_from(frame)
+        assert version == tts.AUDIO_FRAME_VERSION
+        assert kind == tts.AUDIO_FRAME_MP3
+        assert seq == 70000 & 0xFFFF
+        assert frame[tts.AUDIO_FRAME_HEADER.size :] == b"\xff\xfbmp3"
+
+    def test_session_sends_binary_frames(self, monkeypatch):
+        """Test negotiated clients get raw frames instead of base64 JSON"""
+        stub = StubTextToSpeech(chunk_count=3)
+        monkeypatch.setattr(
+            tts, "get_async_elevenlabs", lambda: SimpleNamespace(text_to_speech=stub)
+        )
+        client = FakeClientSocket([])
+
+        asyncio.run(tts.tts_elevenlabs_session("Hello", client, binary_audio=True))
+        assert all(isinstance(frame, bytes) for frame in client.sent)
+        sequences = [tts.AUDIO_FRAME_HEADER.unpack_from(f)[2] for f in client.sent]
+        assert sequences == [0, 1, 2]
+        assert client.sent[1][tts.AUDIO_FRAME_HEADER.size :] == bytes([1]) * 100
+
+
+class TestCachedSession:
+    """Test TTS cache hits are replayed instead of synthesized"""
+
+    def test_second_request_is_replayed_from_cache(self, monkeypatch, empty_tts_cache):
+        """Test a repeated question skips ElevenLabs and sends the same audio"""
+        stub = StubTextToSpeech(chunk_count=10)
+        monkeypatch.setattr(
+            tts, "get_async_elevenlabs", lambda: SimpleNamespace(text_to_speech=stub)
+        )
+        first_client = FakeClientSocket([])
+        second_client = FakeClientSocket([])
+
+        first = asyncio.run(
+            tts.tts_elevenlabs_session("Hello!", first_client, binary_audio=True)
+        )
+        second = asyncio.run(
+            tts.tts_elevenlabs_session("Hello!", second_client, binary_audio=True)
+        )
+        assert not first.cached
+        assert second.cached and second.completed
+        assert stub.read == 10
+        header = tts.AUDIO_FRAME_HEADER.size
+        assert b"".join(f[header:] for f in second_client.sent) == b"".join(
+            f[header:] for f in first_client.sent
+        )
+        assert empty_tts_cache.stats()["bytes_saved"] == 1000
+
+    def test_incomplete_stream_is_not_cached(self, monkeypatch, empty_tts_cache):
+        """Test audio cut short by a disconnect never enters the cache"""
+        stub = StubTextToSpeech(chunk_count=50)
+        monkeypatch.setattr(
+            tts, "get_async_elevenlabs", lambda: SimpleNamespace(text_to_speech=stub)
+        )
+        asyncio.run(tts.tts_elevenlabs_session("Hello!", SlowClientSocket(2)))
+        assert empty_tts_cache.stats()["memory_entries"] == 0
+
+
+class TestFirstChunkCallback:
+    """Test the hook barge-in uses to start listening"""
+
+    def test_called_once_before_the_first_chunk(self, monkeypatch):
+        """Test synthesized and cached audio both call it before any audio"""
+        stub = StubTextToSpeech(chunk_count=5)
+        monkeypatch.setattr(
+            tts, "get_async_elevenlabs", lambda: SimpleNamespace(text_to_speech=stub)
+        )
+        for _ in range(2):
+            events = []
+            asyncio.run(
+                tts.tts_elevenlabs_session(
+                    "Hello!",
+                    FakeClientSocket(events),
+                    on_first_chunk=lambda events=events: events.append("first"),
+                )
+            )
+            # the cached replay resends the 500 bytes as a single chunk
+            assert events[0] == "first"
+            assert events.count("first") == 1
+            assert "audio" in events
+
+    def test_input_stream_calls_it_while_the_llm_writes(self, monkeypatch):
+        """Test the streamed question calls it with its first audio"""
+
+        async def run():
+            async with serve(echo_tts, "127.0.0.1", 0) as server:
+                port = server.sockets[0].getsockname()[1]
+                monkeypatch.setattr(tts, "ELEVENLABS_WS_URL", f"ws://127.0.0.1:{port}")
+                events = []
+                await tts.tts_elevenlabs_input_stream(
+                    token_stream(["How", " are", " you?"], events, delay=0.02),
+                    FakeClientSocket(events),
+                    on_first_chunk=lambda: events.append("first"),
+                )
+                return events
+
+        events = asyncio.run(run())
+        assert events[0] == "first"
+        assert events.count("first") == 1
+        assert events.index("first") < events.index("llm_done")
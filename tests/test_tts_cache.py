@@ -0,0 +1,146 @@
+import asyncio
+from pathlib import Path
+
+from elevenlabs import VoiceSettings
+
+from app.tts_cache import TTSCache
+
+SETTINGS = VoiceSettings(stability=0.0, similarity_boost=1.0, speed=1.0)
+
+
+def get(cache: TTSCache, key: str) -> bytes | None:
+    return asyncio.run(cache.get(key))
+
+
+def put(cache: TTSCache, key: str, audio: bytes):
+    asyncio.run(cache.put(key, audio))
+
+
+def make_key(text="Hello! How are you feeling today?", **overrides):
+    params = {
+        "voice_id": "voice",
+        "model_id": "model",
+        "output_format": "mp3_22050_32",
+        "voice_settings": SETTINGS,
+        "text": text,
+    }
+    params.update(overrides)
+    return TTSCache.make_key(**params)
+
+
+class TestCacheKey:
+    """Test TTS cache keys"""
+
+    def test_key_is_stable(self):
+        """Test identical inputs give the same key"""
+        assert make_key() == make_key()
+
+    def test_key_changes_with_every_input(self):
+        """Test voice, model, format, settings and text all change the key"""
+        keys = {
+            make_key(),
+            make_key(text="Hi"),
+            make_key(voice_id="other"),
+            make_key(model_id="other"),
+            make_key(output_format="mp3_44100_128"),
+            make_key(voice_settings=VoiceSettings(stability=0.5, speed=1.0)),
+        }
+        assert len(keys) == 6
+
+
+class TestMemoryTier:
+    """Test the in-memory LRU tier"""
+
+    def test_hit_and_miss_counters(self):
+        """Test hits, misses and bytes saved are counted"""
+        cache = TTSCache(max_memory_bytes=1000)
+        assert get(cache, "a") is None
+        put(cache, "a", b"x" * 100)
+        assert get(cache, "a") == b"x" * 100
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+        assert stats["bytes_saved"] == 100
+
+    def test_least_recently_used_is_evicted(self):
+        """Test the oldest untouched entry is evicted first"""
+        cache = TTSCache(max_memory_bytes=300)
+        put(cache, "a", b"a" * 100)
+        put(cache, "b", b"b" * 100)
+        put(cache, "c", b"c" * 100)
+        get(cache, "a")
+        put(cache, "d", b"d" * 100)
+        assert get(cache, "b") is None
+        assert get(cache, "a") is not None
+        assert cache.stats()["memory_bytes"] == 300
+
+
+class TestDiskTier:
+    """Test the on-disk tier"""
+
+    def test_entries_survive_a_new_cache(self, tmp_path):
+        """Test a fresh cache over the same directory serves earlier entries"""
+        put(
+            TTSCache(100, disk_dir=str(tmp_path), max_disk_bytes=10_000), "a", b"a" * 50
+        )
+        cache = TTSCache(100, disk_dir=str(tmp_path), max_disk_bytes=10_000)
+        assert cache.stats()["disk_bytes"] == 50
+        assert get(cache, "a") == b"a" * 50
+
+    def test_size_based_eviction(self, tmp_path):
+        """Test the disk tier stays under its size limit"""
+        cache = TTSCache(0, disk_dir=str(tmp_path), max_disk_bytes=250)
+        for key in ["a", "b", "c", "d"]:
+            put(cache, key, key.encode() * 100)
+        assert cache.stats()["disk_bytes"] <= 250
+        assert sum(p.stat().st_size for p in tmp_path.iterdir()) <= 250
+        assert get(cache, "d") == b"d" * 100
+
+    def test_unusable_directory_falls_back_to_memory(self, tmp_path):
+        """Test a disk dir that cannot be created leaves a memory-only cache"""
+        blocker = tmp_path / "file"
+        blocker.write_bytes(b"")
+        cache = TTSCache(1000, disk_dir=str(blocker / "tts"), max_disk_bytes=10_000)
+        assert cache.disk_dir is None
+        put(cache, "a", b"a" * 50)
+        assert get(cache, "a") == b"a" * 50
+
+    def test_disk_errors_are_not_raised(self, tmp_path, monkeypatch):
+        """Test failing disk reads and writes only cost the disk tier"""
+        cache = TTSCache(1000, disk_dir=str(tmp_path), max_disk_bytes=10_000)
+
+        def disk_full(*args):
+            raise OSError(28, "No space left on device")
+
+        monkeypatch.setattr(Path, "write_bytes", disk_full)
+        monkeypatch.setattr(Path, "read_bytes", disk_full)
+        put(cache, "a", b"a" * 50)
+        assert list(tmp_path.iterdir()) == []
+        assert cache.stats()["disk_bytes"] == 0
+        assert get(cache, "a") == b"a" * 50
+        cache._memory.clear()
+        assert get(cache, "a") is None
+
+    def test_removed_directory_is_recreated(self, tmp_path):
+        """Test entries are written again after the directory disappears"""
+        disk_dir = tmp_path / "tts"
+        cache = TTSCache(0, disk_dir=str(disk_dir), max_disk_bytes=10_000)
+        disk_dir.rmdir()
+        assert get(cache, "a") is None
+        put(cache, "a", b"a" * 50)
+        assert get(cache, "a") == b"a" * 50
+
+    def test_eviction_does_not_scan_the_directory(self, tmp_path, monkeypatch):
+        """Test writes evict from the size index instead of listing the files"""
+        cache = TTSCache(0, disk_dir=str(tmp_path), max_disk_bytes=250)
+
+        def no_listing(*args):
+            raise AssertionError("directory scanned")
+
+        monkeypatch.setattr(Path, "glob", no_listing)
+        for key in ["a", "b", "c", "d"]:
+            put(cache, key, key.encode() * 100)
+        monkeypatch.undo()
+        assert cache.stats()["disk_bytes"] == 200
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["c.audio", "d.audio"]
@@ -0,0 +1,208 @@
+import threading
+import time
+
+from pydantic import ValidationError
+
+from app.models import AgentSession, SessionUploadJob
+from app.recorder import SessionRecorder
+from app.upload_queue import UploadQueue
+
+
+def make_job(session_id="session") -> SessionUploadJob:
+    return SessionUploadJob(
+        session_id=session_id,
+        session_timestamp="2026-01-01T00:00:00",
+    )
+
+
+def make_recorder(audio=b"\x01\x02" * 100, upload=None) -> SessionRecorder:
+    recorder = SessionRecorder(upload=upload)
+    recorder.write(audio)
+    return recorder
+
+
+class RecordingHandler:
+    """Upload handler stand-in that records calls and can fail on demand"""
+
+    def __init__(self, failures=0, error=None, delay=0.0):
+        self.calls = []
+        self.failures = failures
+        self.error = error or RuntimeError("bucket unavailable")
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, job, audio_path, live_upload):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            self.calls.append((job.session_id, audio_path.read_bytes(), live_upload))
+            if len(self.calls) <= self.failures:
+                raise self.error
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+class TestUploadQueue:
+    """Test the durable upload worker pool"""
+
+    def test_uploads_spooled_session(self, tmp_path):
+        """Test a submitted session is uploaded and removed from the spool"""
+        handler = RecordingHandler()
+        uploads = UploadQueue(str(tmp_path), handler=handler)
+        uploads.start()
+        recorder = make_recorder()
+        uploads.submit(make_job(), recorder)
+        recorder.close()
+
+        wait_for(lambda: uploads.completed == 1)
+        uploads.shutdown(timeout=1.0)
+        assert handler.calls == [("session", b"\x01\x02" * 100, None)]
+        assert not list(tmp_path.glob("*.json"))
+        assert not list(tmp_path.glob("*.pcm"))
+        assert uploads.stats()["latency_max"] > 0
+
+    def test_live_upload_is_handed_over(self, tmp_path):
+        """Test the session's streaming upload reaches the handler unaborted"""
+
+        class LiveUpload:
+            aborted = False
+
+            def feed(self, pcm):
+                pass
+
+            def abort(self):
+                self.aborted = True
+
+        live_upload = LiveUpload()
+        handler = RecordingHandler()
+        uploads = UploadQueue(str(tmp_path), handler=handler)
+        recorder = make_recorder(upload=live_upload)
+        uploads.submit(make_job(), recorder)
+        recorder.close()
+        uploads.start()
+
+        wait_for(lambda: uploads.completed == 1)
+        uploads.shutdown(timeout=1.0)
+        assert handler.calls[0][2] is live_upload
+        assert not live_upload.aborted
+
+    def test_retries_with_backoff(self, tmp_path):
+        """Test failed uploads are retried until they succeed"""
+        handler = RecordingHandler(failures=2)
+        uploads = UploadQueue(str(tmp_path), handler=handler, retry_base_seconds=0.01)
+        uploads.start()
+        uploads.submit(make_job(), make_recorder())
+
+        wait_for(lambda: uploads.completed == 1)
+        uploads.shutdown(timeout=1.0)
+        assert len(handler.calls) == 3
+        assert uploads.retries == 2
+        assert uploads.failed == 0
+
+    def test_gives_up_after_max_attempts(self, tmp_path):
+        """Test a job that keeps failing is moved to the failed directory"""
+        handler = RecordingHandler(failures=10)
+        uploads = UploadQueue(
+            str(tmp_path), handler=handler, max_attempts=3, retry_base_seconds=0.01
+        )
+        uploads.start()
+        job_id = uploads.submit(make_job(), make_recorder())
+
+        wait_for(lambda: uploads.failed == 1)
+        uploads.shutdown(timeout=1.0)
+        assert len(handler.calls) == 3
+        failed_job = SessionUploadJob.model_validate_json(
+            (tmp_path / "failed" / f"{job_id}.json").read_text()
+        )
+        assert failed_job.attempts == 3
+        assert (tmp_path / "failed" / f"{job_id}.pcm").exists()
+        assert not list(tmp_path.glob("*.json"))
+
+    def test_validation_errors_are_not_retried(self, tmp_path):
+        """Test an invalid session fails without retrying"""
+        try:
+            AgentSession.model_validate({})
+        except ValidationError as e:
+            error = e
+        handler = RecordingHandler(failures=10, error=error)
+        uploads = UploadQueue(str(tmp_path), handler=handler)
+        uploads.start()
+        uploads.submit(make_job(), make_recorder())
+
+        wait_for(lambda: uploads.failed == 1)
+        uploads.shutdown(timeout=1.0)
+        assert len(handler.calls) == 1
+
+    def test_recovers_spooled_jobs_after_restart(self, tmp_path):
+        """Test jobs spooled by a stopped process are uploaded on the next start"""
+        stopped = UploadQueue(str(tmp_path), handler=RecordingHandler())
+        stopped.submit(make_job("first"), make_recorder())
+        stopped.submit(make_job("second"), make_recorder())
+
+        handler = RecordingHandler()
+        restarted = UploadQueue(str(tmp_path), handler=handler)
+        restarted.start()
+        wait_for(lambda: restarted.completed == 2)
+        restarted.shutdown(timeout=1.0)
+        assert {call[0] for call in handler.calls} == {"first", "second"}
+
+    def test_shutdown_drains_queue(self, tmp_path):
+        """Test shutdown waits for queued uploads to finish"""
+        handler = RecordingHandler(delay=0.05)
+        uploads = UploadQueue(str(tmp_path), workers=1, handler=handler)
+        uploads.start()
+        for i in range(4):
+            uploads.submit(make_job(f"session-{i}"), make_recorder())
+        uploads.shutdown(timeout=5.0)
+        assert uploads.completed == 4
+        assert not list(tmp_path.glob("*.json"))
+
+    def test_worker_pool_is_bounded(self, tmp_path):
+        """Test no more uploads run at once than there are workers"""
+        handler = RecordingHandler(delay=0.05)
+        uploads = UploadQueue(str(tmp_path), workers=2, handler=handler)
+        uploads.start()
+        for i in range(8):
+            uploads.submit(make_job(f"session-{i}"), make_recorder())
+        assert uploads.stats()["queue_depth"] > 0
+        uploads.shutdown(timeout=5.0)
+        assert uploads.completed == 8
+        assert handler.max_active == 2
+
+    def test_spool_dir_is_created_on_start(self, tmp_path):
+        """Test building the queue touches no disk until it is started"""
+        spool_dir = tmp_path / "spool"
+        uploads = UploadQueue(str(spool_dir), handler=RecordingHandler())
+        assert not spool_dir.exists()
+        assert uploads.stats()["spooled"] == 0
+        uploads.start()
+        assert (spool_dir / "failed").is_dir()
+        uploads.shutdown(timeout=1.0)
+
+    def test_orphaned_spool_files_are_removed(self, tmp_path):
+        """Test leftovers of an interrupted submit are swept on start"""
+        stopped = UploadQueue(str(tmp_path), handler=RecordingHandler())
+        stopped.submit(make_job("kept"), make_recorder())
+        (tmp_path / "half-written.tmp").write_text("{")
+        (tmp_path / "no-job.pcm").write_bytes(b"\x00" * 10)
+
+        handler = RecordingHandler()
+        restarted = UploadQueue(str(tmp_path), handler=handler)
+        restarted.start()
+        wait_for(lambda: restarted.completed == 1)
+        restarted.shutdown(timeout=1.0)
+        assert [call[0] for call in handler.calls] == ["kept"]
+        assert list(tmp_path.glob("*.tmp")) == []
+        assert list(tmp_path.glob("*.pcm")) == []
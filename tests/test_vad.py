@@ -0,0 +1,128 @@
+import numpy as np
+
+from app.vad import VoiceActivityDetector
+
+RATE = 16000
+PACKET = 2560  # 80ms
+
+
+def voiced(seconds: float, level_db: float = -20.0) -> bytes:
+    """Harmonic tone with a low zero-crossing rate, like voiced speech"""
+    t = np.arange(int(seconds * RATE)) / RATE
+    wave = sum(np.sin(2 * np.pi * 150 * k * t) / k for k in range(1, 4))
+    wave *= 10 ** (level_db / 20) * 32768 / np.sqrt(np.mean(wave * wave))
+    return wave.astype("<i2").tobytes()
+
+
+def noise(seconds: float, level_db: float) -> bytes:
+    """White noise, crossing zero about every other sample"""
+    rng = np.random.default_rng(0)
+    samples = rng.normal(0, 10 ** (level_db / 20) * 32768, int(seconds * RATE))
+    return samples.astype("<i2").tobytes()
+
+
+def run(vad: VoiceActivityDetector, audio: bytes):
+    sent, commits = b"", []
+    for offset in range(0, len(audio), PACKET):
+        result = vad.process(audio[offset : offset + PACKET])
+        sent += result.audio
+        if result.end_of_turn:
+            commits.append(offset + PACKET)
+    return sent, commits
+
+
+class TestVoiceActivityDetector:
+    """Test the local energy and zero-crossing VAD"""
+
+    def test_silence_is_not_sent(self):
+        """Test a silent stretch is skipped and never committed"""
+        vad = VoiceActivityDetector()
+        sent, commits = run(vad, noise(3.0, -70))
+        assert sent == b""
+        assert commits == []
+        assert vad.stats()["bandwidth_saved_pct"] == 100.0
+
+    def test_commits_after_speech_ends(self):
+        """Test the answer is committed once the trailing silence is long enough"""
+        vad = VoiceActivityDetector(end_silence_ms=700)
+        audio = noise(0.5, -70) + voiced(1.0) + noise(2.0, -70)
+        sent, commits = run(vad, audio)
+
+        assert len(commits) == 1
+        # committed ~0.7s after the speech ended, instead of the server's 1.5s
+        speech_end = int(1.5 * RATE) * 2
+        assert 0.7 <= (commits[0] - speech_end) / (RATE * 2) < 0.8
+        # speech plus the preroll and hangover around it, not the silence
+        assert int(1.0 * RATE) * 2 <= len(sent) < int(1.6 * RATE) * 2
+        stats = vad.stats()
+        assert stats["commits"] == 1
+        assert stats["latency_saved_ms"] == 800
+        assert stats["bandwidth_saved_pct"] > 50
+
+    def test_short_blip_is_not_an_answer(self):
+        """Test a click shorter than the minimum speech is not committed"""
+        vad = VoiceActivityDetector(min_speech_ms=200)
+        _, commits = run(vad, noise(0.5, -70) + voiced(0.1) + noise(2.0, -70))
+        assert commits == []
+
+    def test_hiss_needs_more_energy_than_voice(self):
+        """Test noise with a high zero-crossing rate is held to a higher threshold"""
+        quiet_room = noise(0.5, -70)
+        hiss, _ = run(VoiceActivityDetector(), quiet_room + noise(1.0, -42))
+        voice, _ = run(VoiceActivityDetector(), quiet_room + voiced(1.0, -42))
+        assert hiss == b""
+        assert len(voice) >= int(1.0 * RATE) * 2
+
+    def test_turn_state_resets(self):
+        """Test a committed answer is not committed again while it stays quiet"""
+        vad = VoiceActivityDetector()
+        answer = voiced(0.5) + noise(1.0, -70)
+        _, first = run(vad, answer)
+        _, quiet = run(vad, noise(2.0, -70))
+        vad.start_turn()
+        _, next_turn = run(vad, answer)
+        assert (len(first), len(quiet), len(next_turn)) == (1, 0, 1)
+
+    def test_speech_after_a_commit_is_committed(self):
+        """Test the answer going on after a commit gets another commit"""
+        vad = VoiceActivityDetector()
+        answer = voiced(0.5) + noise(1.0, -70)
+        _, first = run(vad, answer)
+        _, more = run(vad, answer)
+        assert (len(first), len(more)) == (1, 1)
+
+    def test_rejected_commit_is_retried(self):
+        """Test a commit the server rejected is sent again after more silence"""
+        vad = VoiceActivityDetector()
+        _, first = run(vad, voiced(0.5) + noise(1.0, -70))
+        vad.commit_failed()
+        _, retried = run(vad, noise(1.0, -70))
+        assert (len(first), len(retried)) == (1, 1)
+        # after another 700ms of silence, not at once
+        assert 0.7 * RATE * 2 <= retried[0] < 0.8 * RATE * 2
+        assert vad.stats()["commits"] == 2
+
+    def test_max_turn_commits_without_speech(self):
+        """Test a turn with no answer is still committed, and again later"""
+        vad = VoiceActivityDetector(max_turn_seconds=1.0)
+        _, commits = run(vad, noise(2.5, -70))
+        assert len(commits) == 2
+
+    def test_speech_started_once_per_turn(self):
+        """Test the first speech of a turn is flagged once, for barge-in"""
+        vad = VoiceActivityDetector()
+        answer = noise(0.5, -70) + voiced(0.5) + noise(0.5, -70) + voiced(0.5)
+
+        def starts():
+            return [
+                offset
+                for offset in range(0, len(answer), PACKET)
+                if vad.process(answer[offset : offset + PACKET]).speech_started
+            ]
+
+        first = starts()
+        vad.start_turn()
+        assert len(first) == 1
+        # in the packet where speech begins
+        assert first[0] <= int(0.5 * RATE) * 2 < first[0] + PACKET
+        assert len(starts()) == 1
@@ -0,0 +1,65 @@
+import pytest
+
+from app.wheel_of_emotions import (
+    EMOTION_INDEX,
+    WHEEL_OF_EMOTIONS,
+    get_depth_name,
+    get_emotion_depth,
+    get_emotion_lineage,
+)
+
+
+class TestEmotionIndex:
+    """Test the precomputed wheel of emotions index"""
+
+    def test_every_label_is_indexed(self):
+        """Test all primary, secondary and tertiary labels are in the index"""
+        for primary, secondaries in WHEEL_OF_EMOTIONS.items():
+            assert primary in EMOTION_INDEX
+            for secondary, tertiaries in secondaries.items():
+                assert secondary in EMOTION_INDEX
+                for tertiary in tertiaries:
+                    assert tertiary in EMOTION_INDEX
+
+    def test_index_is_read_only(self):
+        """Test the index cannot be modified after import"""
+        with pytest.raises(TypeError):
+            EMOTION_INDEX["new"] = EMOTION_INDEX["happy"]
+
+    @pytest.mark.parametrize(
+        ("mood", "depth"),
+        [("happy", 1), ("content", 2), ("joyful", 3), ("", 0), ("meh", 0)],
+    )
+    def test_depth(self, mood, depth):
+        """Test depth lookups for each level and unknown moods"""
+        assert get_emotion_depth(mood) == depth
+
+    def test_lookup_is_normalized(self):
+        """Test case and surrounding whitespace are ignored"""
+        assert get_emotion_lineage("  Joyful ") == get_emotion_lineage("joyful")
+
+    def test_lineage(self):
+        """Test lineage of a tertiary emotion"""
+        lineage = get_emotion_lineage("curious")
+        assert lineage.depth == 3
+        assert lineage.depth_name == "tertiary"
+        assert lineage.primary == "happy"
+        assert lineage.secondary == "interested"
+        assert not lineage.ambiguous
+
+    def test_ambiguous_label_keeps_every_path(self):
+        """Test labels under several parents keep all paths, deepest first"""
+        lineage = get_emotion_lineage("disappointed")
+        assert lineage.ambiguous
+        assert set(lineage.paths) == {
+            ("sad", "hurt", "disappointed"),
+            ("disgusted", "disappointed"),
+        }
+        assert lineage.depth == 3
+        assert (lineage.primary, lineage.secondary) == ("sad", "hurt")
+
+    def test_depth_name(self):
+        """Test depth names, including out of range depths"""
+        assert get_depth_name(0) == "unknown"
+        assert get_depth_name(2) == "secondary"
+        assert get_depth_name(7) == "unknown"
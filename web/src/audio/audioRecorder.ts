@@ -59,7 +59,9 @@ export default class AudioRecorder {
 
     // get mic stream
     this.stream = await navigator.mediaDevices.getUserMedia({
-      audio: true,
+      // the question plays while the microphone is open (barge-in), keep it
+      // out of the answer
+      audio: { echoCancellation: true, noiseSuppression: true },
       video: false,
     });
 
@@ -74,10 +76,11 @@ export default class AudioRecorder {
     );
     this.source.connect(this.recorderNode);
 
-    // set LLM before connecting
+    // set LLM and mode before connecting
     if (this.llmPicker) {
       const selectedLLM = this.llmPicker.getSelectedLLM();
       this.streamingService.setLLM(selectedLLM);
+      this.streamingService.setMode(this.llmPicker.getSelectedMode());
       this.llmPicker.setEnabled(false);
     }
 
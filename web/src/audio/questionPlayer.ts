@@ -0,0 +1,174 @@
+const MP3_MIME_TYPE = "audio/mpeg";
+
+// plays question audio while it is still arriving: chunks are appended to a
+// MediaSource as they come in, so playback starts with the first one instead
+// of after the whole question has been synthesized. Browsers without MP3
+// MediaSource support get the old behaviour (one Blob played at the end).
+export default class QuestionPlayer {
+  private audio: HTMLAudioElement | null = null;
+  private url: string | null = null;
+  private mediaSource: MediaSource | null = null;
+  private sourceBuffer: SourceBuffer | null = null;
+  // chunks waiting for the SourceBuffer (or for finish() on the fallback path)
+  private pending: Uint8Array[] = [];
+  // all audio of the question has arrived
+  private ended = false;
+  // playback failed before the question was complete, drop the rest of it
+  private closed = false;
+  private finished: Promise<void> | null = null;
+  private resolveFinished: (() => void) | null = null;
+
+  public static isStreamingSupported(): boolean {
+    return (
+      typeof MediaSource !== "undefined" &&
+      MediaSource.isTypeSupported(MP3_MIME_TYPE)
+    );
+  }
+
+  public push(chunk: Uint8Array): void {
+    if (this.closed) {
+      return;
+    }
+    if (!this.finished) {
+      this.start();
+    }
+    this.pending.push(chunk);
+    this.appendNext();
+  }
+
+  // all audio has arrived; resolves once it finished playing (or was stopped)
+  public finish(): Promise<void> {
+    // the next chunk belongs to the next question
+    this.closed = false;
+    if (!this.finished) {
+      // no audio for this question, or playback already failed
+      return Promise.resolve();
+    }
+    const finished = this.finished;
+    this.ended = true;
+    if (this.mediaSource) {
+      this.appendNext();
+    } else {
+      this.playBlob();
+    }
+    return finished;
+  }
+
+  // barge-in: the user started answering
+  public stop(): void {
+    if (!this.finished) {
+      return;
+    }
+    if (this.audio) {
+      this.audio.pause();
+    }
+    this.done();
+  }
+
+  private start(): void {
+    this.ended = false;
+    this.finished = new Promise<void>((resolve) => {
+      this.resolveFinished = resolve;
+    });
+    if (!QuestionPlayer.isStreamingSupported()) {
+      return;
+    }
+
+    const mediaSource = new MediaSource();
+    this.mediaSource = mediaSource;
+    this.url = URL.createObjectURL(mediaSource);
+    this.audio = this.createAudio(this.url);
+    mediaSource.addEventListener(
+      "sourceopen",
+      () => {
+        if (this.mediaSource !== mediaSource) {
+          return;
+        }
+        this.sourceBuffer = mediaSource.addSourceBuffer(MP3_MIME_TYPE);
+        this.sourceBuffer.mode = "sequence";
+        this.sourceBuffer.addEventListener("updateend", () =>
+          this.appendNext(),
+        );
+        this.appendNext();
+      },
+      { once: true },
+    );
+    this.play(this.audio);
+  }
+
+  // events of an element that was already stopped are ignored
+  private createAudio(url: string): HTMLAudioElement {
+    const audio = new Audio(url);
+    audio.onended = () => {
+      if (this.audio === audio) {
+        this.done();
+      }
+    };
+    audio.onerror = (error) => {
+      if (this.audio === audio) {
+        console.error("[PLAYER] Audio playback error:", error);
+        this.done(true);
+      }
+    };
+    return audio;
+  }
+
+  private play(audio: HTMLAudioElement): void {
+    audio.play().catch((error) => {
+      if (this.audio === audio) {
+        console.error("[PLAYER] Error playing audio:", error);
+        this.done(true);
+      }
+    });
+  }
+
+  // one append at a time; once everything is in, end the stream so the
+  // element fires "ended" after the last chunk
+  private appendNext(): void {
+    const sourceBuffer = this.sourceBuffer;
+    if (!sourceBuffer || sourceBuffer.updating || !this.mediaSource) {
+      return;
+    }
+    const chunk = this.pending.shift();
+    if (chunk) {
+      try {
+        sourceBuffer.appendBuffer(chunk as Uint8Array<ArrayBuffer>);
+      } catch (error) {
+        console.error("[PLAYER] Error appending audio:", error);
+        this.audio?.pause();
+        this.done(true);
+      }
+      return;
+    }
+    if (this.ended && this.mediaSource.readyState === "open") {
+      this.mediaSource.endOfStream();
+    }
+  }
+
+  private playBlob(): void {
+    const blob = new Blob(this.pending as Uint8Array<ArrayBuffer>[], {
+      type: MP3_MIME_TYPE,
+    });
+    this.pending = [];
+    this.url = URL.createObjectURL(blob);
+    this.audio = this.createAudio(this.url);
+    this.play(this.audio);
+  }
+
+  private done(failed: boolean = false): void {
+    if (this.url) {
+      URL.revokeObjectURL(this.url);
+    }
+    this.audio = null;
+    this.url = null;
+    this.mediaSource = null;
+    this.sourceBuffer = null;
+    this.pending = [];
+    this.finished = null;
+    this.closed = failed && !this.ended;
+    if (this.resolveFinished) {
+      this.resolveFinished();
+      this.resolveFinished = null;
+    }
+  }
+}
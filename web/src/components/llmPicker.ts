@@ -1,6 +1,7 @@
 export default class LLMPicker {
   private container: HTMLElement;
   private selectElement: HTMLSelectElement | null = null;
+  private modeSelectElement: HTMLSelectElement | null = null;
 
   constructor(container: HTMLElement) {
     this.container = container;
@@ -15,18 +16,31 @@ export default class LLMPicker {
           <option value="openai">OpenAI</option>
           <option value="gemini">Gemini</option>
         </select>
+        <label for="mode-select">Mode:</label>
+        <select id="mode-select" class="llm-select">
+          <option value="separate">Separate calls</option>
+          <option value="combined">Combined call</option>
+        </select>
       </div>
     `;
     this.selectElement = this.container.querySelector("#llm-select");
+    this.modeSelectElement = this.container.querySelector("#mode-select");
   }
 
   public getSelectedLLM(): string {
     return this.selectElement?.value || "openai";
   }
 
+  public getSelectedMode(): string {
+    return this.modeSelectElement?.value || "separate";
+  }
+
   public setEnabled(enabled: boolean): void {
     if (this.selectElement) {
       this.selectElement.disabled = !enabled;
     }
+    if (this.modeSelectElement) {
+      this.modeSelectElement.disabled = !enabled;
+    }
   }
 }
@@ -1,9 +1,13 @@
 const WS_URL = import.meta.env.VITE_AGENT_URL;
 
+// binary question audio frame header: version (u8), kind (u8), sequence (u16)
+const AUDIO_FRAME_HEADER_BYTES = 4;
+const AUDIO_FRAME_VERSION = 1;
+
 export default class StreamingService {
   private websocket: WebSocket | null = null;
   private onTranscriptUpdate?: (transcript: string, isFinal: boolean) => void;
-  private onQuestionAudio?: (chunk: any) => void;
+  private onQuestionAudio?: (chunk: string | Uint8Array) => void;
   private onQuestion?: (question: string) => void;
   private onListening?: () => void;
   private onAnalyzing?: () => void;
@@ -13,10 +17,11 @@ export default class StreamingService {
   private onWebSocketClosed?: () => void;
   private helper: any = null;
   private selectedLLM: string = "openai";
+  private selectedMode: string = "separate";
 
   constructor(
     onTranscriptUpdate?: (transcript: string, isFinal: boolean) => void,
-    onQuestionAudio?: (chunk: any) => void,
+    onQuestionAudio?: (chunk: string | Uint8Array) => void,
     onQuestion?: (question: string) => void,
     onListening?: () => void,
     onAnalyzing?: () => void,
@@ -44,9 +49,15 @@ export default class StreamingService {
     this.selectedLLM = llm;
   }
 
+  // "combined" gets mood and next question from a single LLM call per turn
+  public setMode(mode: string): void {
+    this.selectedMode = mode;
+  }
+
   public connect(): void {
-    const wsUrl = `${WS_URL}?llm=${this.selectedLLM}`;
+    const wsUrl = `${WS_URL}?llm=${this.selectedLLM}&mode=${this.selectedMode}&audio=binary&barge_in=1`;
     this.websocket = new WebSocket(wsUrl);
+    this.websocket.binaryType = "arraybuffer";
 
     this.websocket.onopen = () => {
       console.log("WebSocket connection opened");
@@ -56,6 +67,11 @@ export default class StreamingService {
     };
 
     this.websocket.onmessage = (event) => {
+      if (event.data instanceof ArrayBuffer) {
+        this.handleAudioFrame(event.data);
+        return;
+      }
+
       try {
         const data = JSON.parse(event.data);
 
@@ -70,11 +86,19 @@ export default class StreamingService {
               this.onQuestionAudio(data.chunk);
             }
             break;
+          case "audio_format":
+            console.log(`Question audio framing: ${data.framing}`);
+            break;
           case "question":
             if (this.onQuestion) {
               this.onQuestion(data.text);
             }
             break;
+          case "stop_audio":
+            if (this.helper) {
+              this.helper.stopQuestionAudio();
+            }
+            break;
           case "listening":
             if (this.onListening) {
               this.onListening();
@@ -123,6 +147,18 @@ export default class StreamingService {
     };
   }
 
+  private handleAudioFrame(frame: ArrayBuffer): void {
+    const header = new DataView(frame, 0, AUDIO_FRAME_HEADER_BYTES);
+    const version = header.getUint8(0);
+    if (version !== AUDIO_FRAME_VERSION) {
+      console.error(`Unsupported audio frame version: ${version}`);
+      return;
+    }
+    if (this.onQuestionAudio) {
+      this.onQuestionAudio(new Uint8Array(frame, AUDIO_FRAME_HEADER_BYTES));
+    }
+  }
+
   public disconnect(): void {
     if (this.websocket) {
       this.websocket.close();
@@ -2,10 +2,11 @@ import AgentStatus from "../components/agentStatus";
 import RealtimeTranscript from "../components/realtimeTranscript";
 import RecordButton from "../components/recordButton";
 import AudioRecorder from "../audio/audioRecorder";
+import QuestionPlayer from "../audio/questionPlayer";
 import LLMPicker from "../components/llmPicker";
 
 export class StreamingServiceHelper {
-  private audioChunks: Uint8Array[] = [];
+  private questionPlayer: QuestionPlayer = new QuestionPlayer();
   private agentStatus: AgentStatus;
   private realtimeTranscript: RealtimeTranscript;
   private recordButton: RecordButton;
@@ -46,12 +47,19 @@ export class StreamingServiceHelper {
     this.realtimeTranscript.update(transcript, isFinal);
   }
 
-  public onQuestionAudio(chunk: string): void {
-    const bytes = new Uint8Array(atob(chunk).length);
-    for (let i = 0; i < bytes.length; i++) {
-      bytes[i] = atob(chunk).charCodeAt(i);
+  public onQuestionAudio(chunk: string | Uint8Array): void {
+    // binary frames arrive as raw bytes, older JSON messages as base64
+    if (chunk instanceof Uint8Array) {
+      this.questionPlayer.push(chunk);
+      return;
     }
-    this.audioChunks.push(bytes);
+    // decode once, then one pass over the bytes
+    const binary = atob(chunk);
+    const bytes = new Uint8Array(binary.length);
+    for (let i = 0; i < binary.length; i++) {
+      bytes[i] = binary.charCodeAt(i);
+    }
+    this.questionPlayer.push(bytes);
   }
 
   public async onQuestion(question: string): Promise<void> {
@@ -61,51 +69,8 @@ export class StreamingServiceHelper {
     this.recordButton.setEnabled(false);
     this.recordButton.setSessionActive(false);
 
-    // Play all accumulated audio chunks
-    if (this.audioChunks.length > 0) {
-      // concatenate all chunks
-      const totalLength = this.audioChunks.reduce(
-        (sum, chunk) => sum + chunk.length,
-        0,
-      );
-      const combined = new Uint8Array(totalLength);
-      let offset = 0;
-      for (const chunk of this.audioChunks) {
-        combined.set(chunk, offset);
-        offset += chunk.length;
-      }
-
-      // create and play audio
-      const blob = new Blob([combined.buffer as ArrayBuffer], {
-        type: "audio/mpeg",
-      });
-      const url = URL.createObjectURL(blob);
-      const audio = new Audio(url);
-
-      // create promise to wait for audio to finish
-      const audioFinished = new Promise<void>((resolve) => {
-        audio.onended = () => {
-          URL.revokeObjectURL(url);
-          resolve();
-        };
-
-        audio.onerror = (error) => {
-          console.error("[HELPER] Audio playback error:", error);
-          URL.revokeObjectURL(url);
-          resolve();
-        };
-      });
-
-      try {
-        await audio.play();
-        await audioFinished;
-      } catch (error) {
-        console.error("[HELPER] Error playing audio:", error);
-      }
-
-      // clear chunks for next question
-      this.audioChunks = [];
-    }
+    // the audio has been playing since its first chunk, wait for the rest
+    await this.questionPlayer.finish();
 
     // signal backend that audio playback finished (after audio actually ends)
     if (this.websocket && this.websocket.readyState === WebSocket.OPEN) {
@@ -115,6 +80,11 @@ export class StreamingServiceHelper {
     }
   }
 
+  public stopQuestionAudio(): void {
+    console.log("[HELPER] Stopping question audio, user is answering");
+    this.questionPlayer.stop();
+  }
+
   public onListening(): void {
     this.agentStatus.showListening();
     this.recordButton.setEnabled(true);
@@ -152,7 +122,7 @@ export class StreamingServiceHelper {
 
   public onWebSocketClosed(): void {
     this.recordButton.setEnabled(true);
-    this.audioChunks = [];
+    this.questionPlayer.stop();
     this.llmPicker.setEnabled(true);
   }
 }